@@ -1,19 +1,34 @@
 # app.py
+import time
+_IMPORT_T0 = time.perf_counter()
+
 import os
+import zlib
+import hashlib
 import logging
+from datetime import date
 from typing import Any, Dict, Optional, List, Tuple
 
-from fastapi import FastAPI, UploadFile, File, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi import Body, FastAPI, UploadFile, File, Header, HTTPException, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from starlette.middleware.cors import CORSMiddleware
 
 import psycopg2
-from psycopg2.extras import Json
+from psycopg2 import errors as pg_errors
+from psycopg2.extras import Json, execute_values
 from dotenv import load_dotenv
 
-# Extractors (existing, must remain)
-from extractors.pdfco import PDFcoExtractor
+# Extractors (existing, must remain). Heavy SDKs (openai, requests,
+# pdfplumber/PyPDF2) are imported inside them on first use; pipeline/warmup.py
+# loads them in the background after startup.
+from extractors.pdfco import PDFcoExtractor, pdf_to_text as pdfco_pdf_to_text
 from extractors.openai_extractor import OpenAIExtractor
+from extractors.pdf_probe import IMAGE, probe_pdf
+from extractors.pdf_text import pdf_to_text as local_pdf_to_text
+from extractors.ocr import OCRExtractor, ocr_available, ocr_pdf_to_text
+from extractors.splitter import parse_parts, split_statement
+from extractors.text_model import FORM_FEED, BillText, text_source
 
 load_dotenv()
 
@@ -83,14 +98,14 @@ def parse_date(x: Optional[str]) -> Optional[str]:
         return xs
     return None
 
+def _num(x):
+    try:
+        return float(x) if x is not None else None
+    except Exception:
+        return None
+
 def normalize_fields(raw: Dict[str, Any]) -> Dict[str, Any]:
     """Map extractor output into DB contract fields (non-negotiable)."""
-    def _num(x):
-        try:
-            return float(x) if x is not None else None
-        except Exception:
-            return None
-
     first_meter = None
     if isinstance(raw.get("meters"), list) and raw["meters"]:
         first = raw["meters"][0]
@@ -132,10 +147,96 @@ def normalize_fields(raw: Dict[str, Any]) -> Dict[str, Any]:
         "rate_plan": raw.get("rate_plan"),
         "service_days": raw.get("service_days"),
 
+        # which vendor module (and version) produced the parse; None for OpenAI/generic
+        "vendor_key": raw.get("vendor_key"),
+        "vendor_parser_version": raw.get("vendor_parser_version"),
+
         "confidence_score": raw.get("confidence", raw.get("confidence_score", 0.7)),
         "raw_extracted_data": raw,
     }
 
+# ---- raw_extracted_data storage format
+# Raw keys normalize_fields copies into a column: (column, transform). A raw
+# value equal to its column after the transform is a duplicate and is not
+# stored again in raw_extracted_data.
+_RAW_COLUMNS = {
+    "property_name": ("property_name", None),
+    "customer_name": ("property_name", None),
+    "provider_name": ("utility_provider", None),
+    "vendor_name": ("utility_provider", None),
+    "utility_type": ("utility_type", None),
+    "account_number": ("account_number", None),
+    "meter_number": ("meter_serial_number", None),
+    "invoice_date": ("billing_date", parse_date),
+    "statement_issued": ("billing_date", parse_date),
+    "service_start": ("billing_start_date", parse_date),
+    "service_end": ("billing_end_date", parse_date),
+    "due_date": ("due_date", parse_date),
+    "amount_due_by": ("due_date", parse_date),
+    "total_amount_due": ("total_amount_due", _num),
+    "amount_due": ("total_amount_due", _num),
+    "total_usage": ("units_used", _num),
+    "usage_unit": ("unit_type", None),
+    "rate_plan": ("rate_plan", None),
+    "service_days": ("service_days", None),
+    "vendor_key": ("vendor_key", None),
+    "vendor_parser_version": ("vendor_parser_version", None),
+    "confidence": ("confidence_score", None),
+    **{k: (k, _num) for k in (
+        "current_charges", "previous_balance", "past_due_balance", "payments", "balance_forward",
+        "water_charges", "sewer_charges", "storm_water_charges", "environmental_fee",
+        "trash_charges", "gas_charges", "electric_charges",
+    )},
+}
+
+# Always kept out of the bills row (bill_payloads), as is any value larger than RAW_INLINE_MAX_BYTES
+_RAW_SIDE_KEYS = ("raw_text_sample", "pdf_probe")
+
+def _same(a: Any, b: Any) -> bool:
+    """Equality across Python and DB types (Decimal vs float, date vs ISO string)."""
+    if a == b:
+        return True
+    try:
+        return float(a) == float(b)
+    except Exception:
+        return str(a) == str(b)
+
+def split_raw(norm: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """
+    raw_extracted_data -> (row, side). `row` keeps provenance and fields no
+    column holds; `side` holds bulky payloads for the bill_payloads table.
+    The norm dict itself is not modified.
+    """
+    import json
+
+    raw = norm.get("raw_extracted_data") or {}
+    limit = int(os.getenv("RAW_INLINE_MAX_BYTES", "2048"))
+    row: Dict[str, Any] = {}
+    side: Dict[str, Any] = {}
+    for k, v in raw.items():
+        if v is None or k == "source_text":
+            continue
+        if k in _RAW_COLUMNS:
+            col, fn = _RAW_COLUMNS[k]
+            try:
+                if norm.get(col) is not None and _same(fn(v) if fn else v, norm.get(col)):
+                    continue
+            except Exception:
+                pass
+        if k in _RAW_SIDE_KEYS or len(json.dumps(v, default=str)) > limit:
+            side[k] = v
+        else:
+            row[k] = v
+    return row, side
+
+def project_bill(norm: Dict[str, Any], view: str = "full") -> Dict[str, Any]:
+    """API projection: "full" (everything, the historical shape) or "slim" (columns + the compact raw row)."""
+    if view != "slim":
+        return norm
+    out = {k: v for k, v in norm.items() if k != "raw_extracted_data"}
+    out["raw_extracted_data"] = split_raw(norm)[0]
+    return out
+
 # ======================================================
 #  Validation + Confidence (MANDATORY)
 # ======================================================
@@ -151,6 +252,8 @@ def _date_ok(start: Optional[str], end: Optional[str]) -> bool:
         return False
 
 def validate_normalized(norm: Dict[str, Any]) -> Tuple[bool, List[str]]:
+    from pipeline.history import SOFT_ISSUES, prior_bill_issues
+
     issues: List[str] = []
 
     if not norm.get("utility_provider"):
@@ -183,10 +286,14 @@ def validate_normalized(norm: Dict[str, Any]) -> Tuple[bool, List[str]]:
         if norm.get("units_used") is not None:
             issues.append("trash_has_usage")
 
-    return (len(issues) == 0), issues
+    # consistency with the account's previous bill (soft: lowers confidence only)
+    issues.extend(prior_bill_issues(norm))
+
+    return not [i for i in issues if i not in SOFT_ISSUES], issues
 
 def score_confidence(method: str, norm: Dict[str, Any], issues: List[str]) -> float:
-    conf = 0.70 if method == "pdfco" else 0.80
+    # regex-parsed text (PDF.co, local OCR, local text layer) vs OpenAI
+    conf = 0.70 if method in ("pdfco", "ocr", "local") else 0.80
 
     # Missing required fields penalties
     for key in ("missing_utility_provider", "invalid_account_number", "invalid_total_amount_due"):
@@ -201,6 +308,12 @@ def score_confidence(method: str, norm: Dict[str, Any], issues: List[str]) -> fl
     if "usage_missing_unit" in issues:
         conf -= 0.05
 
+    # Prior-bill inconsistencies (misread balance or period)
+    if "previous_balance_mismatch" in issues:
+        conf -= 0.05
+    if "service_period_overlap" in issues:
+        conf -= 0.05
+
     # Corroboration bonus (lightweight heuristic)
     corroborated = 0
     if norm.get("billing_date") and norm.get("billing_end_date"):
@@ -215,15 +328,26 @@ def score_confidence(method: str, norm: Dict[str, Any], issues: List[str]) -> fl
 # ======================================================
 #  DB functions (unchanged)
 # ======================================================
-def create_bill_stub() -> int:
+# Normalized columns written for every bill (DB contract order)
+BILL_FIELDS = (
+    "property_name", "utility_provider", "utility_type", "account_number", "meter_serial_number",
+    "billing_date", "billing_start_date", "billing_end_date", "due_date",
+    "current_charges", "previous_balance", "past_due_balance", "total_amount_due",
+    "units_used", "unit_type", "payments", "balance_forward",
+    "water_charges", "sewer_charges", "storm_water_charges", "environmental_fee",
+    "trash_charges", "gas_charges", "electric_charges",
+    "rate_plan", "service_days", "vendor_key", "vendor_parser_version",
+)
+
+def create_bill_stub(filename: Optional[str] = None, file_path: Optional[str] = None) -> int:
     conn = get_db()
     cur = conn.cursor()
     try:
         cur.execute("""
-            INSERT INTO bills (created_at, updated_at)
-            VALUES (NOW(), NOW())
+            INSERT INTO bills (filename, file_path, created_at, updated_at)
+            VALUES (%s, %s, NOW(), NOW())
             RETURNING id
-        """)
+        """, (filename, file_path))
         bill_id = cur.fetchone()[0]
         conn.commit()
         return bill_id
@@ -231,136 +355,917 @@ def create_bill_stub() -> int:
         cur.close()
         conn.close()
 
-def save_to_database(bill_id: int, data: Dict[str, Any], method: str):
+def delete_bill_stub(bill_id: int):
+    """Remove a stub that never received extraction results."""
     conn = get_db()
     cur = conn.cursor()
     try:
-        cur.execute(
-            """
-            UPDATE bills SET
-                property_name=%(property_name)s,
-                utility_provider=%(utility_provider)s,
-                utility_type=%(utility_type)s,
-                account_number=%(account_number)s,
-                meter_serial_number=%(meter_serial_number)s,
-                billing_date=%(billing_date)s,
-                billing_start_date=%(billing_start_date)s,
-                billing_end_date=%(billing_end_date)s,
-                due_date=%(due_date)s,
-                current_charges=%(current_charges)s,
-                previous_balance=%(previous_balance)s,
-                past_due_balance=%(past_due_balance)s,
-                total_amount_due=%(total_amount_due)s,
-                units_used=%(units_used)s,
-                unit_type=%(unit_type)s,
-                payments=%(payments)s,
-                balance_forward=%(balance_forward)s,
-                water_charges=%(water_charges)s,
-                sewer_charges=%(sewer_charges)s,
-                storm_water_charges=%(storm_water_charges)s,
-                environmental_fee=%(environmental_fee)s,
-                trash_charges=%(trash_charges)s,
-                gas_charges=%(gas_charges)s,
-                electric_charges=%(electric_charges)s,
-                rate_plan=%(rate_plan)s,
-                service_days=%(service_days)s,
-                extraction_method=%(extraction_method)s,
-                confidence_score=%(confidence_score)s,
-                requires_review=%(requires_review)s,
-                raw_extracted_data=%(raw_extracted_data)s,
-                updated_at=NOW()
-            WHERE id=%(bill_id)s
-            """,
-            {
-                **data,
-                "extraction_method": method,
-                "requires_review": (data.get("confidence_score") or 0) < 0.70,
-                "raw_extracted_data": Json(data.get("raw_extracted_data", {})),
-                "bill_id": bill_id,
-            },
-        )
+        cur.execute("DELETE FROM bills WHERE id=%s AND extraction_method IS NULL", (bill_id,))
         conn.commit()
     finally:
         cur.close()
         conn.close()
 
+def _bill_params(data: Dict[str, Any], method: str, raw_row: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Column values; raw_extracted_data is the slim row part (see split_raw)."""
+    if raw_row is None:
+        raw_row = split_raw(data)[0]
+    return {
+        **{k: data.get(k) for k in BILL_FIELDS},
+        "confidence_score": data.get("confidence_score"),
+        "extraction_method": method,
+        "requires_review": (data.get("confidence_score") or 0) < 0.70,
+        "raw_extracted_data": Json(raw_row),
+        "duplicate_of": data.get("duplicate_of"),
+    }
+
+def save_payloads(cur, rows: List[Tuple[int, Dict[str, Any]]]):
+    """Upsert bulky raw payloads; keys merge into what is already stored for the bill."""
+    rows = [(bill_id, Json(side)) for bill_id, side in rows if side]
+    if not rows:
+        return
+    execute_values(
+        cur,
+        """
+        INSERT INTO bill_payloads (bill_id, payload, updated_at) VALUES %s
+        ON CONFLICT (bill_id) DO UPDATE SET
+            payload=bill_payloads.payload || EXCLUDED.payload, updated_at=NOW()
+        """,
+        rows,
+        template="(%s, %s, NOW())",
+    )
+
+def load_raw(cur, bill_id: int) -> Dict[str, Any]:
+    """Full raw_extracted_data: the row part merged with its bill_payloads part."""
+    cur.execute(
+        """
+        SELECT b.raw_extracted_data, p.payload FROM bills b
+        LEFT JOIN bill_payloads p ON p.bill_id = b.id WHERE b.id=%s
+        """,
+        (bill_id,),
+    )
+    row = cur.fetchone()
+    if not row:
+        return {}
+    return {**(row[0] or {}), **(row[1] or {})}
+
+# ---- full extracted text (bill_texts, zlib-compressed, pages joined by form feeds;
+# page_sep is the separator the pages were joined with when the bill was parsed)
+def _pop_text(data: Dict[str, Any], method: str) -> Optional[Tuple[str, str, str]]:
+    """Take the full text out of raw_extracted_data -> (extractor, text, page_sep); the JSONB row keeps only the sample."""
+    raw = data.get("raw_extracted_data")
+    txt = raw.pop("source_text", None) if isinstance(raw, dict) else None
+    if not txt:
+        return None
+    if isinstance(txt, BillText):
+        return text_source(txt) or method, FORM_FEED.join(txt.pages), txt.sep
+    return method, str(txt), FORM_FEED
+
+def save_texts(cur, rows: List[Tuple[int, str, str, str]]):
+    """Upsert (bill_id, extractor, text, page_sep) rows."""
+    if not rows:
+        return
+    execute_values(
+        cur,
+        """
+        INSERT INTO bill_texts (bill_id, extractor, text_z, char_count, page_count, page_sep, created_at)
+        VALUES %s
+        ON CONFLICT (bill_id, extractor) DO UPDATE SET
+            text_z=EXCLUDED.text_z, char_count=EXCLUDED.char_count,
+            page_count=EXCLUDED.page_count, page_sep=EXCLUDED.page_sep, created_at=NOW()
+        """,
+        [
+            (bill_id, extractor, psycopg2.Binary(zlib.compress(text.encode("utf-8"), 6)),
+             len(text), text.count(FORM_FEED) + 1, sep)
+            for bill_id, extractor, text, sep in rows
+        ],
+        template="(%s, %s, %s, %s, %s, %s, NOW())",
+    )
+
+def load_text(cur, bill_id: int, extractor: Optional[str] = None) -> Optional[Tuple[str, BillText]]:
+    """Stored text of a bill -> (extractor, BillText with page breaks); newest when extractor is None."""
+    cur.execute(
+        """
+        SELECT extractor, text_z, page_sep FROM bill_texts
+        WHERE bill_id=%s AND (%s::text IS NULL OR extractor=%s)
+        ORDER BY created_at DESC LIMIT 1
+        """,
+        (bill_id, extractor, extractor),
+    )
+    row = cur.fetchone()
+    if not row:
+        return None
+    return row[0], unpack_text(row[0], row[1], row[2])
+
+def unpack_text(extractor: str, text_z: bytes, page_sep: Optional[str] = None) -> BillText:
+    """
+    Rebuild the text exactly as it was parsed: pages split on the stored form
+    feeds, joined again with page_sep. Rows saved before page_sep existed:
+    PDF.co text was parsed with form feeds, local and OCR text with newlines.
+    """
+    if page_sep is None:
+        page_sep = FORM_FEED if extractor == "pdfco" else "\n"
+    pages = zlib.decompress(bytes(text_z)).decode("utf-8").split(FORM_FEED)
+    txt = BillText(pages, page_sep)
+    txt.stats = {"source": extractor}
+    return txt
+
+def _update_bill(cur, bill_id: int, data: Dict[str, Any], method: str):
+    from pipeline.dedupe import link, merge
+    from pipeline.rollups import apply_delta
+
+    text = _pop_text(data, method)
+    raw_row, side = split_raw(data)
+    link(cur, [data], [bill_id])
+    apply_delta(cur, [bill_id], -1)  # the row as it was (a stub contributes nothing)
+    cur.execute(
+        """
+        UPDATE bills SET
+            property_name=%(property_name)s,
+            utility_provider=%(utility_provider)s,
+            utility_type=%(utility_type)s,
+            account_number=%(account_number)s,
+            meter_serial_number=%(meter_serial_number)s,
+            billing_date=%(billing_date)s,
+            billing_start_date=%(billing_start_date)s,
+            billing_end_date=%(billing_end_date)s,
+            due_date=%(due_date)s,
+            current_charges=%(current_charges)s,
+            previous_balance=%(previous_balance)s,
+            past_due_balance=%(past_due_balance)s,
+            total_amount_due=%(total_amount_due)s,
+            units_used=%(units_used)s,
+            unit_type=%(unit_type)s,
+            payments=%(payments)s,
+            balance_forward=%(balance_forward)s,
+            water_charges=%(water_charges)s,
+            sewer_charges=%(sewer_charges)s,
+            storm_water_charges=%(storm_water_charges)s,
+            environmental_fee=%(environmental_fee)s,
+            trash_charges=%(trash_charges)s,
+            gas_charges=%(gas_charges)s,
+            electric_charges=%(electric_charges)s,
+            rate_plan=%(rate_plan)s,
+            service_days=%(service_days)s,
+            vendor_key=%(vendor_key)s,
+            vendor_parser_version=%(vendor_parser_version)s,
+            extraction_method=%(extraction_method)s,
+            confidence_score=%(confidence_score)s,
+            requires_review=%(requires_review)s,
+            raw_extracted_data=%(raw_extracted_data)s,
+            duplicate_of=%(duplicate_of)s,
+            updated_at=NOW()
+        WHERE id=%(bill_id)s
+        """,
+        {**_bill_params(data, method, raw_row), "bill_id": bill_id},
+    )
+    if cur.rowcount == 0:
+        raise RuntimeError(f"Bill {bill_id} no longer exists (stub swept?)")
+    apply_delta(cur, [bill_id], 1)
+    if data.get("duplicate_of"):
+        merge(cur, [(data["duplicate_of"], bill_id)])
+    if text:
+        save_texts(cur, [(bill_id, *text)])
+        side.pop("raw_text_sample", None)  # the full text is in bill_texts
+    save_payloads(cur, [(bill_id, side)])
+
+def insert_bills(cur, rows: List[Tuple[Dict[str, Any], str]], extras: Optional[List[Dict[str, Any]]] = None) -> List[int]:
+    """
+    Insert many finished bills with one multi-row INSERT; returns ids in row order.
+    `extras` (one dict per row) holds source columns: filename, sha256, email_*.
+    """
+    from pipeline.dedupe import link, merge
+    from pipeline.rollups import apply_delta
+    from pipeline.webhooks import enqueue_saved
+
+    if not rows:
+        return []
+    link(cur, [norm for norm, _ in rows])
+    texts = [_pop_text(norm, method) for norm, method in rows]
+    splits = [split_raw(norm) for norm, _ in rows]
+    extras = extras or [{} for _ in rows]
+    extra_cols: List[str] = []
+    for e in extras:
+        extra_cols.extend(k for k in e if k not in extra_cols)
+    cols = list(BILL_FIELDS) + ["confidence_score", "extraction_method", "requires_review", "raw_extracted_data", "duplicate_of"] + extra_cols
+    values = []
+    for (norm, method), e, (raw_row, _) in zip(rows, extras, splits):
+        params = {**_bill_params(norm, method, raw_row), **{k: e.get(k) for k in extra_cols}}
+        values.append(tuple(params[c] for c in cols))
+    returned = execute_values(
+        cur,
+        f"INSERT INTO bills ({', '.join(cols)}, created_at, updated_at) VALUES %s RETURNING id",
+        values,
+        template="(" + ", ".join(["%s"] * len(cols)) + ", NOW(), NOW())",
+        page_size=max(100, len(values)),
+        fetch=True,
+    )
+    ids = [r[0] for r in returned]
+    apply_delta(cur, ids, 1)
+    enqueue_saved(cur, [(bid, norm, method) for bid, (norm, method) in zip(ids, rows)])
+    merge(cur, [(norm["duplicate_of"], bid) for bid, (norm, _) in zip(ids, rows) if norm.get("duplicate_of")])
+    save_texts(cur, [(bid, *t) for bid, t in zip(ids, texts) if t])
+    for t, (_, side) in zip(texts, splits):
+        if t:
+            side.pop("raw_text_sample", None)  # the full text is in bill_texts
+    save_payloads(cur, [(bid, side) for bid, (_, side) in zip(ids, splits)])
+    return ids
+
+def source_texts(norms: List[Dict[str, Any]]) -> List[Any]:
+    """Full texts of bills about to be written (a write moves them out of raw_extracted_data)."""
+    return [(n.get("raw_extracted_data") or {}).get("source_text") for n in norms]
+
+def restore_texts(norms: List[Dict[str, Any]], texts: List[Any]) -> None:
+    """Put source_texts() back before writing the same bills again after a rollback."""
+    for n, t in zip(norms, texts):
+        if t is not None:
+            n["raw_extracted_data"]["source_text"] = t
+
+def _commit_retrying(conn, norms: List[Dict[str, Any]], write):
+    """
+    Run write(cur) and commit. When a concurrent upload of the same bill (same
+    dedupe key) committed first, uq_bills_semantic raises; roll back and run
+    write once more, when link() sees that original and saves this bill as its
+    duplicate.
+    """
+    texts = source_texts(norms)
+    for attempt in (1, 2):
+        cur = conn.cursor()
+        try:
+            out = write(cur)
+            conn.commit()
+            return out
+        except pg_errors.UniqueViolation:
+            conn.rollback()
+            if attempt == 2:
+                raise
+            logger.info("Same bill saved concurrently; retrying as a duplicate")
+            restore_texts(norms, texts)
+        finally:
+            cur.close()
+
+def _record_sha(cur, bill_id: int, sha256: Optional[str]):
+    """bills.sha256 of an upload saved into its stub; left NULL when another bill already holds this file."""
+    if sha256:
+        cur.execute(
+            "UPDATE bills SET sha256=%s WHERE id=%s AND NOT EXISTS (SELECT 1 FROM bills WHERE sha256=%s)",
+            (sha256, bill_id, sha256),
+        )
+
+def save_to_database(bill_id: int, data: Dict[str, Any], method: str, sha256: Optional[str] = None):
+    from pipeline.webhooks import enqueue_saved
+
+    def write(cur):
+        _update_bill(cur, bill_id, data, method)
+        _record_sha(cur, bill_id, sha256)
+        enqueue_saved(cur, [(bill_id, data, method)])
+
+    conn = get_db()
+    try:
+        _commit_retrying(conn, [data], write)
+    finally:
+        conn.close()
+    remember_saved([bill_id], [data])
+    flag_anomalies([bill_id])
+
+def save_statement(bill_id: int, rows: List[Tuple[Dict[str, Any], str]], extra: Optional[Dict[str, Any]] = None,
+                   sha256: Optional[str] = None) -> List[int]:
+    """
+    First account fills the stub row; the others are inserted in the same transaction.
+    `extra` (source columns such as filename/file_path) is copied onto the inserted rows;
+    the file's sha256 (UNIQUE) goes on the first account only.
+    """
+    from pipeline.webhooks import enqueue_saved
+
+    def write(cur):
+        norm, method = rows[0]
+        _update_bill(cur, bill_id, norm, method)
+        _record_sha(cur, bill_id, sha256)
+        enqueue_saved(cur, [(bill_id, norm, method)])
+        return [bill_id] + insert_bills(cur, rows[1:], [dict(extra or {}) for _ in rows[1:]])
+
+    conn = get_db()
+    try:
+        ids = _commit_retrying(conn, [norm for norm, _ in rows], write)
+    finally:
+        conn.close()
+    remember_saved(ids, [norm for norm, _ in rows])
+    flag_anomalies(ids)
+    return ids
+
+def remember_saved(bill_ids: List[int], norms: List[Dict[str, Any]]):
+    """
+    Make committed bills the latest of their accounts in the prior-bill cache
+    (pipeline/history.py). Call after commit, never before: a rolled-back
+    write must not become an account's latest.
+    """
+    from pipeline.history import remember
+
+    for bid, norm in zip(bill_ids, norms):
+        if not norm.get("duplicate_of"):
+            remember(bid, norm)
+
+def flag_anomalies(bill_ids: List[int]):
+    """
+    Re-score the accounts of just-saved bills (pipeline/anomaly.py). Best effort:
+    the bill is already committed, and the bulk job catches up on anything missed.
+    """
+    if not bill_ids or os.getenv("ANOMALY_INLINE", "true").strip().lower() not in ("1", "true", "yes", "on"):
+        return
+    try:
+        from pipeline.anomaly import score_bills
+
+        score_bills(bill_ids)
+    except Exception as e:
+        logger.warning("Anomaly scoring skipped for bills %s: %s", bill_ids, e)
+
 # ======================================================
-#  Routes
+#  Extraction pipeline
 # ======================================================
-@app.get("/health")
-def health():
-    return {"ok": True}
+class ExtractionError(Exception):
+    """Extraction cannot proceed; carries the HTTP status the route should return."""
 
-@app.post("/parse-file")
-async def parse_file(file: UploadFile = File(...)):
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+def _score(method: str, raw: Dict[str, Any]) -> Tuple[Dict[str, Any], bool, List[str], float]:
+    norm = normalize_fields(raw)
+    ok, issues = validate_normalized(norm)
+    conf = score_confidence(method, norm, issues)
+    norm["confidence_score"] = conf
+    norm["raw_extracted_data"]["confidence"] = conf
+    return norm, ok, issues, conf
+
+def _source_text(pdf_bytes: bytes, pdfco_key: str, image_only: bool, local_ocr: bool, probe=None):
     """
-    Strategy (STRICT ORDER):
-    1. Attempt PDF.co extraction FIRST if API key exists
-    2. Validate extracted data + compute confidence
-    3. If validation fails OR confidence < 0.70 -> FALL BACK to OpenAI
-    4. Save best result
+    Text used for splitting and regex parsing: PDF.co first (when configured),
+    then the local text layer, then local OCR for scans. Returns (text, source).
+    `probe` is extract_bills' probe_pdf() result, so the PDF isn't probed twice.
     """
-    pdf_bytes = await file.read()
-    if not pdf_bytes:
-        raise HTTPException(status_code=400, detail="Empty file uploaded")
+    if pdfco_key:
+        try:
+            return pdfco_pdf_to_text(pdf_bytes), "pdfco"
+        except Exception as e:
+            logger.warning("PDF.co text failed: %s", e)
+    if not image_only:
+        try:
+            return local_pdf_to_text(pdf_bytes, probe=probe), "local"
+        except Exception as e:
+            logger.warning("Local text failed: %s", e)
+    if local_ocr:
+        try:
+            return ocr_pdf_to_text(pdf_bytes), "ocr"
+        except Exception as e:
+            logger.warning("Local OCR failed: %s", e)
+    return None, None
 
-    bill_id = create_bill_stub()
+def _report(stage, method: str, raw: Dict[str, Any], issues: List[str], conf: float, **where) -> None:
+    """Progress events after one regex/LLM pass: vendor fingerprint and validation issues."""
+    if raw.get("vendor_key"):
+        stage("vendor", extractor=method, vendor=raw["vendor_key"], **where)
+    if issues:
+        stage("issues", extractor=method, issues=issues, confidence=conf, **where)
 
-    extractor_used = None
-    raw: Dict[str, Any] = {}
-    norm: Dict[str, Any] = {}
+def _known_duplicate(norm: Dict[str, Any]) -> bool:
+    """Regex result matches a saved bill (account, provider, period, total): no OpenAI needed."""
+    from pipeline.dedupe import find_duplicate
 
-    pdfco_key = os.getenv("PDFCO_API_KEY", "").strip()
+    dup = find_duplicate(norm)
+    if dup is None:
+        return False
+    norm["duplicate_of"] = dup
+    logger.info("Duplicate of bill %s: OpenAI fallback skipped", dup)
+    return True
 
-    if pdfco_key:
+def _extract_single(pdf_bytes: bytes, text, source: Optional[str], image_only: bool, local_ocr: bool, stage):
+    """One bill, STRICT ORDER: PDF.co -> local OCR (scans) -> OpenAI."""
+    if source == "pdfco":
         logger.info("Extractor attempted: pdfco")
         try:
-            raw = PDFcoExtractor().extract(pdf_bytes)
-            norm = normalize_fields(raw)
-            ok, issues = validate_normalized(norm)
-            conf = score_confidence("pdfco", norm, issues)
-            norm["confidence_score"] = conf
-            norm["raw_extracted_data"]["confidence"] = conf
+            raw = PDFcoExtractor().extract_text(text)
+            norm, ok, issues, conf = _score("pdfco", raw)
+            _report(stage, "pdfco", raw, issues, conf)
 
             logger.info("Fingerprint matched: %s", raw.get("vendor_name"))
             logger.info("Confidence score: %.2f", conf)
 
-            if (not ok) or conf < 0.70:
+            if _known_duplicate(norm):
+                return norm, "pdfco"
+
+            if ((not ok) or conf < 0.70) and not (image_only and not local_ocr):
                 logger.warning("Fallback triggered: pdfco invalid (%s)", issues)
                 raise ValueError(f"pdfco invalid: {issues}")
 
-            extractor_used = "pdfco"
+            # Image-only without local OCR: OpenAI would read the same
+            # (missing) text layer, so keep PDF.co and let requires_review flag it.
+            return norm, "pdfco"
+        except Exception as e:
+            if image_only and not local_ocr:
+                logger.error("PDF.co failed on image-only PDF: %s", e)
+                raise ExtractionError(502, f"PDF.co failed on image-only PDF: {e}")
+            logger.warning("PDF.co failed -> fallback (%s)", e)
+            stage("fallback", extractor="pdfco", reason=str(e)[:500])
+    elif image_only and not local_ocr:
+        raise ExtractionError(502, "PDF.co failed on image-only PDF")
+
+    if local_ocr:
+        logger.info("Extractor attempted: ocr")
+        try:
+            raw = OCRExtractor().extract_text(text) if source == "ocr" else OCRExtractor().extract(pdf_bytes)
+            norm, ok, issues, conf = _score("ocr", raw)
+            _report(stage, "ocr", raw, issues, conf)
+            logger.info("Confidence score: %.2f", conf)
+
+            if _known_duplicate(norm):
+                return norm, "ocr"
+
+            if (not ok) or conf < 0.70:
+                logger.warning("Fallback triggered: ocr invalid (%s)", issues)
+                raise ValueError(f"ocr invalid: {issues}")
+
+            return norm, "ocr"
         except Exception as e:
-            logger.warning("PDF.co failed -> OpenAI fallback (%s)", e)
+            logger.warning("Local OCR failed -> OpenAI fallback (%s)", e)
+            stage("fallback", extractor="ocr", reason=str(e)[:500])
 
-    if extractor_used is None:
-        logger.info("Extractor attempted: openai")
+    logger.info("Extractor attempted: openai")
+    if source in ("local", "ocr"):
+        raw = OpenAIExtractor().extract_text(text)
+    else:
         raw = OpenAIExtractor().extract(pdf_bytes)
-        norm = normalize_fields(raw)
-        ok, issues = validate_normalized(norm)
-        conf = score_confidence("openai", norm, issues)
-        norm["confidence_score"] = conf
-        norm["raw_extracted_data"]["confidence"] = conf
+    norm, ok, issues, conf = _score("openai", raw)
+    _report(stage, "openai", raw, issues, conf)
+    logger.info("Confidence score: %.2f", conf)
+    return norm, "openai"
 
-        logger.info("Confidence score: %.2f", conf)
-        extractor_used = "openai"
+def _openai_part(part) -> Tuple[Dict[str, Any], str]:
+    logger.info("Extractor attempted: openai (split account)")
+    norm, _, _, conf = _score("openai", OpenAIExtractor().extract_text(part))
+    logger.info("Confidence score: %.2f", conf)
+    return norm, "openai"
 
-    save_to_database(bill_id, norm, extractor_used)
+def _extract_parts(parts, vendor: Optional[str], source: str, stage) -> List[Tuple[Dict[str, Any], str]]:
+    """
+    Consolidated statement: regex-parse every account in parallel, then send
+    only the accounts that fail validation to OpenAI (concurrently).
+    Accounts that yield nothing (parse error and no OpenAI result) are listed
+    as raw_extracted_data["failed_accounts"] on every extracted account.
+    """
+    from concurrent.futures import ThreadPoolExecutor
 
-    return JSONResponse(
-        {
+    results: List[Optional[Tuple[Dict[str, Any], str]]] = [None] * len(parts)
+    fallback: List[int] = []
+    for i, raw in enumerate(parse_parts(parts, vendor)):
+        if isinstance(raw, Exception):
+            logger.warning("Account %d parse failed: %s", i, raw)
+            fallback.append(i)
+            continue
+        norm, ok, issues, conf = _score(source, raw)
+        _report(stage, source, raw, issues, conf, account=i)
+        if ((not ok) or conf < 0.70) and not _known_duplicate(norm):
+            logger.warning("Account %d invalid (%s)", i, issues)
+            fallback.append(i)
+        results[i] = (norm, source)
+
+    if fallback and os.getenv("OPENAI_API_KEY"):
+        stage("fallback", extractor=source, accounts=fallback)
+        workers = max(1, int(os.getenv("SPLIT_OPENAI_CONCURRENCY", "4")))
+        with ThreadPoolExecutor(max_workers=workers) as ex:
+            futures = {i: ex.submit(_openai_part, parts[i]) for i in fallback}
+        for i, f in futures.items():
+            try:
+                results[i] = f.result()
+            except Exception as e:
+                logger.warning("OpenAI fallback failed for account %d: %s", i, e)
+
+    out = [r for r in results if r is not None]
+    if not out:
+        raise ExtractionError(422, "Consolidated statement: no account could be extracted")
+    failed = [i for i, r in enumerate(results) if r is None]
+    if failed:
+        logger.error("Consolidated statement: accounts %s of %d could not be extracted", failed, len(parts))
+        for norm, _ in out:
+            norm["raw_extracted_data"]["failed_accounts"] = failed
+    return out
+
+def failed_accounts(results: List[Tuple[Dict[str, Any], str]]) -> List[int]:
+    """Statement accounts (0-based) that extract_bills could not extract."""
+    return (results[0][0].get("raw_extracted_data") or {}).get("failed_accounts") or [] if results else []
+
+def extract_bills(pdf_bytes: bytes, on_stage=None) -> List[Tuple[Dict[str, Any], str]]:
+    """
+    Full extraction for one upload -> [(normalized, extraction_method), ...].
+    A single bill yields one entry; a consolidated statement one per account.
+    `on_stage` (optional) is called with "text", "parsed" and "validated" as
+    each step completes (job queue progress), and with "vendor", "issues" and
+    "fallback" plus keyword details as they happen (live progress streams).
+    """
+    stage = on_stage or (lambda name, **detail: None)
+    pdfco_key = os.getenv("PDFCO_API_KEY", "").strip()
+
+    probe = None
+    try:
+        probe = probe_pdf(pdf_bytes)
+        logger.info("PDF probe: %s (%d pages, %.1f ms)", probe.kind, probe.page_count, probe.elapsed_ms)
+    except Exception as e:
+        logger.warning("PDF probe failed: %s", e)
+
+    image_only = probe is not None and probe.kind == IMAGE
+    local_ocr = image_only and ocr_available()
+    if image_only and not (pdfco_key or local_ocr):
+        raise ExtractionError(422, "Image-only PDF (no text layer) and neither PDF.co nor local OCR is configured")
+
+    text, source = _source_text(pdf_bytes, pdfco_key, image_only, local_ocr, probe)
+    stage("text", source=source, chars=len(text) if text else 0)
+
+    parts, vendor = split_statement(text) if text else ([], None)
+    stage("parsed", accounts=max(1, len(parts)))
+    if len(parts) > 1:
+        results = _extract_parts(parts, vendor, source, stage)
+    else:
+        results = [_extract_single(pdf_bytes, text, source, image_only, local_ocr, stage)]
+
+    if probe is not None:
+        for norm, _ in results:
+            norm["raw_extracted_data"]["pdf_probe"] = probe.to_dict()
+    stage("validated", methods=[m for _, m in results], failed_accounts=failed_accounts(results))
+    return results
+
+# ======================================================
+#  Routes
+# ======================================================
+@app.on_event("startup")
+def _start_background_jobs():
+    from pipeline.reparse import start_stale_job
+    from pipeline.sweeper import start_sweeper
+    from pipeline.warmup import start_warmup
+    from pipeline.webhooks import start_dispatcher
+
+    start_warmup()
+    start_stale_job()
+    start_sweeper()
+    start_dispatcher()
+
+@app.get("/health")
+def health():
+    return {"ok": True}
+
+@app.post("/parse-file")
+async def parse_file(
+    file: UploadFile = File(...),
+    view: str = "full",
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+):
+    """
+    Strategy (STRICT ORDER):
+    0. Probe the text layer (milliseconds); image-only PDFs skip local text paths
+    1. Attempt PDF.co extraction FIRST if API key exists
+    2. Validate extracted data + compute confidence
+    3. Image-only and local OCR enabled -> try local OCR + regex parsing
+    4. If validation fails OR confidence < 0.70 -> FALL BACK to OpenAI
+       (image-only: OpenAI reads the cached OCR text)
+    5. Save best result
+
+    Consolidated statements (many accounts in one PDF) are split per account;
+    every account is validated (and falls back to OpenAI) on its own, and all
+    rows are written in one transaction.
+
+    view=slim returns raw_extracted_data as stored in the row (provenance and
+    fields no column holds) instead of the full extractor output.
+
+    Idempotency-Key: a repeated key returns the first request's response
+    (waiting for it if it is still running) without extracting again.
+    """
+    pdf_bytes = await file.read()
+    if not pdf_bytes:
+        raise HTTPException(status_code=400, detail="Empty file uploaded")
+    if idempotency_key is None:
+        return JSONResponse(await _parse_upload(pdf_bytes, file.filename, view))
+
+    from pipeline import idempotency
+
+    key = idempotency_key.strip()
+    if not key or len(key) > idempotency.MAX_KEY_LENGTH:
+        raise HTTPException(status_code=400, detail="Invalid Idempotency-Key")
+    outcome, row = await run_in_threadpool(idempotency.claim, key, hashlib.sha256(pdf_bytes).hexdigest())
+    if outcome == "mismatch":
+        raise HTTPException(status_code=422, detail="Idempotency-Key was already used with a different file")
+    if outcome == "in_flight":
+        row = await run_in_threadpool(idempotency.wait, key)
+        if row is None:
+            raise HTTPException(status_code=409, detail="A request with this Idempotency-Key is still in progress")
+    if outcome != "claimed":
+        return JSONResponse(row["response"], status_code=row["status_code"], headers={"Idempotent-Replayed": "true"})
+
+    try:
+        body = await _parse_upload(pdf_bytes, file.filename, view, on_stub=lambda bid: idempotency.attach(key, bid))
+    except HTTPException as e:
+        if e.status_code < 500:  # final answer: replay it
+            await run_in_threadpool(idempotency.finish, key, e.status_code, {"detail": e.detail})
+        else:
+            await run_in_threadpool(idempotency.release, key)
+        raise
+    except BaseException:
+        await run_in_threadpool(idempotency.release, key)
+        raise
+    await run_in_threadpool(idempotency.finish, key, 200, body, body["bill_id"])
+    return JSONResponse(body)
+
+async def _parse_upload(pdf_bytes: bytes, filename: Optional[str], view: str, on_stub=None) -> Dict[str, Any]:
+    from pipeline.blobs import put as store_pdf
+
+    # keep the original so re-extraction never needs the client again
+    source = {"filename": (filename or "upload.pdf")[:500]}
+    # recorded on the saved bill, so batch/ingest hash dedupe sees files uploaded here too
+    sha = hashlib.sha256(pdf_bytes).hexdigest()
+    try:
+        source["file_path"] = await run_in_threadpool(store_pdf, pdf_bytes)
+    except OSError as e:
+        logger.warning("Could not store original PDF: %s", e)
+    bill_id = await run_in_threadpool(create_bill_stub, **source)
+    if on_stub is not None:
+        await run_in_threadpool(on_stub, bill_id)
+
+    try:
+        results = await run_in_threadpool(extract_bills, pdf_bytes)
+    except ExtractionError as e:
+        await run_in_threadpool(delete_bill_stub, bill_id)
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+
+    if len(results) == 1:
+        norm, extractor_used = results[0]
+        await run_in_threadpool(save_to_database, bill_id, norm, extractor_used, sha)
+        return {
             "status": "success",
             "bill_id": bill_id,
             "extraction_method": extractor_used,
-            "data": norm,
+            "duplicate_of": norm.get("duplicate_of"),
+            "failed_accounts": failed_accounts(results),
+            "data": project_bill(norm, view),
         }
+
+    bill_ids = await run_in_threadpool(save_statement, bill_id, results, source, sha)
+    return {
+        "status": "success",
+        "bill_id": bill_ids[0],
+        "bill_ids": bill_ids,
+        "failed_accounts": failed_accounts(results),
+        "bills": [
+            {"bill_id": bid, "extraction_method": method, "duplicate_of": norm.get("duplicate_of"),
+             "data": project_bill(norm, view)}
+            for bid, (norm, method) in zip(bill_ids, results)
+        ],
+    }
+
+@app.post("/jobs", status_code=202)
+async def create_job(file: UploadFile = File(...)):
+    """
+    Queue one PDF for extraction by the job workers (python -m pipeline.jobs
+    worker, on any node). The original is stored first, so the job survives
+    restarts and deploys; follow it with GET /jobs/{job_id}.
+    """
+    from pipeline.blobs import put as store_pdf, sha_of
+    from pipeline.jobs import enqueue
+
+    pdf_bytes = await file.read()
+    if not pdf_bytes:
+        raise HTTPException(status_code=400, detail="Empty file uploaded")
+    try:
+        path = await run_in_threadpool(store_pdf, pdf_bytes)
+    except OSError as e:
+        raise HTTPException(status_code=503, detail=f"Could not store the PDF: {e}")
+    job_id = await run_in_threadpool(enqueue, path, (file.filename or "upload.pdf")[:500], sha_of(path))
+    return {"job_id": job_id, "state": "received"}
+
+@app.get("/jobs/{job_id}")
+def job_status(job_id: int):
+    from pipeline.jobs import get_job
+
+    job = get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown job id")
+    return job
+
+_SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+@app.get("/jobs/{job_id}/events")
+async def job_events(
+    job_id: int,
+    request: Request,
+    last_event_id: Optional[str] = Header(None, alias="Last-Event-ID"),
+):
+    """Server-Sent Events: the job's stages (with timings) as they happen, until saved/failed/dead."""
+    from pipeline.jobs import get_job
+    from pipeline.progress import job_stream, last_event_id as parse_last
+
+    if await run_in_threadpool(get_job, job_id) is None:
+        raise HTTPException(status_code=404, detail="Unknown job id")
+    return StreamingResponse(
+        job_stream(job_id, request, parse_last(last_event_id)),
+        media_type="text/event-stream", headers=_SSE_HEADERS,
+    )
+
+@app.post("/webhooks", status_code=201)
+def create_webhook(payload: Dict[str, Any] = Body(...)):
+    """
+    Subscribe: {"tenant", "url", "events": ["bill.completed", "bill.needs_review"],
+    "property_name": optional filter, "secret": optional}. The response is the
+    only time the signing secret is returned.
+    """
+    from pipeline.webhooks import subscribe
+
+    if not payload.get("tenant") or not payload.get("url"):
+        raise HTTPException(status_code=400, detail="tenant and url are required")
+    try:
+        return subscribe(
+            str(payload["tenant"]), str(payload["url"]), payload.get("events"),
+            payload.get("property_name"), payload.get("secret"),
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/webhooks")
+def webhooks(tenant: Optional[str] = None):
+    from pipeline.webhooks import list_subscriptions
+
+    return {"items": list_subscriptions(tenant)}
+
+@app.delete("/webhooks/{sub_id}")
+def delete_webhook(sub_id: int):
+    from pipeline.webhooks import unsubscribe
+
+    if not unsubscribe(sub_id):
+        raise HTTPException(status_code=404, detail="Unknown subscription")
+    return {"ok": True}
+
+@app.post("/parse-batch")
+async def parse_batch(files: List[UploadFile] = File(...), stream: bool = False, include_raw: bool = False):
+    """
+    Many PDFs and/or ZIP archives of PDFs in one request.
+    Returns a batch id immediately; poll GET /batches/{batch_id} for per-file results.
+
+    stream=true: respond with NDJSON instead, one line per bill in completion
+    order plus progress/error lines (slim raw_extracted_data; full with include_raw=true).
+    """
+    from pipeline.batch import spool, start_batch, stream_batch
+
+    if not files:
+        raise HTTPException(status_code=400, detail="No files uploaded")
+
+    sources = []
+    for f in files:
+        name = f.filename or "upload.pdf"
+        sources.append((name, await run_in_threadpool(spool, f.file, os.path.splitext(name)[1])))
+
+    if stream:
+        return StreamingResponse(stream_batch(sources, include_raw), media_type="application/x-ndjson")
+
+    batch = await run_in_threadpool(start_batch, sources)
+    if batch.total == 0:
+        raise HTTPException(status_code=400, detail="No PDF files found in upload")
+
+    return JSONResponse(
+        {"status": "accepted", "batch_id": batch.id, "total": batch.total},
+        status_code=202,
+    )
+
+@app.get("/batches/{batch_id}")
+def batch_status(batch_id: str, since: int = 0):
+    """Progress plus per-file results; `since` skips results already seen."""
+    from pipeline.batch import get_batch
+
+    batch = get_batch(batch_id)
+    if batch is None:
+        raise HTTPException(status_code=404, detail="Unknown batch id")
+    return batch.snapshot(since=max(0, since))
+
+@app.get("/batches/{batch_id}/events")
+async def batch_events(
+    batch_id: str,
+    request: Request,
+    last_event_id: Optional[str] = Header(None, alias="Last-Event-ID"),
+):
+    """Server-Sent Events: per-file stages and results as they happen, then `end`."""
+    from pipeline.batch import get_batch
+    from pipeline.progress import batch_stream, last_event_id as parse_last
+
+    batch = get_batch(batch_id)
+    if batch is None:
+        raise HTTPException(status_code=404, detail="Unknown batch id")
+    return StreamingResponse(
+        batch_stream(batch, request, parse_last(last_event_id)),
+        media_type="text/event-stream", headers=_SSE_HEADERS,
     )
 
+@app.get("/bills")
+def bills(
+    utility_provider: Optional[str] = None,
+    property_name: Optional[str] = None,
+    utility_type: Optional[str] = None,
+    account_number: Optional[str] = None,
+    billing_date_from: Optional[date] = None,
+    billing_date_to: Optional[date] = None,
+    requires_review: Optional[bool] = None,
+    fields: Optional[str] = None,
+    order: str = "id",
+    direction: str = "desc",
+    limit: int = 50,
+    cursor: Optional[str] = None,
+):
+    """
+    Filtered bill listing. `fields` is a comma list of columns; pages follow
+    `next_cursor` (keyset, no OFFSET). order=billing_date lists dated bills only.
+    """
+    from pipeline.queries import QueryError, list_bills
+
+    try:
+        return list_bills(
+            utility_provider=utility_provider, property_name=property_name,
+            utility_type=utility_type, account_number=account_number,
+            billing_date_from=billing_date_from, billing_date_to=billing_date_to,
+            requires_review=requires_review, fields=fields, order=order,
+            direction=direction, limit=limit, cursor=cursor,
+        )
+    except QueryError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/rollups")
+def rollups(
+    property_name: Optional[str] = None,
+    utility_type: Optional[str] = None,
+    month_from: Optional[date] = None,
+    month_to: Optional[date] = None,
+    limit: int = 1000,
+):
+    """
+    Cost and usage per property x utility_type x statement month, read from
+    the incrementally maintained bill_rollups table (no scan of bills).
+    """
+    from pipeline.rollups import query
+
+    return {"items": query(property_name, utility_type, month_from, month_to, limit)}
+
+@app.post("/review/lease")
+def review_lease(reviewer: str, n: int = 5):
+    """
+    Lease the next n bills awaiting review to this reviewer (expires after
+    REVIEW_LEASE_SEC). Concurrent reviewers never receive the same bill.
+    """
+    from pipeline.review import ReviewError, lease
+
+    try:
+        return {"items": lease(reviewer, n)}
+    except ReviewError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+
+@app.post("/review/{bill_id}")
+def review_submit(bill_id: int, payload: Dict[str, Any] = Body(...)):
+    """
+    Submit a correction for a leased bill: {"reviewer": "...", "fields": {...}}.
+    Corrected columns are written, the bill is marked reviewed, and the
+    values become a regression fixture for its stored text.
+    """
+    from pipeline.review import ReviewError, submit
+
+    try:
+        return submit(bill_id, str(payload.get("reviewer") or ""), payload.get("fields") or {})
+    except ReviewError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+
+@app.post("/review/{bill_id}/release")
+def review_release(bill_id: int, reviewer: str):
+    from pipeline.review import release
+
+    if not release(bill_id, reviewer):
+        raise HTTPException(status_code=409, detail="Bill is not leased to this reviewer")
+    return {"ok": True}
+
+@app.post("/bills/{bill_id}/reparse")
+def reparse(bill_id: int, save: bool = True, force: bool = False, view: str = "full"):
+    """
+    Re-run the local parsers (parse_bill_text -> vendor enhancer -> normalize ->
+    validate) on the bill's stored text. No PDF.co/OpenAI calls. The row is
+    updated only when something changed and the result is valid (or force=true);
+    save=false just reports the differences.
+    """
+    from pipeline.reparse import reparse_bill
+
+    result = reparse_bill(bill_id, save=save, force=force)
+    if result is None:
+        raise HTTPException(status_code=404, detail="No stored text for this bill")
+    result["data"] = project_bill(result["data"], view)
+    return result
+
+IMPORT_SEC = round(time.perf_counter() - _IMPORT_T0, 3)
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(
         "app:app",
         host=os.getenv("HOST", "0.0.0.0"),
         port=int(os.getenv("PORT", "8080")),
-        reload=True,
+        # the reloader adds a supervisor process and a file watcher: development only
+        reload=os.getenv("UVICORN_RELOAD", "false").strip().lower() in ("1", "true", "yes", "on"),
     )
@@ -0,0 +1,127 @@
+"""
+Text-backend bake-off over a local PDF corpus.
+
+Runs every available backend (or --backends a,b) over each PDF under the
+corpus directory and reports, per backend:
+
+  pages/sec   raw text extraction throughput (single process, no pool)
+  peak RSS    max resident memory of the child process running the backend
+  fields      total fields parse_bill_text recovers from that backend's text
+  lost        files where the backend recovered fewer fields than the best backend
+  errors      files the backend could not read
+
+Each backend runs in its own fresh (spawned) process so memory numbers are
+not polluted by the others.
+
+Usage:
+  python -m extractors.bakeoff ./corpus
+  python -m extractors.bakeoff ./corpus --backends pdfplumber,pdfium --json
+"""
+
+from __future__ import annotations
+import os
+import sys
+import json
+import time
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List
+
+from extractors.text_backends import BACKENDS, available_backends, get_backend
+
+# Bookkeeping keys in parse_bill_text output that are not extracted fields
+_NOT_FIELDS = {"confidence", "raw_text_sample", "source_text", "vendor_name", "vendor_key", "vendor_parser_version"}
+
+
+def _corpus(root: str) -> List[str]:
+    out: List[str] = []
+    for dirpath, _, files in os.walk(root):
+        for f in files:
+            if f.lower().endswith(".pdf"):
+                out.append(os.path.join(dirpath, f))
+    return sorted(out)
+
+
+def _fields_recovered(parsed: Dict[str, Any]) -> int:
+    return sum(1 for k, v in parsed.items() if k not in _NOT_FIELDS and v not in (None, "", []))
+
+
+def _run_backend(name: str, paths: List[str]) -> Dict[str, Any]:
+    """Child-process entry point: extract + parse every file with one backend."""
+    import logging
+    import resource
+    from extractors.pdfco import parse_bill_text
+    from extractors.text_model import join_pages
+
+    logging.disable(logging.WARNING)
+    backend = get_backend(name)
+    result: Dict[str, Any] = {"backend": name, "pages": 0, "seconds": 0.0, "errors": 0, "fields": {}}
+    for path in paths:
+        with open(path, "rb") as fh:
+            pdf_bytes = fh.read()
+        try:
+            t0 = time.perf_counter()
+            pages = backend.extract_range(pdf_bytes)
+            result["seconds"] += time.perf_counter() - t0
+            result["pages"] += len(pages)
+            result["fields"][path] = _fields_recovered(parse_bill_text(join_pages(pages)))
+        except Exception:
+            result["errors"] += 1
+            result["fields"][path] = 0
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    result["peak_rss_mb"] = round(rss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+    return result
+
+
+def bakeoff(corpus_dir: str, backends: List[str]) -> List[Dict[str, Any]]:
+    paths = _corpus(corpus_dir)
+    if not paths:
+        raise SystemExit(f"No PDFs found under {corpus_dir}")
+
+    ctx = multiprocessing.get_context("spawn")
+    results: List[Dict[str, Any]] = []
+    for name in backends:
+        with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as ex:
+            results.append(ex.submit(_run_backend, name, paths).result())
+
+    best = {p: max(r["fields"].get(p, 0) for r in results) for p in paths}
+    for r in results:
+        r["files"] = len(paths)
+        r["pages_per_sec"] = round(r["pages"] / r["seconds"], 1) if r["seconds"] else None
+        r["fields_total"] = sum(r["fields"].values())
+        r["lost"] = sum(1 for p in paths if r["fields"].get(p, 0) < best[p])
+        r["seconds"] = round(r["seconds"], 2)
+    return sorted(results, key=lambda r: (r["lost"], -(r["pages_per_sec"] or 0)))
+
+
+def main(argv: List[str] | None = None) -> None:
+    ap = argparse.ArgumentParser(description="Compare local PDF text backends on a corpus")
+    ap.add_argument("corpus", help="directory containing PDFs (searched recursively)")
+    ap.add_argument("--backends", help=f"comma list (known: {', '.join(BACKENDS)}); default: all available")
+    ap.add_argument("--json", action="store_true", help="print JSON instead of a table")
+    args = ap.parse_args(argv)
+
+    names = [b.strip() for b in args.backends.split(",")] if args.backends else available_backends()
+    if not names:
+        raise SystemExit("No PDF text backends are installed")
+    missing = [n for n in names if not get_backend(n).available()]
+    if missing:
+        raise SystemExit(f"Backend(s) not installed: {', '.join(missing)}")
+
+    results = bakeoff(args.corpus, names)
+    if args.json:
+        print(json.dumps([{k: v for k, v in r.items() if k != "fields"} for r in results], indent=2))
+        return
+
+    print(f"{'backend':<12}{'files':>7}{'pages':>8}{'pages/s':>10}{'peak MB':>10}{'fields':>9}{'lost':>6}{'errors':>8}")
+    for r in results:
+        print(
+            f"{r['backend']:<12}{r['files']:>7}{r['pages']:>8}{(r['pages_per_sec'] or 0):>10}"
+            f"{r['peak_rss_mb']:>10}{r['fields_total']:>9}{r['lost']:>6}{r['errors']:>8}"
+        )
+
+
+if __name__ == "__main__":
+    main()
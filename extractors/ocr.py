@@ -0,0 +1,252 @@
+"""
+Local OCR for scanned (image-only) bills: PDF -> page images -> Tesseract -> text.
+
+Runs poppler's `pdftoppm` to rasterise pages and `tesseract` to read them,
+both as subprocesses. OCR work goes through ONE process-wide pool of
+OCR_WORKERS threads (each thread waits on a single-threaded tesseract
+process), so OCR CPU use is capped no matter how many requests arrive.
+Pages are OCR'd in parallel, up to OCR_MAX_PAGES per document.
+
+OCR text is cached on disk by PDF SHA-256 (+ DPI, language, page limit), so
+a retry or the OpenAI fallback never OCRs the same scan twice. A hit
+refreshes the entry's mtime; at most every OCR_CACHE_PRUNE_SEC a write also
+prunes the cache: entries unused for OCR_CACHE_MAX_AGE_DAYS go first, then
+the least recently used until it fits in OCR_CACHE_MAX_MB.
+
+Env:
+  OCR_ENABLED (optional, default: false)
+  OCR_WORKERS (optional, default: 2)
+  OCR_DPI (optional, default: 300)
+  OCR_MAX_PAGES (optional, default: 10)
+  OCR_LANG (optional, default: eng)
+  OCR_TIMEOUT (optional, seconds per page, default: 120)
+  OCR_CACHE_DIR (optional, default: <tmp>/bill-ocr-cache)
+  OCR_CACHE_MAX_MB (optional, default: 512)
+  OCR_CACHE_MAX_AGE_DAYS (optional, default: 30)
+  OCR_CACHE_PRUNE_SEC (optional, default: 600)
+
+Deps (system):
+  tesseract-ocr
+  poppler-utils (pdftoppm, pdfinfo)
+"""
+
+from __future__ import annotations
+import os
+import time
+import shutil
+import hashlib
+import logging
+import tempfile
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from extractors.text_model import FORM_FEED, SOURCE_OCR, BillText
+
+logger = logging.getLogger(__name__)
+
+_POOL: Optional[ThreadPoolExecutor] = None
+_POOL_LOCK = threading.Lock()
+
+_PRUNE_LOCK = threading.Lock()
+_last_prune = 0.0
+
+
+def ocr_enabled() -> bool:
+    return os.getenv("OCR_ENABLED", "false").strip().lower() in ("1", "true", "yes", "on")
+
+
+def ocr_available() -> bool:
+    return ocr_enabled() and all(shutil.which(b) for b in ("tesseract", "pdftoppm", "pdfinfo"))
+
+
+def _settings() -> Dict[str, Any]:
+    return {
+        "dpi": int(os.getenv("OCR_DPI", "300")),
+        "max_pages": int(os.getenv("OCR_MAX_PAGES", "10")),
+        "lang": os.getenv("OCR_LANG", "eng"),
+        "timeout": int(os.getenv("OCR_TIMEOUT", "120")),
+    }
+
+
+def _pool() -> ThreadPoolExecutor:
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is None:
+            _POOL = ThreadPoolExecutor(
+                max_workers=max(1, int(os.getenv("OCR_WORKERS", "2"))),
+                thread_name_prefix="ocr",
+            )
+        return _POOL
+
+
+# ------------------------------
+# Cache
+# ------------------------------
+def _cache_root() -> str:
+    return os.getenv("OCR_CACHE_DIR") or os.path.join(tempfile.gettempdir(), "bill-ocr-cache")
+
+
+def _cache_path(sha: str, cfg: Dict[str, Any]) -> str:
+    name = f"{sha}-{cfg['dpi']}-{cfg['lang']}-{cfg['max_pages']}.txt"
+    return os.path.join(_cache_root(), sha[:2], name)
+
+
+def _cache_get(path: str) -> Optional[BillText]:
+    try:
+        with open(path, "r", encoding="utf-8") as fh:
+            # pages are stored form-feed separated; rejoin them as a fresh OCR does
+            text = BillText(fh.read().split(FORM_FEED))
+            text.stats = {"source": SOURCE_OCR}
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logger.warning("OCR cache read failed (%s): %s", path, e)
+        return None
+    try:
+        os.utime(path)  # recently used: pruned last
+    except OSError:
+        pass
+    return text
+
+
+def _cache_put(path: str, text: BillText) -> None:
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as fh:
+            fh.write(FORM_FEED.join(text.pages))
+        os.replace(tmp, path)
+    except Exception as e:
+        logger.warning("OCR cache write failed (%s): %s", path, e)
+    _maybe_prune()
+
+
+def prune_cache(dry_run: bool = False) -> Dict[str, int]:
+    """Drop entries older than OCR_CACHE_MAX_AGE_DAYS, then the oldest beyond OCR_CACHE_MAX_MB."""
+    max_bytes = float(os.getenv("OCR_CACHE_MAX_MB", "512")) * 1024 * 1024
+    cutoff = time.time() - float(os.getenv("OCR_CACHE_MAX_AGE_DAYS", "30")) * 86400
+    entries = []
+    for dirpath, _, filenames in os.walk(_cache_root()):
+        for name in filenames:
+            path = os.path.join(dirpath, name)
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+    entries.sort()  # least recently used first
+    total = sum(size for _, size, _ in entries)
+    out = {"kept": 0, "removed": 0, "bytes_freed": 0}
+    for mtime, size, path in entries:
+        if mtime >= cutoff and total <= max_bytes:
+            out["kept"] += 1
+            continue
+        total -= size
+        out["removed"] += 1
+        out["bytes_freed"] += size
+        if not dry_run:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+    if out["removed"]:
+        logger.info("OCR cache prune%s: %s", " (dry run)" if dry_run else "", out)
+    return out
+
+
+def _maybe_prune() -> None:
+    global _last_prune
+    every = float(os.getenv("OCR_CACHE_PRUNE_SEC", "600"))
+    with _PRUNE_LOCK:
+        if time.time() - _last_prune < every:
+            return
+        _last_prune = time.time()
+    try:
+        prune_cache()
+    except Exception as e:
+        logger.warning("OCR cache prune failed: %s", e)
+
+
+# ------------------------------
+# Subprocess steps
+# ------------------------------
+def _page_count(pdf_path: str) -> int:
+    out = subprocess.run(
+        ["pdfinfo", pdf_path], capture_output=True, check=True, timeout=60,
+    ).stdout.decode("utf-8", "replace")
+    for line in out.splitlines():
+        if line.startswith("Pages:"):
+            return int(line.split(":", 1)[1])
+    return 0
+
+
+def _ocr_page(pdf_path: str, workdir: str, page_no: int, cfg: Dict[str, Any]) -> str:
+    """Rasterise one page (1-based) and OCR it. Runs on the bounded pool."""
+    root = os.path.join(workdir, f"p{page_no}")
+    subprocess.run(
+        ["pdftoppm", "-r", str(cfg["dpi"]), "-gray", "-png", "-singlefile",
+         "-f", str(page_no), "-l", str(page_no), pdf_path, root],
+        capture_output=True, check=True, timeout=cfg["timeout"],
+    )
+    env = dict(os.environ, OMP_THREAD_LIMIT="1")  # one core per tesseract
+    out = subprocess.run(
+        ["tesseract", root + ".png", "stdout", "-l", cfg["lang"],
+         "-c", "preserve_interword_spaces=1"],
+        capture_output=True, check=True, timeout=cfg["timeout"], env=env,
+    )
+    try:
+        os.remove(root + ".png")
+    except OSError:
+        pass
+    return out.stdout.decode("utf-8", "replace")
+
+
+def ocr_pdf_to_text(pdf_bytes: bytes) -> BillText:
+    """OCR up to OCR_MAX_PAGES pages (in parallel on the shared pool), cached by PDF hash."""
+    if not ocr_available():
+        raise RuntimeError("Local OCR is not enabled or tesseract/poppler are not installed")
+
+    cfg = _settings()
+    sha = hashlib.sha256(pdf_bytes).hexdigest()
+    cache = _cache_path(sha, cfg)
+    cached = _cache_get(cache)
+    if cached is not None:
+        logger.info("OCR cache hit: %s", sha[:12])
+        return cached
+
+    with tempfile.TemporaryDirectory(prefix="bill-ocr-") as workdir:
+        pdf_path = os.path.join(workdir, "bill.pdf")
+        with open(pdf_path, "wb") as fh:
+            fh.write(pdf_bytes)
+
+        page_count = _page_count(pdf_path)
+        pages_to_read = min(page_count, cfg["max_pages"])
+        if page_count > pages_to_read:
+            logger.warning("OCR limited to %d of %d pages", pages_to_read, page_count)
+
+        futures = [_pool().submit(_ocr_page, pdf_path, workdir, n, cfg) for n in range(1, pages_to_read + 1)]
+        pages: List[str] = [f.result() for f in futures]
+
+    text = BillText(pages)
+    text.stats = {"source": SOURCE_OCR}
+    if not text.strip():
+        raise RuntimeError("OCR produced no text")
+    _cache_put(cache, text)
+    return text
+
+
+class OCRExtractor:
+    """Local OCR + regex parsing; returns the same schema as pdfco.py::parse_bill_text."""
+
+    def extract(self, pdf_bytes: bytes) -> Dict[str, Any]:
+        return self.extract_text(ocr_pdf_to_text(pdf_bytes))
+
+    def extract_text(self, text: str, vendor: Optional[str] = None) -> Dict[str, Any]:
+        from extractors.pdfco import parse_bill_text
+
+        data = parse_bill_text(text, vendor)
+        if not any([data.get("total_amount_due"), data.get("account_number"), data.get("provider_name")]):
+            raise ValueError("OCR text parsed but no key fields found")
+        return data
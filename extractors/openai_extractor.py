@@ -2,8 +2,11 @@
 OpenAI text-based extractor for utility bills (PDF -> text -> JSON)
 
 - Uses Chat Completions JSON mode (no Responses API)
-- Extracts PDF text locally (pdfplumber -> PyPDF2 fallback)
+- Extracts PDF text locally (pdfplumber -> PyPDF2 fallback, page-parallel; see pdf_text.py)
+- Image-only PDFs use local OCR text when OCR_ENABLED (see ocr.py)
 - Returns SAME schema as pdfco.py::parse_bill_text
+- The openai SDK is imported on first use (it dominates import time); one
+  client per key is shared, so its HTTP connections are reused
 
 Env:
   OPENAI_API_KEY (required)
@@ -14,16 +17,19 @@ Deps:
   openai>=1.13,<2
   pdfplumber>=0.11.0
   PyPDF2>=3.0.0
+  (optional faster text backends: pypdfium2, PyMuPDF, poppler-utils)
 """
 
 from __future__ import annotations
-import io
 import os
 import json
 import logging
-from typing import Any, Dict, List, Optional
+import threading
+from typing import Any, Dict, List, Optional, Tuple
 
-from openai import OpenAI
+from extractors.ocr import ocr_available, ocr_pdf_to_text
+from extractors.pdf_probe import ImageOnlyPDF
+from extractors.pdf_text import pdf_to_text as _pdf_to_text
 
 logger = logging.getLogger(__name__)
 
@@ -89,31 +95,19 @@ Rules:
 - Include all keys even if null.
 """
 
-def _pdf_to_text(pdf_bytes: bytes) -> str:
-    """pdfplumber first, then PyPDF2 fallback."""
-    try:
-        import pdfplumber  # type: ignore
-        pages: List[str] = []
-        with pdfplumber.open(io.BytesIO(pdf_bytes)) as pdf:
-            for p in pdf.pages:
-                pages.append(p.extract_text() or "")
-        txt = "\n".join(pages).strip()
-        if txt:
-            return txt
-        logger.warning("pdfplumber returned empty; falling back to PyPDF2")
-    except Exception as e:
-        logger.warning("pdfplumber failed (%s); falling back to PyPDF2", e)
-
-    try:
-        from PyPDF2 import PdfReader  # type: ignore
-        reader = PdfReader(io.BytesIO(pdf_bytes))
-        txt = "\n".join([(p.extract_text() or "") for p in reader.pages]).strip()
-        if not txt:
-            raise RuntimeError("Empty text after PyPDF2")
-        return txt
-    except Exception as e:
-        logger.error("PyPDF2 failed: %s", e)
-        raise RuntimeError("Unable to read PDF text") from e
+_CLIENTS: Dict[Tuple[str, Optional[str]], Any] = {}
+_CLIENTS_LOCK = threading.Lock()
+
+
+def client(api_key: str, org: Optional[str] = None):
+    """Shared OpenAI client for (key, org); imports the SDK the first time."""
+    with _CLIENTS_LOCK:
+        c = _CLIENTS.get((api_key, org))
+        if c is None:
+            from openai import OpenAI
+            c = _CLIENTS[(api_key, org)] = OpenAI(api_key=api_key, organization=org)
+        return c
+
 
 class OpenAIExtractor:
     """OpenAI Chat JSON-mode extractor producing pdfco-compatible schema."""
@@ -122,12 +116,21 @@ class OpenAIExtractor:
         key = api_key or os.getenv("OPENAI_API_KEY", "")
         if not key:
             raise RuntimeError("OPENAI_API_KEY is not set")
-        self.client = OpenAI(api_key=key, organization=org or os.getenv("OPENAI_ORG"))
+        self.client = client(key, org or os.getenv("OPENAI_ORG"))
         self.model = model or os.getenv("OPENAI_CHAT_MODEL", "gpt-4o-mini")
 
     def extract(self, pdf_content: bytes) -> Dict[str, Any]:
-        bill_text = _pdf_to_text(pdf_content)
-
+        try:
+            bill_text = _pdf_to_text(pdf_content)
+        except ImageOnlyPDF:
+            if not ocr_available():
+                raise
+            logger.info("Image-only PDF -> local OCR text")
+            bill_text = ocr_pdf_to_text(pdf_content)
+        return self.extract_text(bill_text)
+
+    def extract_text(self, bill_text: str) -> Dict[str, Any]:
+        """Same as extract() for text that is already extracted (e.g. one split-out account)."""
         try:
             resp = self.client.chat.completions.create(
                 model=self.model,
@@ -202,6 +205,8 @@ class OpenAIExtractor:
             "meters": self._normalize_meters(parsed.get("meters")),
             "confidence": 0.80,
             "raw_text_sample": bill_text[:2000],
+            "source_text": bill_text,
+            "text_extraction": dict(getattr(bill_text, "stats", {}) or {}),
         }
 
     @staticmethod
@@ -0,0 +1,162 @@
+"""
+Cheap text-layer probe: is this PDF text, mixed, or image-only (scanned)?
+
+Instead of running full text extraction over every page (and again with the
+PyPDF2 fallback) just to find out a scan has no text, this looks at a few
+sampled pages' resources and content streams:
+
+  - text page:  the page (or a form XObject it draws) has fonts AND the
+                content stream shows text-showing operators (Tj / TJ)
+  - image page: no text, but image XObjects are painted
+
+Sampled: the first PDF_PROBE_PAGES pages plus the middle and last page.
+Classification (blank pages ignored): only text pages -> "text"; only image
+pages -> "image"; both -> "mixed"; neither -> "blank" (extraction runs as for
+text and finds nothing, rather than sending an empty document to OCR).
+
+Env:
+  PDF_PROBE_PAGES (optional, default: 3)
+
+Deps:
+  PyPDF2>=3.0.0
+"""
+
+from __future__ import annotations
+import os
+import re
+import time
+import logging
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, List
+
+from extractors.text_backends import pdf_stream
+
+logger = logging.getLogger(__name__)
+
+TEXT = "text"
+MIXED = "mixed"
+IMAGE = "image"
+BLANK = "blank"
+
+# "(...) Tj", "[...] TJ", "<...> Tj"
+_TEXT_OP = re.compile(rb"[\)\]>]\s*T[jJ]\b")
+
+
+class ImageOnlyPDF(RuntimeError):
+    """Raised instead of running full text extraction on a scanned PDF."""
+
+
+@dataclass
+class PdfProbe:
+    kind: str
+    page_count: int
+    sampled: List[int] = field(default_factory=list)
+    text_pages: int = 0
+    image_pages: int = 0
+    elapsed_ms: float = 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+def _sample(page_count: int, first: int) -> List[int]:
+    idx = list(range(min(first, page_count)))
+    for i in (page_count // 2, page_count - 1):
+        if 0 <= i < page_count and i not in idx:
+            idx.append(i)
+    return idx
+
+
+def _xobjects(resources: Any) -> List[Any]:
+    try:
+        xo = resources.get("/XObject") if resources else None
+        return [xo[k].get_object() for k in xo] if xo else []
+    except Exception:
+        return []
+
+
+def _stream_has_text(resources: Any, data: bytes) -> bool:
+    return bool(resources and resources.get("/Font") and _TEXT_OP.search(data or b""))
+
+
+def _forms_have_text(resources: Any, depth: int = 0) -> bool:
+    """Text drawn inside form XObjects never shows up in the page stream."""
+    if depth >= 2:
+        return False
+    for xo in _xobjects(resources):
+        if xo.get("/Subtype") != "/Form":
+            continue
+        res = xo.get("/Resources")
+        res = res.get_object() if res is not None else None
+        try:
+            data = xo.get_data()
+        except Exception:
+            data = b""
+        if _stream_has_text(res, data) or _forms_have_text(res, depth + 1):
+            return True
+    return False
+
+
+def _has_images(resources: Any, depth: int = 0) -> bool:
+    for xo in _xobjects(resources):
+        sub = xo.get("/Subtype")
+        if sub == "/Image":
+            return True
+        if sub == "/Form" and depth < 2:
+            res = xo.get("/Resources")
+            if _has_images(res.get_object() if res is not None else None, depth + 1):
+                return True
+    return False
+
+
+def _page_kind(page: Any) -> str:
+    resources = page.get("/Resources")
+    resources = resources.get_object() if resources is not None else None
+    try:
+        contents = page.get_contents()
+        data = contents.get_data() if contents is not None else b""
+    except Exception:
+        data = b""
+    if _stream_has_text(resources, data) or _forms_have_text(resources):
+        return TEXT
+    return IMAGE if _has_images(resources) else BLANK
+
+
+def probe_pdf(pdf_bytes: bytes, sample_pages: int | None = None) -> PdfProbe:
+    """Classify `pdf_bytes` as "text", "mixed", "image" or "blank" from a few sampled pages."""
+    from PyPDF2 import PdfReader  # type: ignore
+
+    t0 = time.perf_counter()
+    first = sample_pages or int(os.getenv("PDF_PROBE_PAGES", "3"))
+    reader = PdfReader(pdf_stream(pdf_bytes))
+    page_count = len(reader.pages)
+    sampled = _sample(page_count, first)
+
+    text_pages = image_pages = 0
+    for i in sampled:
+        try:
+            kind = _page_kind(reader.pages[i])
+        except Exception as e:
+            logger.debug("probe: page %s unreadable (%s)", i, e)
+            kind = BLANK
+        if kind == TEXT:
+            text_pages += 1
+        elif kind == IMAGE:
+            image_pages += 1
+
+    # Blank pages (separators, "this page intentionally left blank") don't vote
+    if text_pages == 0:
+        kind = IMAGE if image_pages else BLANK
+    elif image_pages == 0:
+        kind = TEXT
+    else:
+        kind = MIXED
+
+    return PdfProbe(
+        kind=kind,
+        page_count=page_count,
+        sampled=sampled,
+        text_pages=text_pages,
+        image_pages=image_pages,
+        elapsed_ms=round((time.perf_counter() - t0) * 1000, 2),
+    )
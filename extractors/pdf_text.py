@@ -0,0 +1,178 @@
+"""
+Local PDF -> text, page-parallel for long statements, over pluggable backends.
+
+Text-extracting libraries (pdfplumber in particular) are CPU-bound, so large
+statements are split into page ranges and fanned out to a process pool.
+Each worker reopens the document from the PDF bytes and returns its pages;
+the parent reassembles them in page order. Small documents stay serial
+(pool overhead dominates).
+
+The backend is chosen per call, per vendor or globally (see text_backends.py).
+When the chosen backend yields no text, the PyPDF2 fallback runs, as before.
+Scanned (image-only) PDFs are recognised up front by pdf_probe.py and raise
+ImageOnlyPDF before any page is extracted.
+
+Env:
+  PDF_TEXT_BACKEND (optional, default: pdfplumber)
+  PDF_TEXT_VENDOR_BACKENDS (optional, e.g. "txu=pdfium")
+  PDF_TEXT_WORKERS (optional, default: CPU count)
+  PDF_TEXT_PARALLEL_MIN_PAGES (optional, default: 12)
+"""
+
+from __future__ import annotations
+import os
+import time
+import logging
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, List, Optional, Tuple
+
+from extractors.pdf_probe import IMAGE, ImageOnlyPDF, PdfProbe, probe_pdf
+from extractors.text_backends import (
+    FALLBACK_BACKEND,
+    TextBackend,
+    get_backend,
+    global_backend,
+    vendor_backends,
+)
+from extractors.text_model import SOURCE_LOCAL, BillText, join_pages
+
+logger = logging.getLogger(__name__)
+
+_POOL: Optional[ProcessPoolExecutor] = None
+_POOL_LOCK = threading.Lock()
+
+
+def _workers() -> int:
+    return max(1, int(os.getenv("PDF_TEXT_WORKERS", "0") or 0) or (os.cpu_count() or 1))
+
+
+def _parallel_min_pages() -> int:
+    return max(1, int(os.getenv("PDF_TEXT_PARALLEL_MIN_PAGES", "12")))
+
+
+def _pool() -> ProcessPoolExecutor:
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is None:
+            _POOL = ProcessPoolExecutor(max_workers=_workers())
+        return _POOL
+
+
+def _reset_pool() -> None:
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is not None:
+            _POOL.shutdown(wait=False, cancel_futures=True)
+        _POOL = None
+
+
+def _chunks(page_count: int, workers: int) -> List[Tuple[int, int]]:
+    size = max(1, -(-page_count // workers))
+    return [(i, min(i + size, page_count)) for i in range(0, page_count, size)]
+
+
+def _extract_range(backend_name: str, pdf_bytes: bytes, start: int, stop: int) -> List[str]:
+    """Worker entry point: reopen the document and extract pages [start, stop)."""
+    return get_backend(backend_name).extract_range(pdf_bytes, start, stop)
+
+
+def extract_pages(backend: TextBackend, pdf_bytes: bytes, stats: Dict[str, Any]) -> List[str]:
+    """All pages via `backend`, fanned out to the pool above the page threshold."""
+    page_count = backend.page_count(pdf_bytes)
+    stats.update(page_count=page_count, mode="serial", workers=1, backend=backend.name)
+    workers = min(_workers(), page_count)
+    if page_count < _parallel_min_pages() or workers < 2:
+        return backend.extract_range(pdf_bytes, 0, page_count)
+
+    ranges = _chunks(page_count, workers)
+    try:
+        futures = [_pool().submit(_extract_range, backend.name, pdf_bytes, a, b) for a, b in ranges]
+        pages: List[str] = []
+        for f in futures:
+            pages.extend(f.result())
+    except BrokenProcessPool as e:
+        logger.warning("PDF text pool broken (%s); extracting serially", e)
+        _reset_pool()
+        return backend.extract_range(pdf_bytes, 0, page_count)
+
+    stats.update(mode="parallel", workers=len(ranges))
+    return pages
+
+
+def _vendor_backend(pdf_bytes: bytes, default: str) -> str:
+    """
+    Pick a vendor-preferred backend by fingerprinting page 1 only.
+    Skipped entirely unless some vendor declares a preference.
+    """
+    prefs = vendor_backends()
+    if not prefs:
+        return default
+    try:
+        from extractors.vendors import VENDOR_MODULES
+        from extractors.vendors.base import match_fingerprint
+        first = get_backend(default).extract_range(pdf_bytes, 0, 1)
+        fp = match_fingerprint(first[0] if first else "", [m.FINGERPRINT for m in VENDOR_MODULES])
+    except Exception as e:
+        logger.warning("Vendor backend probe failed (%s); using %s", e, default)
+        return default
+    choice = prefs.get(fp.name) if fp else None
+    if choice and choice != default and get_backend(choice).available():
+        logger.info("Text backend for %s: %s", fp.name, choice)
+        return choice
+    return default
+
+
+def pdf_to_text(pdf_bytes: bytes, backend: Optional[str] = None, probe: Optional[PdfProbe] = None) -> BillText:
+    """
+    Chosen backend first (explicit > vendor > global), then PyPDF2 fallback.
+    Page boundaries are kept. Pass `probe` when the caller already ran
+    probe_pdf() on these bytes.
+
+    The returned BillText carries `stats` (page_count, wall_ms, mode,
+    workers, backend) so the parallel threshold can be tuned from logs.
+    """
+    t0 = time.perf_counter()
+    stats: Dict[str, Any] = {"source": SOURCE_LOCAL}
+
+    if probe is None:
+        try:
+            probe = probe_pdf(pdf_bytes)
+        except Exception as e:
+            logger.warning("PDF probe failed (%s); extracting anyway", e)
+    if probe is not None:
+        stats["probe"] = probe.to_dict()
+    if probe is not None and probe.kind == IMAGE:
+        logger.warning("Image-only PDF (%s pages, probed in %.1f ms)", probe.page_count, probe.elapsed_ms)
+        raise ImageOnlyPDF("Unable to read PDF text (image-only PDF, no text layer)")
+
+    name = backend or _vendor_backend(pdf_bytes, global_backend())
+
+    txt: Optional[BillText] = None
+    try:
+        txt = join_pages(extract_pages(get_backend(name), pdf_bytes, stats))
+        if not txt.strip():
+            logger.warning("%s returned empty; falling back to PyPDF2", name)
+            txt = None
+    except Exception as e:
+        logger.warning("%s failed (%s); falling back to PyPDF2", name, e)
+
+    if txt is None and name != FALLBACK_BACKEND:
+        try:
+            txt = join_pages(extract_pages(get_backend(FALLBACK_BACKEND), pdf_bytes, stats))
+            if not txt.strip():
+                raise RuntimeError("Empty text after PyPDF2")
+        except Exception as e:
+            logger.error("PyPDF2 failed: %s", e)
+            raise RuntimeError("Unable to read PDF text") from e
+    if txt is None:
+        raise RuntimeError("Unable to read PDF text")
+
+    stats["wall_ms"] = round((time.perf_counter() - t0) * 1000, 1)
+    txt.stats = stats
+    logger.info(
+        "PDF text: %s pages in %.1f ms (%s, %s worker(s), %s)",
+        stats["page_count"], stats["wall_ms"], stats["mode"], stats["workers"], stats["backend"],
+    )
+    return txt
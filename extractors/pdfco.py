@@ -1,7 +1,10 @@
 # extractors/pdfco.py
-import os, re, logging, requests
+import os, re, logging, threading
 from typing import Dict, Any, List
 
+from extractors.text_backends import pdf_stream
+from extractors.text_model import SOURCE_PDFCO, BillText
+
 logger = logging.getLogger(__name__)
 
 PDFCO_BASE = "https://api.pdf.co/v1"
@@ -9,23 +12,37 @@ PDFCO_API_KEY = os.getenv("PDFCO_API_KEY", "ganeshraju@gmail.com_kTEordfTmPmBRfq
 
 # Vendor enhancement dispatcher (vendor-specific logic lives in vendor modules)
 try:
-    from extractors.vendors import apply_vendor_enhancements
+    from extractors.vendors import apply_vendor_enhancements, parser_version
 except Exception:
     apply_vendor_enhancements = None
+    parser_version = lambda name: None
+
+_SESSION = None
+_SESSION_LOCK = threading.Lock()
 
-def pdf_to_text(pdf_bytes: bytes) -> str:
+def session():
+    """Shared keep-alive session for PDF.co (requests is imported on first use)."""
+    global _SESSION
+    with _SESSION_LOCK:
+        if _SESSION is None:
+            import requests
+            _SESSION = requests.Session()
+        return _SESSION
+
+def pdf_to_text(pdf_bytes: bytes) -> BillText:
     if not PDFCO_API_KEY:
         raise RuntimeError("PDFCO_API_KEY not set")
-    up = requests.post(
+    http = session()
+    up = http.post(
         f"{PDFCO_BASE}/file/upload",
         headers={"x-api-key": PDFCO_API_KEY},
-        files={"file": ("bill.pdf", pdf_bytes, "application/pdf")},
+        files={"file": ("bill.pdf", pdf_stream(pdf_bytes), "application/pdf")},
         timeout=120,
     )
     up.raise_for_status()
     file_url = up.json()["url"]
 
-    conv = requests.post(
+    conv = http.post(
         f"{PDFCO_BASE}/pdf/convert/to/text",
         headers={"x-api-key": PDFCO_API_KEY, "Content-Type": "application/json"},
         json={"url": file_url, "inline": True},
@@ -35,7 +52,10 @@ def pdf_to_text(pdf_bytes: bytes) -> str:
     data = conv.json()
     if data.get("error"):
         raise RuntimeError(f"PDF.co convert error: {data.get('message')}")
-    return data.get("body", "") or ""
+    # Pages come back separated by form feeds; keep the boundaries.
+    txt = BillText.from_text(data.get("body", "") or "")
+    txt.stats = {"source": SOURCE_PDFCO}
+    return txt
 
 def _clean_amt(v: str | None) -> float | None:
     """Common numeric cleaner (safe across vendors)."""
@@ -59,7 +79,7 @@ def _find(pat: str, txt: str, flags=re.IGNORECASE):
 def _find_all(pat: str, txt: str, flags=re.IGNORECASE):
     return re.findall(pat, txt, flags)
 
-def parse_bill_text(txt: str) -> Dict[str, Any]:
+def parse_bill_text(txt: str, vendor_hint: str | None = None) -> Dict[str, Any]:
     # -----------------------------
     # Generic extraction ONLY.
     # Vendor-specific operations are applied via apply_vendor_enhancements().
@@ -205,17 +225,21 @@ def parse_bill_text(txt: str) -> Dict[str, Any]:
         "meters": meters if meters else None,
         "confidence": 0.7,
         "raw_text_sample": txt[:2000],
+        # full text; moved to bill_texts (compressed) when the bill is saved
+        "source_text": txt,
     }
 
     vendor = None
     if callable(apply_vendor_enhancements):
         try:
-            extracted, vendor = apply_vendor_enhancements(extracted, txt)
+            extracted, vendor = apply_vendor_enhancements(extracted, txt, vendor_hint)
         except Exception as e:
             logger.warning("Vendor enhancement failed: %s", e)
 
     if vendor:
         extracted["vendor_name"] = extracted.get("vendor_name") or vendor
+        extracted["vendor_key"] = vendor
+        extracted["vendor_parser_version"] = parser_version(vendor)
         logger.info("Fingerprint matched: %s", vendor)
 
     return extracted
@@ -225,8 +249,10 @@ class PDFcoExtractor:
         self.api_key = api_key or PDFCO_API_KEY
 
     def extract(self, pdf_bytes: bytes) -> Dict[str, Any]:
-        text = pdf_to_text(pdf_bytes)
-        data = parse_bill_text(text)
+        return self.extract_text(pdf_to_text(pdf_bytes))
+
+    def extract_text(self, text: str, vendor: str | None = None) -> Dict[str, Any]:
+        data = parse_bill_text(text, vendor)
         if not any([data.get("total_amount_due"), data.get("account_number"), data.get("provider_name")]):
             raise ValueError("Parsed text but no key fields found")
         return data
@@ -0,0 +1,164 @@
+"""
+Consolidated-statement splitter: one upload -> one sub-document per account.
+
+Portfolio statements (Metro Water, Arlington Utilities, City of Houston)
+bundle many accounts in one PDF, and the generic `_find` calls would only
+ever see the first one. Boundaries are found:
+
+  1. by page: each page belongs to the account number it shows (pages with
+     none belong to the previous account); pages listing many accounts are
+     summary pages and are left out of the per-account documents. Without a
+     vendor ACCOUNT_BOUNDARY pattern the generic one is used, and only
+     statements with SPLIT_GENERIC_MIN_ACCOUNTS or more accounts are split
+  2. by text: when a vendor module declares ACCOUNT_BOUNDARY, a new account
+     number inside the text starts a new sub-document (several accounts on
+     one page, or PDF.co text without page breaks)
+
+Sub-documents are parsed in parallel (process pool above a small count);
+each is parsed with the vendor fingerprint of the whole statement, since
+later pages usually lack the vendor header.
+
+Env:
+  SPLIT_WORKERS (optional, default: CPU count; 1 parses parts serially)
+  SPLIT_PARALLEL_MIN_PARTS (optional, default: 4)
+  SPLIT_GENERIC_MIN_ACCOUNTS (optional, default: 3)
+"""
+
+from __future__ import annotations
+import os
+import re
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, List, Optional, Tuple
+
+from extractors.text_model import BillText
+from extractors.vendors import VENDOR_MODULES, vendor_module
+from extractors.vendors.base import match_fingerprint
+
+logger = logging.getLogger(__name__)
+
+GENERIC_ACCOUNT = r"(?i)\bAccount\s*(?:Number|No\.?|#)\s*[:#]?\s*(\d[\d\-\.]{4,}\d)"
+
+# A page showing this many distinct accounts is a summary page
+SUMMARY_PAGE_ACCOUNTS = 3
+
+_POOL: Optional[ProcessPoolExecutor] = None
+_POOL_LOCK = threading.Lock()
+
+
+def _workers() -> int:
+    return max(1, int(os.getenv("SPLIT_WORKERS", "0") or 0) or (os.cpu_count() or 1))
+
+
+def _pool() -> ProcessPoolExecutor:
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is None:
+            _POOL = ProcessPoolExecutor(max_workers=_workers())
+        return _POOL
+
+
+def _key(acct: str) -> str:
+    return re.sub(r"[^0-9A-Za-z]", "", acct or "")
+
+
+def _accounts(pattern: str, txt: str) -> List[str]:
+    seen: "OrderedDict[str, None]" = OrderedDict()
+    for m in re.finditer(pattern, txt):
+        k = _key(m.group(1))
+        if len(k) >= 6:
+            seen.setdefault(k, None)
+    return list(seen)
+
+
+def _split_by_page(text: BillText, pattern: str, min_accounts: int = 2) -> List[BillText]:
+    groups: "OrderedDict[str, List[str]]" = OrderedDict()
+    leading: List[str] = []
+    current: Optional[str] = None
+    for page in text.pages:
+        accts = _accounts(pattern, page)
+        if len(accts) >= SUMMARY_PAGE_ACCOUNTS:
+            current = None
+            continue
+        if accts:
+            current = accts[0]
+        if current is None:
+            leading.append(page)
+        else:
+            groups.setdefault(current, []).append(page)
+
+    if len(groups) < max(2, min_accounts):
+        return [text]
+    parts = [BillText(pages, text.sep) for pages in groups.values()]
+    if leading:
+        # cover pages carry the statement header; give them to the first account
+        parts[0] = BillText(leading + list(parts[0].pages), text.sep)
+    return parts
+
+
+def _split_by_text(text: BillText, pattern: str) -> List[BillText]:
+    starts: List[int] = []
+    seen = set()
+    for m in re.finditer(pattern, text):
+        k = _key(m.group(1))
+        if len(k) < 6 or k in seen:
+            continue
+        seen.add(k)
+        starts.append(text.rfind("\n", 0, m.start()) + 1)
+
+    if len(starts) < 2:
+        return [text]
+    starts[0] = 0
+    bounds = starts + [len(text)]
+    return [text.slice(bounds[i], bounds[i + 1]) for i in range(len(starts))]
+
+
+def split_statement(text: str) -> Tuple[List[BillText], Optional[str]]:
+    """
+    Returns (sub_documents, vendor_fingerprint_name). A single-account bill
+    comes back as [text].
+    """
+    text = BillText.from_text(text)
+    fp = match_fingerprint(text, [m.FINGERPRINT for m in VENDOR_MODULES])
+    vendor = fp.name if fp else None
+    boundary = getattr(vendor_module(vendor), "ACCOUNT_BOUNDARY", None) if vendor else None
+
+    if boundary:
+        parts = _split_by_page(text, boundary)
+    else:
+        parts = _split_by_page(text, GENERIC_ACCOUNT, int(os.getenv("SPLIT_GENERIC_MIN_ACCOUNTS", "3")))
+    if len(parts) < 2 and boundary:
+        parts = _split_by_text(text, boundary)
+    if len(parts) > 1:
+        logger.info("Statement split into %d accounts (%s)", len(parts), vendor or "generic")
+        for p in parts:
+            p.stats = {"source": text.stats.get("source")}
+    return parts, vendor
+
+
+def parse_parts(parts: List[BillText], vendor: Optional[str]) -> List[Any]:
+    """
+    parse_bill_text over every sub-document, in parallel for larger statements.
+    A part that fails yields its exception instead of a dict.
+    """
+    from extractors.pdfco import parse_bill_text
+
+    if len(parts) < int(os.getenv("SPLIT_PARALLEL_MIN_PARTS", "4")) or _workers() < 2:
+        out: List[Any] = []
+        for p in parts:
+            try:
+                out.append(parse_bill_text(p, vendor))
+            except Exception as e:
+                out.append(e)
+        return out
+
+    futures = [_pool().submit(parse_bill_text, p, vendor) for p in parts]
+    results: List[Any] = []
+    for f in futures:
+        try:
+            results.append(f.result())
+        except Exception as e:
+            results.append(e)
+    return results
@@ -0,0 +1,223 @@
+"""
+Local PDF text backends.
+
+Every backend exposes the same two calls so pdf_text.py can fan page ranges
+out to workers regardless of the library underneath:
+
+  page_count(pdf_bytes) -> int
+  extract_range(pdf_bytes, start=0, stop=None) -> List[str]   (one string per page)
+
+Backends:
+  pdfplumber  pure Python (pdfminer); the historical default
+  pypdf2      pure Python; the historical fallback
+  pdfium      pypdfium2 (C, Chrome's PDFium)
+  pymupdf     PyMuPDF / fitz (C, MuPDF)
+  poppler     poppler-utils `pdftotext -layout` subprocess (C)
+
+Selection (see pdf_text.py):
+  PDF_TEXT_BACKEND          global backend (default: pdfplumber)
+  PDF_TEXT_VENDOR_BACKENDS  per-vendor overrides, e.g. "txu=pdfium,houston_water=poppler"
+  VendorFingerprint.text_backend  per-vendor default declared in a vendor module
+
+`pdf_bytes` may also be a memory-mapped blob from the PDF store
+(pipeline/blobs.py); pdf_stream() reads it in place instead of copying.
+
+Use `python -m extractors.bakeoff <corpus_dir>` to compare them.
+"""
+
+from __future__ import annotations
+import io
+import os
+import mmap
+import shutil
+import logging
+import subprocess
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BACKEND = "pdfplumber"
+FALLBACK_BACKEND = "pypdf2"
+
+
+def pdf_stream(pdf_bytes):
+    """File object over PDF bytes; a mapped blob is rewound and read in place."""
+    if isinstance(pdf_bytes, mmap.mmap):
+        pdf_bytes.seek(0)
+        return pdf_bytes
+    return io.BytesIO(pdf_bytes)
+
+
+def _plain_bytes(pdf_bytes) -> bytes:
+    """For libraries that only accept `bytes`."""
+    return pdf_bytes[:] if isinstance(pdf_bytes, mmap.mmap) else pdf_bytes
+
+
+class TextBackend(ABC):
+    """Base class: subclasses set `name`/`module` and implement the two calls."""
+
+    name = ""
+    module = ""
+
+    def available(self) -> bool:
+        try:
+            __import__(self.module)
+            return True
+        except Exception:
+            return False
+
+    @abstractmethod
+    def page_count(self, pdf_bytes: bytes) -> int:
+        ...
+
+    @abstractmethod
+    def extract_range(self, pdf_bytes: bytes, start: int = 0, stop: Optional[int] = None) -> List[str]:
+        ...
+
+
+class PdfPlumberBackend(TextBackend):
+    name = "pdfplumber"
+    module = "pdfplumber"
+
+    def page_count(self, pdf_bytes: bytes) -> int:
+        import pdfplumber  # type: ignore
+        with pdfplumber.open(pdf_stream(pdf_bytes)) as pdf:
+            return len(pdf.pages)
+
+    def extract_range(self, pdf_bytes: bytes, start: int = 0, stop: Optional[int] = None) -> List[str]:
+        import pdfplumber  # type: ignore
+        with pdfplumber.open(pdf_stream(pdf_bytes)) as pdf:
+            pages = pdf.pages[start:stop]
+            return [(p.extract_text() or "") for p in pages]
+
+
+class PyPDF2Backend(TextBackend):
+    name = "pypdf2"
+    module = "PyPDF2"
+
+    def page_count(self, pdf_bytes: bytes) -> int:
+        from PyPDF2 import PdfReader  # type: ignore
+        return len(PdfReader(pdf_stream(pdf_bytes)).pages)
+
+    def extract_range(self, pdf_bytes: bytes, start: int = 0, stop: Optional[int] = None) -> List[str]:
+        from PyPDF2 import PdfReader  # type: ignore
+        reader = PdfReader(pdf_stream(pdf_bytes))
+        stop = len(reader.pages) if stop is None else min(stop, len(reader.pages))
+        return [(reader.pages[i].extract_text() or "") for i in range(start, stop)]
+
+
+class PdfiumBackend(TextBackend):
+    name = "pdfium"
+    module = "pypdfium2"
+
+    def page_count(self, pdf_bytes: bytes) -> int:
+        import pypdfium2 as pdfium  # type: ignore
+        doc = pdfium.PdfDocument(pdf_bytes)
+        try:
+            return len(doc)
+        finally:
+            doc.close()
+
+    def extract_range(self, pdf_bytes: bytes, start: int = 0, stop: Optional[int] = None) -> List[str]:
+        import pypdfium2 as pdfium  # type: ignore
+        doc = pdfium.PdfDocument(pdf_bytes)
+        try:
+            stop = len(doc) if stop is None else min(stop, len(doc))
+            out: List[str] = []
+            for i in range(start, stop):
+                page = doc[i]
+                textpage = page.get_textpage()
+                out.append((textpage.get_text_range() or "").replace("\r\n", "\n"))
+                textpage.close()
+                page.close()
+            return out
+        finally:
+            doc.close()
+
+
+class PyMuPDFBackend(TextBackend):
+    name = "pymupdf"
+    module = "fitz"
+
+    def page_count(self, pdf_bytes: bytes) -> int:
+        import fitz  # type: ignore
+        with fitz.open(stream=_plain_bytes(pdf_bytes), filetype="pdf") as doc:
+            return doc.page_count
+
+    def extract_range(self, pdf_bytes: bytes, start: int = 0, stop: Optional[int] = None) -> List[str]:
+        import fitz  # type: ignore
+        with fitz.open(stream=_plain_bytes(pdf_bytes), filetype="pdf") as doc:
+            stop = doc.page_count if stop is None else min(stop, doc.page_count)
+            return [(doc[i].get_text() or "") for i in range(start, stop)]
+
+
+class PopplerBackend(TextBackend):
+    """poppler-utils binaries; no Python bindings needed."""
+
+    name = "poppler"
+    module = ""
+
+    def available(self) -> bool:
+        return bool(shutil.which("pdftotext") and shutil.which("pdfinfo"))
+
+    def page_count(self, pdf_bytes: bytes) -> int:
+        out = subprocess.run(
+            ["pdfinfo", "-"], input=pdf_bytes, capture_output=True, check=True, timeout=60,
+        ).stdout.decode("utf-8", "replace")
+        for line in out.splitlines():
+            if line.startswith("Pages:"):
+                return int(line.split(":", 1)[1])
+        raise RuntimeError("pdfinfo did not report a page count")
+
+    def extract_range(self, pdf_bytes: bytes, start: int = 0, stop: Optional[int] = None) -> List[str]:
+        if stop is None:
+            stop = self.page_count(pdf_bytes)
+        if stop <= start:
+            return []
+        out = subprocess.run(
+            ["pdftotext", "-layout", "-enc", "UTF-8", "-f", str(start + 1), "-l", str(stop), "-", "-"],
+            input=pdf_bytes, capture_output=True, check=True, timeout=300,
+        ).stdout.decode("utf-8", "replace")
+        # pdftotext ends every page with a form feed
+        pages = out.split("\f")
+        return (pages + [""] * (stop - start))[: stop - start]
+
+
+BACKENDS: Dict[str, TextBackend] = {
+    b.name: b
+    for b in (PdfPlumberBackend(), PyPDF2Backend(), PdfiumBackend(), PyMuPDFBackend(), PopplerBackend())
+}
+
+
+def get_backend(name: str) -> TextBackend:
+    try:
+        return BACKENDS[name.strip().lower()]
+    except KeyError:
+        raise ValueError(f"Unknown PDF text backend: {name!r} (known: {', '.join(BACKENDS)})") from None
+
+
+def available_backends() -> List[str]:
+    return [name for name, b in BACKENDS.items() if b.available()]
+
+
+def global_backend() -> str:
+    return (os.getenv("PDF_TEXT_BACKEND", DEFAULT_BACKEND) or DEFAULT_BACKEND).strip().lower()
+
+
+def vendor_backends() -> Dict[str, str]:
+    """Per-vendor choices: fingerprint declarations, overridden by PDF_TEXT_VENDOR_BACKENDS."""
+    out: Dict[str, str] = {}
+    try:
+        from extractors.vendors import VENDOR_MODULES
+        for m in VENDOR_MODULES:
+            if getattr(m.FINGERPRINT, "text_backend", None):
+                out[m.FINGERPRINT.name] = m.FINGERPRINT.text_backend
+    except Exception as e:
+        logger.warning("Vendor backend preferences unavailable: %s", e)
+
+    for item in (os.getenv("PDF_TEXT_VENDOR_BACKENDS", "") or "").split(","):
+        if "=" in item:
+            vendor, backend = item.split("=", 1)
+            out[vendor.strip()] = backend.strip().lower()
+    return out
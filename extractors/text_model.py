@@ -0,0 +1,200 @@
+"""
+Page- and line-aware bill text.
+
+Both text paths (PDF.co convert-to-text and local pdfplumber/PyPDF2) used to
+flatten a PDF into one string. BillText keeps that string (it IS a str, so
+every existing `re.search(..., txt)` keeps working) but also remembers where
+each page starts and lets vendor enhancers scope a search:
+
+    search(r"Current\\s+Read\\s+Date\\s+(\\S+)", txt, page=0)
+    search(r"Previous\\s+Meter\\s+Reading\\s+(\\d+)", txt, after=r"Detailed\\s+Meter\\s+Usage")
+    search_each_page(r"Meter\\s+Serial\\s+#.*?\\n.*?\\n(\\S+)", txt, re.S)
+
+The helpers accept plain strings too; a plain string is treated as one page.
+Page numbers are 0-based (negative values count from the end).
+"""
+
+from __future__ import annotations
+import re
+from bisect import bisect_right
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+# PDF.co (like pdftotext) separates pages with a form feed.
+FORM_FEED = "\f"
+
+# stats["source"] of extracted text: which service/library produced it
+SOURCE_PDFCO, SOURCE_LOCAL, SOURCE_OCR = "pdfco", "local", "ocr"
+
+
+class BillText(str):
+    """Joined bill text plus page boundaries and lazily computed line offsets."""
+
+    def __new__(cls, pages: Sequence[str], sep: str = "\n"):
+        pages = tuple(p or "" for p in pages) or ("",)
+        obj = super().__new__(cls, sep.join(pages))
+        starts: List[int] = []
+        pos = 0
+        for p in pages:
+            starts.append(pos)
+            pos += len(p) + len(sep)
+        obj.pages = pages
+        obj.page_starts = tuple(starts)
+        obj.sep = sep
+        obj.stats = {}
+        obj._line_starts = None
+        return obj
+
+    def __reduce__(self):
+        # str subclasses pickle via str.__getnewargs__, which would hand the
+        # joined text to __new__ as if it were the page list.
+        return (_restore, (self.pages, self.sep, self.stats))
+
+    @classmethod
+    def from_text(cls, text: str, sep: str = FORM_FEED) -> "BillText":
+        """Split already-joined text on `sep` (PDF.co bodies use form feeds)."""
+        if isinstance(text, BillText):
+            return text
+        text = text or ""
+        if sep and sep in text:
+            return cls(text.split(sep), sep)
+        return cls([text], sep)
+
+    # ------------------------------
+    # Page addressing
+    # ------------------------------
+    @property
+    def page_count(self) -> int:
+        return len(self.pages)
+
+    def page(self, n: int) -> str:
+        return self.pages[n]
+
+    def page_span(self, n: int) -> Tuple[int, int]:
+        """(start, end) offsets of page `n` inside the joined text."""
+        if n < 0:
+            n += len(self.pages)
+        start = self.page_starts[n]
+        return start, start + len(self.pages[n])
+
+    def page_at(self, offset: int) -> int:
+        """Page index containing character `offset` of the joined text."""
+        return max(0, bisect_right(self.page_starts, offset) - 1)
+
+    def slice(self, start: int, end: int) -> "BillText":
+        """Characters [start, end) of the joined text, keeping the page breaks inside it."""
+        out: List[str] = []
+        for p, ps in zip(self.pages, self.page_starts):
+            a, b = max(start, ps), min(end, ps + len(p))
+            if a < b:
+                out.append(p[a - ps:b - ps])
+        return BillText(out, self.sep)
+
+    # ------------------------------
+    # Line addressing
+    # ------------------------------
+    def _lines(self) -> List[int]:
+        if self._line_starts is None:
+            starts = [0]
+            find = self.find
+            i = find("\n")
+            while i != -1:
+                starts.append(i + 1)
+                i = find("\n", i + 1)
+            self._line_starts = starts
+        return self._line_starts
+
+    @property
+    def line_count(self) -> int:
+        return len(self._lines())
+
+    def line_at(self, offset: int) -> int:
+        """0-based line number containing character `offset`."""
+        return max(0, bisect_right(self._lines(), offset) - 1)
+
+    def line_start(self, n: int) -> int:
+        return self._lines()[n]
+
+    # ------------------------------
+    # Scoped search
+    # ------------------------------
+    def scope(self, page: Optional[int] = None, after: Optional[str] = None,
+              before: Optional[str] = None, flags: int = re.IGNORECASE) -> str:
+        return scope(self, page=page, after=after, before=before, flags=flags)
+
+    def search(self, pattern: str, flags: int = 0, *, page: Optional[int] = None,
+               after: Optional[str] = None, before: Optional[str] = None) -> Optional[re.Match]:
+        return search(pattern, self, flags, page=page, after=after, before=before)
+
+
+def _restore(pages: Sequence[str], sep: str, stats: dict) -> BillText:
+    txt = BillText(pages, sep)
+    txt.stats = dict(stats or {})
+    return txt
+
+
+def text_source(txt: str) -> Optional[str]:
+    """SOURCE_* of a BillText, when the producer recorded it."""
+    return (getattr(txt, "stats", None) or {}).get("source")
+
+
+def pages_of(txt: str) -> Tuple[str, ...]:
+    """Pages of `txt`; a plain string is a single page."""
+    if isinstance(txt, BillText):
+        return txt.pages
+    return (txt or "",)
+
+
+def scope(txt: str, page: Optional[int] = None, after: Optional[str] = None,
+          before: Optional[str] = None, flags: int = re.IGNORECASE) -> str:
+    """
+    Narrow `txt` to one page and/or the region between two headings.
+
+    - page:   restrict to that page (ignored for plain strings, which have one page)
+    - after:  start right after the first match of this heading pattern
+    - before: stop at the first match of this pattern after the start
+
+    Returns "" when the `after` heading is missing so scoped searches stay
+    strictly local instead of silently widening to the whole document.
+    """
+    region = txt or ""
+    if page is not None and isinstance(txt, BillText):
+        try:
+            region = txt.page(page)
+        except IndexError:
+            return ""
+    if after:
+        m = re.search(after, region, flags)
+        if not m:
+            return ""
+        region = region[m.end():]
+    if before:
+        m = re.search(before, region, flags)
+        if m:
+            region = region[:m.start()]
+    return str(region)
+
+
+def search(pattern: str, txt: str, flags: int = 0, *, page: Optional[int] = None,
+           after: Optional[str] = None, before: Optional[str] = None) -> Optional[re.Match]:
+    """re.search over a scoped region of `txt` (see scope())."""
+    if page is None and after is None and before is None:
+        return re.search(pattern, txt or "", flags)
+    return re.search(pattern, scope(txt, page=page, after=after, before=before), flags)
+
+
+def search_each_page(pattern: str, txt: str, flags: int = 0) -> Optional[re.Match]:
+    """First match found within a single page; patterns never span a page break."""
+    for p in pages_of(txt):
+        m = re.search(pattern, p, flags)
+        if m:
+            return m
+    return None
+
+
+def join_pages(pages: Iterable[str], sep: str = "\n") -> BillText:
+    """Join extracted pages, trimming only the outer whitespace (like str.strip)."""
+    pages = [p or "" for p in pages]
+    if pages:
+        pages[0] = pages[0].lstrip()
+        pages[-1] = pages[-1].rstrip()
+    return BillText(pages, sep)
@@ -13,9 +13,26 @@ VENDOR_MODULES = [
     arlington_utilities,
                   ]
 
-def apply_vendor_enhancements(parsed: dict, txt: str):
+# Every vendor module declares PARSER_VERSION. Bump it whenever enhance()
+# output changes: bills record vendor_key + vendor_parser_version, and
+# `python -m pipeline.reparse --stale` re-parses only that vendor's bills.
+def parser_version(name: str):
+    m = vendor_module(name) if name else None
+    return getattr(m, "PARSER_VERSION", None) if m else None
+
+def parser_versions() -> dict:
+    return {m.FINGERPRINT.name: getattr(m, "PARSER_VERSION", 1) for m in VENDOR_MODULES}
+
+def vendor_module(name: str):
+    for m in VENDOR_MODULES:
+        if m.FINGERPRINT.name == name:
+            return m
+    return None
+
+def apply_vendor_enhancements(parsed: dict, txt: str, vendor: str = None):
+    """`vendor` forces a fingerprint (e.g. for one account split out of a consolidated statement)."""
     fps = [m.FINGERPRINT for m in VENDOR_MODULES]
-    fp = match_fingerprint(txt, fps)
+    fp = vendor_module(vendor).FINGERPRINT if vendor and vendor_module(vendor) else match_fingerprint(txt, fps)
     if not fp:
         return parsed, None
     for m in VENDOR_MODULES:
@@ -23,3 +40,17 @@ def apply_vendor_enhancements(parsed: dict, txt: str):
             return m.enhance(parsed, txt), fp.name
     return parsed, fp.name
 
+def warm() -> int:
+    """
+    Parse each vendor's own keywords once, forcing that vendor, so the generic
+    and vendor regexes are compiled (re's pattern cache) before the first bill.
+    """
+    from extractors.pdfco import parse_bill_text
+    n = 0
+    for m in VENDOR_MODULES:
+        try:
+            parse_bill_text("\n".join(m.FINGERPRINT.keywords), vendor_hint=m.FINGERPRINT.name)
+            n += 1
+        except Exception:
+            pass
+    return n
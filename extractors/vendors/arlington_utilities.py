@@ -1,6 +1,7 @@
 # extractors/vendors/arlington_utilities.py
 import re
 from .base import VendorFingerprint
+from ..text_model import search_each_page
 
 FINGERPRINT = VendorFingerprint(
     name="arlington_utilities",
@@ -16,6 +17,11 @@ FINGERPRINT = VendorFingerprint(
     expects_usage=True,
 )
 
+PARSER_VERSION = 1
+
+# Starts a new account in consolidated statements (see extractors/splitter.py)
+ACCOUNT_BOUNDARY = r"Account\s+Number\s+(\d[\d\-\.]{4,}\d)"
+
 def _money(val):
     if not val:
         return None
@@ -40,7 +46,7 @@ def enhance(parsed: dict, txt: str):
     # Property / Customer name (AUTHORITATIVE)
     # Appears under "Name and Service Address"
     # --------------------------------------------------
-    m = re.search(r"Name\s+and\s+Service\s+Address.*?\n([^\n]+)", txt, re.I | re.S)
+    m = search_each_page(r"Name\s+and\s+Service\s+Address.*?\n([^\n]+)", txt, re.I | re.S)
     if m:
         line = m.group(1)
 
@@ -1,6 +1,7 @@
 # extractors/vendors/atmos_energy.py
 import re
 from .base import VendorFingerprint
+from ..text_model import search_each_page
 
 FINGERPRINT = VendorFingerprint(
     name="atmos",
@@ -17,6 +18,8 @@ FINGERPRINT = VendorFingerprint(
     expects_usage=True,
 )
 
+PARSER_VERSION = 1
+
 def _money(val: str):
     if not val:
         return None
@@ -93,7 +96,7 @@ def enhance(parsed: dict, txt: str):
     # Meter Serial #
     # 12R100223
     # --------------------------------------------------
-    m = re.search(
+    m = search_each_page(
     r"Meter\s+Serial\s+#.*?\n.*?\n\s*([A-Z0-9]{6,})\s+\d{2}/\d{2}/\d{2,4}\s+\d{2}/\d{2}/\d{2,4}",
     txt,
     re.I | re.S,
@@ -105,7 +108,7 @@ def enhance(parsed: dict, txt: str):
     # --------------------------------------------------
     # Usage (CCF)
     # --------------------------------------------------
-    m = re.search(
+    m = search_each_page(
         r"Consumption\s+\(CCF\).*?\n\s*(\d+)",
         txt,
         re.I | re.S,
@@ -9,6 +9,7 @@ class VendorFingerprint:
     unit_type_hint: Optional[str] = None
     expects_meters: Optional[bool] = None
     expects_usage: Optional[bool] = None
+    text_backend: Optional[str] = None   # preferred local text backend (see text_backends.py)
 
     def score(self, txt_lower: str) -> int:
         return sum(1 for kw in self.keywords if kw.lower() in txt_lower)
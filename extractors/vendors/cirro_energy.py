@@ -17,6 +17,8 @@ FINGERPRINT = VendorFingerprint(
     expects_usage=True,
 )
 
+PARSER_VERSION = 1
+
 def _money(val):
     if not val:
         return None
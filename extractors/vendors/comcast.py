@@ -15,6 +15,8 @@ FINGERPRINT = VendorFingerprint(
     expects_usage=False,
 )
 
+PARSER_VERSION = 1
+
 MONTH_DATE = r"(?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)[a-z]*\s+\d{1,2},\s+\d{4}"
 
 def _money(val):
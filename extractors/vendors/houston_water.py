@@ -1,6 +1,7 @@
 # extractors/vendors/houston_water.py
 import re
 from .base import VendorFingerprint
+from ..text_model import scope, search_each_page
 
 FINGERPRINT = VendorFingerprint(
     name="houston_water",
@@ -17,6 +18,11 @@ FINGERPRINT = VendorFingerprint(
     expects_usage=True,
 )
 
+PARSER_VERSION = 1
+
+# Starts a new account in consolidated statements (see extractors/splitter.py)
+ACCOUNT_BOUNDARY = r"Account\s+Number:\s*(\d[\d\-]{4,}\d)"
+
 def _money(val):
     if not val:
         return None
@@ -72,7 +78,8 @@ def enhance(parsed: dict, txt: str):
     # -----------------------------------
     # Billing period (read dates)
     # -----------------------------------
-    m = re.search(
+    # (page-local: both read dates sit in the same meter table)
+    m = search_each_page(
         r"Previous\s+Read\s+Date\s+(\d{2}/\d{2}/\d{4}).*?Current\s+Read\s+Date\s+(\d{2}/\d{2}/\d{4})",
         txt,
         re.S,
@@ -90,8 +97,10 @@ def enhance(parsed: dict, txt: str):
         out["meters"] = [{"meter_number": m.group(1)}]
 
     # Usage = Current Meter Reading - Previous Meter Reading
-    prev_m = re.search(r"Previous\s+Meter\s+Reading\s+(\d+)", txt, re.I)
-    cur_m = re.search(r"Current\s+Meter\s+Reading\s+(\d+)", txt, re.I)
+    # Read from the "Detailed Meter Usage" section when it is present.
+    usage_txt = scope(txt, after=r"Detailed\s+Meter\s+Usage") or txt
+    prev_m = re.search(r"Previous\s+Meter\s+Reading\s+(\d+)", usage_txt, re.I)
+    cur_m = re.search(r"Current\s+Meter\s+Reading\s+(\d+)", usage_txt, re.I)
 
     if prev_m and cur_m:
         try:
@@ -17,6 +17,11 @@ FINGERPRINT = VendorFingerprint(
     expects_usage=True,
 )
 
+PARSER_VERSION = 1
+
+# Starts a new account in consolidated statements (see extractors/splitter.py)
+ACCOUNT_BOUNDARY = r"Account\s*Number[:\s]*([0-9]{6,})"
+
 def _money(val):
     if not val:
         return None
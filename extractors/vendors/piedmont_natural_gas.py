@@ -16,6 +16,8 @@ FINGERPRINT = VendorFingerprint(
     expects_usage=False,
 )
 
+PARSER_VERSION = 1
+
 def _money(val):
     if not val:
         return None
@@ -17,6 +17,8 @@ FINGERPRINT = VendorFingerprint(
     expects_usage=True,
 )
 
+PARSER_VERSION = 1
+
 def _money(val: str):
     if not val:
         return None
@@ -33,3 +33,198 @@ CREATE INDEX IF NOT EXISTS idx_bills_sha256 ON bills(sha256);
 CREATE INDEX IF NOT EXISTS idx_bills_provider ON bills(utility_provider);
 CREATE INDEX IF NOT EXISTS idx_bills_property ON bills(property_name);
 CREATE INDEX IF NOT EXISTS idx_bills_billing_date ON bills(billing_date);
+
+-- Full extracted text per bill and text source (pdfco/local/ocr), zlib-compressed,
+-- pages joined by form feeds. Lets bills be re-parsed without PDF.co/OpenAI.
+CREATE TABLE IF NOT EXISTS bill_texts (
+  bill_id INTEGER NOT NULL REFERENCES bills(id) ON DELETE CASCADE,
+  extractor VARCHAR(50) NOT NULL,
+  text_z BYTEA NOT NULL,
+  char_count INTEGER,
+  page_count INTEGER,
+  created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+  PRIMARY KEY (bill_id, extractor)
+);
+-- already compressed: store out of line without a second (pglz) compression pass
+ALTER TABLE bill_texts ALTER COLUMN text_z SET STORAGE EXTERNAL;
+-- separator the pages were joined with when parsed (text_z always uses form feeds)
+ALTER TABLE bill_texts ADD COLUMN IF NOT EXISTS page_sep VARCHAR(4);
+
+-- Vendor module + PARSER_VERSION that produced each bill (stale ones are re-parsed)
+ALTER TABLE bills ADD COLUMN IF NOT EXISTS vendor_key VARCHAR(50);
+ALTER TABLE bills ADD COLUMN IF NOT EXISTS vendor_parser_version INTEGER;
+CREATE INDEX IF NOT EXISTS idx_bills_vendor_version ON bills(vendor_key, vendor_parser_version)
+  WHERE vendor_key IS NOT NULL;
+
+-- Bulky raw_extracted_data parts (pdf_probe, text samples, large values) kept
+-- out of the hot bills row. Where each raw key is stored (app.split_raw):
+--   bills.raw_extracted_data  provenance and small fields no column stores
+--   bill_payloads.payload     pdf_probe, raw_text_sample and oversized values
+--   bills columns             values equal to their column are not repeated
+--   bill_texts                source_text (the full text; raw_text_sample is
+--                             then dropped from the payload)
+-- load_raw() returns row || payload, i.e. everything except the full text.
+CREATE TABLE IF NOT EXISTS bill_payloads (
+  bill_id INTEGER PRIMARY KEY REFERENCES bills(id) ON DELETE CASCADE,
+  payload JSONB NOT NULL,
+  updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- GET /bills: one composite index per dashboard filter, ending in the
+-- (billing_date, id) keyset so a filtered, dated page is an index range scan
+CREATE INDEX IF NOT EXISTS idx_bills_provider_billing ON bills(utility_provider, billing_date, id);
+CREATE INDEX IF NOT EXISTS idx_bills_property_billing ON bills(property_name, billing_date, id);
+CREATE INDEX IF NOT EXISTS idx_bills_type_billing ON bills(utility_type, billing_date, id);
+CREATE INDEX IF NOT EXISTS idx_bills_account_billing ON bills(account_number, billing_date, id);
+CREATE INDEX IF NOT EXISTS idx_bills_billing_id ON bills(billing_date, id);
+
+-- Cost/usage per property x utility_type x statement month, kept current by
+-- +/- deltas in the transaction that writes the bill (pipeline/rollups.py).
+-- Unknown property/type roll up under ''. Rebuild: python -m pipeline.rollups rebuild
+CREATE TABLE IF NOT EXISTS bill_rollups (
+  property_name VARCHAR(200) NOT NULL,
+  utility_type VARCHAR(50) NOT NULL,
+  month DATE NOT NULL,
+  bill_count INTEGER NOT NULL DEFAULT 0,
+  total_amount_due NUMERIC NOT NULL DEFAULT 0,
+  current_charges NUMERIC NOT NULL DEFAULT 0,
+  units_used NUMERIC NOT NULL DEFAULT 0,
+  water_charges NUMERIC NOT NULL DEFAULT 0,
+  sewer_charges NUMERIC NOT NULL DEFAULT 0,
+  storm_water_charges NUMERIC NOT NULL DEFAULT 0,
+  environmental_fee NUMERIC NOT NULL DEFAULT 0,
+  trash_charges NUMERIC NOT NULL DEFAULT 0,
+  gas_charges NUMERIC NOT NULL DEFAULT 0,
+  electric_charges NUMERIC NOT NULL DEFAULT 0,
+  updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+  PRIMARY KEY (property_name, utility_type, month)
+);
+
+-- Per-account usage/cost anomalies (pipeline/anomaly.py): largest |z| of
+-- units_used/total_amount_due against the account's rolling baseline
+ALTER TABLE bills ADD COLUMN IF NOT EXISTS anomaly_score DECIMAL(6,2);
+ALTER TABLE bills ADD COLUMN IF NOT EXISTS anomaly_flags TEXT[];
+CREATE INDEX IF NOT EXISTS idx_bills_anomalous ON bills(anomaly_score DESC)
+  WHERE cardinality(anomaly_flags) > 0;
+
+-- Prior-bill lookups during validation (pipeline/history.py): latest bill of
+-- an account ending before a date is one index probe
+CREATE INDEX IF NOT EXISTS idx_bills_account_history
+  ON bills(account_number, utility_provider, billing_end_date DESC)
+  WHERE billing_end_date IS NOT NULL;
+
+-- Semantic duplicates (pipeline/dedupe.py): one original per
+-- (account, provider, period end, total); later copies link to it.
+ALTER TABLE bills ADD COLUMN IF NOT EXISTS duplicate_of INTEGER REFERENCES bills(id) ON DELETE SET NULL;
+-- existing copies: keep the oldest row of each key as the original
+-- (then: python -m pipeline.rollups rebuild, as copies were counted)
+UPDATE bills b SET duplicate_of = d.original
+FROM (
+  SELECT id, MIN(id) OVER (
+    PARTITION BY account_number, utility_provider, COALESCE(billing_end_date, billing_date), total_amount_due
+  ) AS original
+  FROM bills
+  WHERE duplicate_of IS NULL AND extraction_method IS NOT NULL
+    AND account_number IS NOT NULL AND utility_provider IS NOT NULL
+    AND COALESCE(billing_end_date, billing_date) IS NOT NULL AND total_amount_due IS NOT NULL
+) d
+WHERE b.id = d.id AND d.id <> d.original;
+CREATE UNIQUE INDEX IF NOT EXISTS uq_bills_semantic
+  ON bills(account_number, utility_provider, (COALESCE(billing_end_date, billing_date)), total_amount_due)
+  WHERE duplicate_of IS NULL AND extraction_method IS NOT NULL
+    AND account_number IS NOT NULL AND utility_provider IS NOT NULL
+    AND COALESCE(billing_end_date, billing_date) IS NOT NULL AND total_amount_due IS NOT NULL;
+CREATE INDEX IF NOT EXISTS idx_bills_duplicate_of ON bills(duplicate_of) WHERE duplicate_of IS NOT NULL;
+
+-- Durable extraction queue (pipeline/jobs.py); workers lease with SKIP LOCKED
+CREATE TABLE IF NOT EXISTS jobs (
+  id BIGSERIAL PRIMARY KEY,
+  state VARCHAR(20) NOT NULL DEFAULT 'received',  -- received|text|parsed|validated|saved|failed|dead
+  filename VARCHAR(500),
+  file_path TEXT NOT NULL,
+  sha256 VARCHAR(64),
+  attempts INTEGER NOT NULL DEFAULT 0,
+  max_attempts INTEGER NOT NULL DEFAULT 5,
+  run_after TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  leased_by VARCHAR(200),
+  lease_expires TIMESTAMP,
+  last_error TEXT,
+  bill_ids INTEGER[],
+  timings JSONB,
+  created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+  updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+-- the lease scan only ever looks at active jobs
+CREATE INDEX IF NOT EXISTS idx_jobs_ready ON jobs(run_after, id)
+  WHERE state IN ('received', 'text', 'parsed', 'validated');
+CREATE INDEX IF NOT EXISTS idx_bills_file_path ON bills(file_path);
+
+-- POST /parse-file Idempotency-Key (pipeline/idempotency.py); no FK on
+-- bill_id: abandoned stubs are swept while the key may still be kept
+CREATE TABLE IF NOT EXISTS idempotency_keys (
+  key VARCHAR(200) PRIMARY KEY,
+  fingerprint VARCHAR(64) NOT NULL,          -- sha256 of the uploaded file
+  state VARCHAR(20) NOT NULL,                -- in_flight | done
+  bill_id INTEGER,
+  status_code INTEGER,
+  response JSONB,
+  created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+  updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_idempotency_keys_created ON idempotency_keys(created_at);
+-- stub sweeper (pipeline/sweeper.py): unfilled rows by age
+CREATE INDEX IF NOT EXISTS idx_bills_stubs ON bills(created_at) WHERE extraction_method IS NULL;
+
+-- Reviewer queue (pipeline/review.py): leases on bills awaiting review
+ALTER TABLE bills ADD COLUMN IF NOT EXISTS review_leased_by VARCHAR(200);
+ALTER TABLE bills ADD COLUMN IF NOT EXISTS review_lease_expires TIMESTAMP;
+ALTER TABLE bills ADD COLUMN IF NOT EXISTS reviewed_by VARCHAR(200);
+ALTER TABLE bills ADD COLUMN IF NOT EXISTS reviewed_at TIMESTAMP;
+-- only pending reviews are indexed: the queue scan never touches reviewed rows
+CREATE INDEX IF NOT EXISTS idx_bills_review_pending ON bills(id)
+  WHERE requires_review AND NOT reviewed AND extraction_method IS NOT NULL AND duplicate_of IS NULL;
+
+-- Reviewer corrections = expected parser output for the bill's stored text
+CREATE TABLE IF NOT EXISTS review_fixtures (
+  bill_id INTEGER PRIMARY KEY REFERENCES bills(id) ON DELETE CASCADE,
+  vendor_key VARCHAR(50),
+  extraction_method VARCHAR(50),
+  original JSONB,                -- fields before the correction
+  expected JSONB NOT NULL,       -- fields after it
+  reviewed_by VARCHAR(200),
+  created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_review_fixtures_vendor ON review_fixtures(vendor_key);
+
+-- Webhooks (pipeline/webhooks.py): subscriptions + transactional outbox
+CREATE TABLE IF NOT EXISTS webhook_subscriptions (
+  id SERIAL PRIMARY KEY,
+  tenant VARCHAR(200) NOT NULL,
+  url TEXT NOT NULL,
+  secret VARCHAR(200) NOT NULL,
+  events TEXT[] NOT NULL,
+  property_name VARCHAR(200),              -- NULL: every property
+  active BOOLEAN NOT NULL DEFAULT TRUE,
+  created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE IF NOT EXISTS webhook_outbox (
+  id BIGSERIAL PRIMARY KEY,
+  subscription_id INTEGER NOT NULL REFERENCES webhook_subscriptions(id) ON DELETE CASCADE,
+  event VARCHAR(50) NOT NULL,
+  bill_id INTEGER,
+  payload JSONB NOT NULL,
+  state VARCHAR(20) NOT NULL DEFAULT 'pending',   -- pending | delivered | dead
+  attempts INTEGER NOT NULL DEFAULT 0,
+  run_after TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  lease_expires TIMESTAMP,
+  last_error TEXT,
+  created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+  delivered_at TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_webhook_outbox_due ON webhook_outbox(run_after, id) WHERE state = 'pending';
+CREATE INDEX IF NOT EXISTS idx_webhook_outbox_sub ON webhook_outbox(subscription_id) WHERE state = 'pending';
+-- senders lease one subscription's batch at a time; results count only under the same token
+ALTER TABLE webhook_outbox ADD COLUMN IF NOT EXISTS lease_token VARCHAR(64);
+
+-- Live progress (pipeline/progress.py): every job stage/event, streamed over SSE
+ALTER TABLE jobs ADD COLUMN IF NOT EXISTS events JSONB NOT NULL DEFAULT '[]'::jsonb;
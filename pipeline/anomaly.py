@@ -0,0 +1,257 @@
+"""
+Usage/cost anomaly detection per account (leaks, meter misreads, bad parses).
+
+Each account's bills (utility_provider + account_number, ordered by service
+period end) are loaded as columnar NumPy arrays, many accounts per query.
+For every bill the baseline is the previous ANOMALY_WINDOW bills of the same
+account: mean and standard deviation come from prefix sums over the whole
+batch, so a batch of thousands of accounts is a handful of array operations
+with no Python loop per bill. The bill's z-score against that baseline is
+computed for units_used and total_amount_due; |z| >= ANOMALY_Z flags it.
+
+  bills.anomaly_score  largest |z| of the two measures (NULL: too little history)
+  bills.anomaly_flags  e.g. {units_used_high}, {total_amount_due_low}
+
+A standard deviation floor (5% of the baseline mean, at least 1) keeps a
+perfectly flat history from turning a one-cent change into an anomaly.
+
+Inline: the save paths call score_bills() for the saved ids (ANOMALY_INLINE),
+which re-scores the affected accounts, since a bill saved out of order also
+moves the baselines of the bills after it.
+
+  python -m pipeline.anomaly [--batch 500] [--ids 1,2,3] [--dry-run]
+
+Env:
+  ANOMALY_WINDOW (optional, bills in the rolling baseline, default: 12)
+  ANOMALY_MIN_HISTORY (optional, prior bills needed to score, default: 3)
+  ANOMALY_Z (optional, flag threshold on |z|, default: 3.5)
+  ANOMALY_BATCH_ACCOUNTS (optional, accounts per bulk query, default: 500)
+  ANOMALY_INLINE (optional, score after each save, default: true)
+
+Deps:
+  numpy>=1.24
+"""
+
+from __future__ import annotations
+import os
+import json
+import time
+import logging
+import argparse
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+from psycopg2.extras import execute_values
+
+from app import get_db
+
+logger = logging.getLogger("bill-worker.anomaly")
+
+MEASURES = ("units_used", "total_amount_due")
+REL_STD_FLOOR = 0.05
+ABS_STD_FLOOR = 1.0
+SCORE_MAX = 9999.99  # DECIMAL(6,2)
+
+Account = Tuple[str, str]  # (utility_provider or '', account_number)
+
+
+def _settings() -> Tuple[int, int, float]:
+    return (
+        max(1, int(os.getenv("ANOMALY_WINDOW", "12"))),
+        max(1, int(os.getenv("ANOMALY_MIN_HISTORY", "3"))),
+        float(os.getenv("ANOMALY_Z", "3.5")),
+    )
+
+
+def rolling_z(groups: np.ndarray, values: np.ndarray, window: int, min_history: int) -> np.ndarray:
+    """
+    z-score of each value against the previous `window` values of its group.
+    `groups` must be contiguous (rows sorted by group, then time); NaN values
+    are skipped in baselines and get NaN z, as do rows with < min_history priors.
+    """
+    n = len(values)
+    if n == 0:
+        return np.empty(0)
+    valid = ~np.isnan(values)
+    v = np.where(valid, values, 0.0)
+    cs = np.concatenate(([0.0], np.cumsum(v)))
+    cs2 = np.concatenate(([0.0], np.cumsum(v * v)))
+    cn = np.concatenate(([0], np.cumsum(valid)))
+
+    idx = np.arange(n)
+    starts = np.concatenate(([0], np.flatnonzero(groups[1:] != groups[:-1]) + 1))
+    group_start = starts[np.searchsorted(starts, idx, side="right") - 1]
+    lo = np.maximum(group_start, idx - window)  # baseline = rows [lo, idx)
+
+    count = cn[idx] - cn[lo]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = (cs[idx] - cs[lo]) / count
+        var = np.maximum((cs2[idx] - cs2[lo]) / count - mean * mean, 0.0)
+        std = np.maximum(np.sqrt(var), np.maximum(np.abs(mean) * REL_STD_FLOOR, ABS_STD_FLOOR))
+        z = (values - mean) / std
+    z[(count < min_history) | ~valid] = np.nan
+    return z
+
+
+def score_arrays(groups: np.ndarray, columns: Dict[str, np.ndarray]):
+    """-> (score, flags): max |z| per row (NaN if unscored) and the flag list per row."""
+    window, min_history, threshold = _settings()
+    zs = {m: rolling_z(groups, columns[m], window, min_history) for m in MEASURES}
+    stacked = np.abs(np.vstack([zs[m] for m in MEASURES]))
+    all_nan = np.isnan(stacked).all(axis=0)
+    score = np.where(all_nan, np.nan, np.nanmax(np.where(np.isnan(stacked), -1.0, stacked), axis=0))
+
+    flags: List[List[str]] = [[] for _ in range(len(groups))]
+    for m in MEASURES:
+        z = zs[m]
+        for i in np.flatnonzero(np.abs(np.nan_to_num(z)) >= threshold):
+            flags[i].append(f"{m}_{'high' if z[i] > 0 else 'low'}")
+    return score, flags
+
+
+# ------------------------------
+# DB
+# ------------------------------
+def _load(cur, accounts: List[Account]):
+    """Columnar history of these accounts -> (ids, groups, {measure: values})."""
+    cur.execute(
+        f"""
+        SELECT b.id, a.n, {', '.join('b.' + m for m in MEASURES)}
+        FROM unnest(%s::text[], %s::text[]) WITH ORDINALITY AS a(provider, account, n)
+        JOIN bills b ON b.account_number = a.account AND COALESCE(b.utility_provider, '') = a.provider
+        WHERE b.extraction_method IS NOT NULL AND b.duplicate_of IS NULL
+          AND COALESCE(b.billing_end_date, b.billing_date) IS NOT NULL
+        ORDER BY a.n, COALESCE(b.billing_end_date, b.billing_date), b.id
+        """,
+        ([p for p, _ in accounts], [a for _, a in accounts]),
+    )
+    rows = cur.fetchall()
+    ids = np.array([r[0] for r in rows], dtype=np.int64)
+    groups = np.array([r[1] for r in rows], dtype=np.int64)
+    # None -> NaN; Decimal -> float
+    columns = {
+        m: np.array([np.nan if r[2 + i] is None else float(r[2 + i]) for r in rows], dtype=np.float64)
+        for i, m in enumerate(MEASURES)
+    }
+    return ids, groups, columns
+
+
+def score_accounts(cur, accounts: List[Account], dry_run: bool = False) -> Dict[str, int]:
+    """Re-score every dated bill of these accounts; only changed rows are written."""
+    if not accounts:
+        return {"bills": 0, "flagged": 0}
+    ids, groups, columns = _load(cur, accounts)
+    score, flags = score_arrays(groups, columns)
+    updates = [
+        (int(bid), None if np.isnan(s) else round(min(float(s), SCORE_MAX), 2), f)
+        for bid, s, f in zip(ids, score, flags)
+    ]
+    if updates and not dry_run:
+        execute_values(
+            cur,
+            """
+            UPDATE bills AS b SET anomaly_score = v.score, anomaly_flags = v.flags
+            FROM (VALUES %s) AS v(id, score, flags)
+            WHERE b.id = v.id
+              AND (b.anomaly_score IS DISTINCT FROM v.score OR b.anomaly_flags IS DISTINCT FROM v.flags)
+            """,
+            updates,
+            template="(%s, %s::numeric, %s::text[])",
+            page_size=1000,
+        )
+    return {"bills": len(updates), "flagged": sum(1 for _, _, f in updates if f)}
+
+
+def accounts_of(cur, bill_ids: List[int]) -> List[Account]:
+    cur.execute(
+        """
+        SELECT DISTINCT COALESCE(utility_provider, ''), account_number FROM bills
+        WHERE id = ANY(%s) AND account_number IS NOT NULL
+        """,
+        (list(bill_ids),),
+    )
+    return [tuple(r) for r in cur.fetchall()]
+
+
+def score_bills(bill_ids: List[int]) -> Dict[str, int]:
+    """Inline entry point: re-score the accounts of freshly saved bills."""
+    conn = get_db()
+    cur = conn.cursor()
+    try:
+        out = score_accounts(cur, accounts_of(cur, bill_ids))
+        conn.commit()
+        return out
+    finally:
+        cur.close()
+        conn.close()
+
+
+def iter_accounts(batch: int) -> Iterator[List[Account]]:
+    """Every account with bills, in keyset pages."""
+    last: Account = ("", "")
+    first = True
+    while True:
+        conn = get_db()
+        cur = conn.cursor()
+        try:
+            cur.execute(
+                """
+                SELECT DISTINCT COALESCE(utility_provider, ''), account_number FROM bills
+                WHERE account_number IS NOT NULL
+                  AND (%s OR (COALESCE(utility_provider, ''), account_number) > (%s, %s))
+                ORDER BY 1, 2 LIMIT %s
+                """,
+                (first, last[0], last[1], batch),
+            )
+            page = [tuple(r) for r in cur.fetchall()]
+        finally:
+            cur.close()
+            conn.close()
+        if not page:
+            return
+        yield page
+        last, first = page[-1], False
+
+
+def score_all(batch: Optional[int] = None, dry_run: bool = False) -> Dict[str, int]:
+    batch = batch or int(os.getenv("ANOMALY_BATCH_ACCOUNTS", "500"))
+    totals = {"accounts": 0, "bills": 0, "flagged": 0}
+    t0 = time.time()
+    for page in iter_accounts(batch):
+        conn = get_db()
+        cur = conn.cursor()
+        try:
+            out = score_accounts(cur, page, dry_run)
+            conn.commit()
+        finally:
+            cur.close()
+            conn.close()
+        totals["accounts"] += len(page)
+        totals["bills"] += out["bills"]
+        totals["flagged"] += out["flagged"]
+        logger.info("Anomaly scoring: %s (%.0fs)", totals, time.time() - t0)
+    return totals
+
+
+def main(argv: List[str] | None = None) -> None:
+    ap = argparse.ArgumentParser(description="Score units_used/total_amount_due anomalies per account")
+    ap.add_argument("--batch", type=int, help="accounts per query (default: ANOMALY_BATCH_ACCOUNTS)")
+    ap.add_argument("--ids", help="only the accounts of these comma-separated bill ids")
+    ap.add_argument("--dry-run", action="store_true", help="compute and count; write nothing")
+    args = ap.parse_args(argv)
+    if args.ids:
+        conn = get_db()
+        cur = conn.cursor()
+        try:
+            result = score_accounts(cur, accounts_of(cur, [int(x) for x in args.ids.split(",")]), args.dry_run)
+            conn.commit()
+        finally:
+            cur.close()
+            conn.close()
+    else:
+        result = score_all(args.batch, args.dry_run)
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
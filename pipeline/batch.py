@@ -0,0 +1,524 @@
+"""
+Batch ingestion: many PDFs (or a ZIP of PDFs) in one request.
+
+Uploads are spooled to temp files (never held in memory as a whole) and
+processed in the background:
+
+  - ZIP members are read one at a time straight from the archive
+  - entries are deduped by SHA-256, within the batch and against bills.sha256
+  - at most BATCH_CONCURRENCY files are extracted at once, and no more than
+    twice that many entries are read ahead
+  - finished bills are written with multi-row INSERTs (BATCH_FLUSH_SIZE rows)
+  - originals go to the PDF store (pipeline/blobs.py); file_path points there
+
+Per-file results are kept as small summaries (no extracted payloads) and can
+be polled with GET /batches/{batch_id} while the batch runs, or followed live
+(per-file stage events included) with GET /batches/{batch_id}/events
+(pipeline/progress.py).
+
+stream_batch() is the NDJSON variant (POST /parse-batch?stream=true): nothing
+is retained; every bill is written to the response as one JSON line in
+completion order, interleaved with progress/error lines, through a bounded
+queue so a slow client slows extraction instead of growing memory.
+
+Env:
+  BATCH_CONCURRENCY (optional, default: 4)
+  BATCH_FLUSH_SIZE (optional, default: 20)
+  BATCH_MAX_FILE_MB (optional, default: 50)
+  BATCH_KEEP (optional, finished batches kept in memory, default: 200)
+  BATCH_PROGRESS_SEC (optional, NDJSON progress heartbeat, default: 5)
+"""
+
+from __future__ import annotations
+import os
+import time
+import uuid
+import shutil
+import json
+import queue
+import hashlib
+import logging
+import zipfile
+import tempfile
+import asyncio
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from app import (
+    ExtractionError, extract_bills, flag_anomalies, get_db, insert_bills, project_bill, remember_saved, restore_texts,
+    source_texts,
+)
+from pipeline.blobs import put as store_pdf
+from pipeline.progress import stage_timer
+
+logger = logging.getLogger("bill-worker.batch")
+
+_BATCHES: "OrderedDict[str, Batch]" = OrderedDict()
+_BATCHES_LOCK = threading.Lock()
+
+
+def _max_file_bytes() -> int:
+    return int(float(os.getenv("BATCH_MAX_FILE_MB", "50")) * 1024 * 1024)
+
+
+class Batch:
+    """In-memory progress for one batch; results are summaries only."""
+
+    def __init__(self, sources: List[Tuple[str, str]]):
+        self.id = uuid.uuid4().hex
+        self.sources = sources  # (original filename, temp path)
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.total = 0
+        self.results: List[Dict[str, Any]] = []
+        self.lock = threading.Lock()
+        self.listeners: List[Tuple[asyncio.AbstractEventLoop, "asyncio.Queue"]] = []
+
+    def add(self, result: Dict[str, Any]) -> None:
+        with self.lock:
+            result["seq"] = len(self.results)
+            self.results.append(result)
+        self.publish(None)
+
+    # live listeners (SSE clients): one asyncio queue each, fed from the worker threads
+    def subscribe(self, loop: asyncio.AbstractEventLoop) -> "asyncio.Queue":
+        q: asyncio.Queue = asyncio.Queue(maxsize=256)
+        with self.lock:
+            self.listeners.append((loop, q))
+        return q
+
+    def has_listeners(self) -> bool:
+        return bool(self.listeners)
+
+    def unsubscribe(self, q: "asyncio.Queue") -> None:
+        with self.lock:
+            self.listeners = [(lp, lq) for lp, lq in self.listeners if lq is not q]
+
+    def publish(self, event: Optional[Dict[str, Any]]) -> None:
+        """A stage event, or None for "results changed"; dropped for a listener that is far behind."""
+        with self.lock:
+            listeners = list(self.listeners)
+        for loop, q in listeners:
+            try:
+                loop.call_soon_threadsafe(_offer, q, event)
+            except RuntimeError:  # loop closed
+                self.unsubscribe(q)
+
+    def on_stage(self, filename: str, stage: str, seconds: Optional[float], detail: Dict[str, Any]) -> None:
+        self.publish({"filename": filename, "stage": stage, "seconds": seconds, **detail})
+
+    def counts(self) -> Dict[str, int]:
+        out: Dict[str, int] = {}
+        with self.lock:
+            for r in self.results:
+                out[r["status"]] = out.get(r["status"], 0) + 1
+        return out
+
+    def snapshot(self, since: int = 0) -> Dict[str, Any]:
+        with self.lock:
+            results = list(self.results[since:])
+            done = len(self.results)
+        return {
+            "batch_id": self.id,
+            "status": "finished" if self.finished_at else "running",
+            "total": self.total,
+            "done": done,
+            "counts": self.counts(),
+            "elapsed_sec": round((self.finished_at or time.time()) - self.created_at, 2),
+            "results": results,
+        }
+
+
+def _offer(q: "asyncio.Queue", event: Optional[Dict[str, Any]]) -> None:
+    try:
+        q.put_nowait(event)
+    except asyncio.QueueFull:
+        pass  # the stream re-reads results on its next wakeup; only stage detail is lost
+
+
+def get_batch(batch_id: str) -> Optional[Batch]:
+    with _BATCHES_LOCK:
+        return _BATCHES.get(batch_id)
+
+
+def _register(batch: Batch) -> None:
+    keep = int(os.getenv("BATCH_KEEP", "200"))
+    with _BATCHES_LOCK:
+        _BATCHES[batch.id] = batch
+        while len(_BATCHES) > keep:
+            oldest_id, oldest = next(iter(_BATCHES.items()))
+            if not oldest.finished_at:
+                break
+            _BATCHES.pop(oldest_id)
+
+
+# ------------------------------
+# Entries
+# ------------------------------
+def spool(fileobj, suffix: str = "") -> str:
+    """Copy an upload to a temp file in chunks; the request's file handle can then close."""
+    fd, path = tempfile.mkstemp(prefix="bill-batch-", suffix=suffix)
+    with os.fdopen(fd, "wb") as out:
+        shutil.copyfileobj(fileobj, out, 1024 * 1024)
+    return path
+
+
+def _is_pdf_name(name: str) -> bool:
+    base = os.path.basename(name)
+    return name.lower().endswith(".pdf") and not base.startswith(".") and "__MACOSX" not in name
+
+
+def count_entries(sources: List[Tuple[str, str]]) -> int:
+    n = 0
+    for name, path in sources:
+        if zipfile.is_zipfile(path):
+            with zipfile.ZipFile(path) as zf:
+                n += sum(1 for i in zf.infolist() if not i.is_dir() and _is_pdf_name(i.filename))
+        else:
+            n += 1
+    return n
+
+
+def iter_entries(sources: List[Tuple[str, str]]) -> Iterator[Tuple[str, Any]]:
+    """
+    Yield (filename, bytes-or-error) one entry at a time. ZIP members are
+    decompressed only when reached, so the archive is never expanded at once.
+    """
+    limit = _max_file_bytes()
+    for name, path in sources:
+        if zipfile.is_zipfile(path):
+            with zipfile.ZipFile(path) as zf:
+                for info in zf.infolist():
+                    if info.is_dir() or not _is_pdf_name(info.filename):
+                        continue
+                    if info.file_size > limit:
+                        yield info.filename, ValueError(f"File larger than {limit} bytes")
+                        continue
+                    with zf.open(info) as fh:
+                        yield info.filename, fh.read(limit + 1)[:limit]
+        else:
+            if os.path.getsize(path) > limit:
+                yield name, ValueError(f"File larger than {limit} bytes")
+                continue
+            with open(path, "rb") as fh:
+                yield name, fh.read()
+
+
+def known_hashes(hashes: List[str]) -> set:
+    if not hashes:
+        return set()
+    conn = get_db()
+    cur = conn.cursor()
+    try:
+        cur.execute("SELECT sha256 FROM bills WHERE sha256 = ANY(%s)", (hashes,))
+        return {r[0] for r in cur.fetchall()}
+    finally:
+        cur.close()
+        conn.close()
+
+
+# ------------------------------
+# Writing
+# ------------------------------
+class BillWriter:
+    """Buffers finished files and writes them with one multi-row INSERT per flush."""
+
+    def __init__(self, flush_size: int, on_saved):
+        self.flush_size = max(1, flush_size)
+        self.on_saved = on_saved
+        self.pending: List[Tuple[Dict[str, Any], List[Tuple[Dict[str, Any], str]], List[Dict[str, Any]]]] = []
+        self.lock = threading.Lock()
+
+    def add(self, summary: Dict[str, Any], rows: List[Tuple[Dict[str, Any], str]], extras: List[Dict[str, Any]]) -> None:
+        with self.lock:
+            self.pending.append((summary, rows, extras))
+            if sum(len(p[1]) for p in self.pending) < self.flush_size:
+                return
+            pending, self.pending = self.pending, []
+        self._write(pending)
+
+    def flush(self) -> None:
+        with self.lock:
+            pending, self.pending = self.pending, []
+        if pending:
+            self._write(pending)
+
+    def _write(self, pending) -> None:
+        rows = [r for _, file_rows, _ in pending for r in file_rows]
+        extras = [e for _, _, file_extras in pending for e in file_extras]
+        texts = source_texts([norm for norm, _ in rows])
+        try:
+            conn = get_db()
+        except Exception as e:
+            for summary, file_rows, _ in pending:
+                self.on_saved(summary, [], e, file_rows)
+            return
+        cur = conn.cursor()
+        try:
+            try:
+                ids = insert_bills(cur, rows, extras)
+                conn.commit()
+            except Exception as e:
+                # e.g. a concurrent upload of the same file (sha256 is UNIQUE) or
+                # of the same bill (uq_bills_semantic, now visible to link):
+                # retry per file so one conflict doesn't sink the whole flush
+                conn.rollback()
+                restore_texts([norm for norm, _ in rows], texts)
+                logger.warning("Bulk insert failed (%s); writing files one by one", e)
+                self._write_each(conn, cur, pending)
+                return
+            remember_saved(ids, [norm for norm, _ in rows])
+            flag_anomalies(ids)
+            pos = 0
+            for summary, file_rows, _ in pending:
+                self.on_saved(summary, ids[pos:pos + len(file_rows)], None, file_rows)
+                pos += len(file_rows)
+        finally:
+            cur.close()
+            conn.close()
+
+    def _write_each(self, conn, cur, pending) -> None:
+        for summary, file_rows, file_extras in pending:
+            try:
+                ids = insert_bills(cur, file_rows, file_extras)
+                conn.commit()
+                remember_saved(ids, [norm for norm, _ in file_rows])
+                flag_anomalies(ids)
+                self.on_saved(summary, ids, None, file_rows)
+            except Exception as e:
+                conn.rollback()
+                self.on_saved(summary, [], e, file_rows)
+
+
+# ------------------------------
+# Processing
+# ------------------------------
+def _extract(name: str, data: bytes, on_stage=None):
+    try:
+        return extract_bills(data, on_stage=on_stage), None
+    except ExtractionError as e:
+        return None, f"{e.status_code}: {e.detail}"
+    except Exception as e:
+        logger.warning("Batch file %s failed: %s", name, e)
+        return None, str(e)
+
+
+def process_entries(entries, emit, extra_for=None, dedupe_db: bool = True,
+                    include_data: bool = False, cancelled: Optional[threading.Event] = None,
+                    concurrency: Optional[int] = None, progress=None,
+                    flush_size: Optional[int] = None, live=None) -> None:
+    """
+    Core loop shared by batch uploads and other bulk sources.
+
+    entries:      iterable of (filename, bytes-or-exception)
+    emit:         called with one summary dict per file as soon as it is final;
+                  errors carry stage "read", "extract" or "save" (only "save" is transient)
+    extra_for:    optional (filename, sha256) -> dict of extra bill columns
+    include_data: attach the saved bills (id, method, normalized data) to the summary
+    cancelled:    stop reading new entries once set (in-flight files still finish)
+    concurrency:  files extracted at once (default: BATCH_CONCURRENCY)
+    flush_size:   bills buffered per multi-row INSERT (default: BATCH_FLUSH_SIZE);
+                  1 emits every file as soon as it is saved
+    live:         optional () -> bool; while true, every file is flushed as soon
+                  as it is extracted (someone is watching progress live)
+    progress:     optional (filename, stage, seconds, detail) callback for live
+                  stage events (extract_bills stages, then "saved")
+    """
+    concurrency = max(1, concurrency or int(os.getenv("BATCH_CONCURRENCY", "4")))
+    in_flight = threading.BoundedSemaphore(concurrency * 2)
+    seen: set = set()
+    extracted_at: Dict[int, float] = {}  # id(summary) -> perf_counter, for the "saved" stage timing
+
+    def on_saved(summary, ids, err, rows):
+        t = extracted_at.pop(id(summary), None)
+        if err is not None:
+            summary.update(status="error", stage="save", error=str(err))
+        else:
+            summary.update(status="saved", bill_ids=ids)
+            if progress is not None:
+                seconds = round(time.perf_counter() - t, 3) if t is not None else None
+                progress(summary["filename"], "saved", seconds, {"bill_ids": ids})
+            if include_data:
+                summary["bills"] = [
+                    {"bill_id": bid, "extraction_method": method, "data": norm}
+                    for bid, (norm, method) in zip(ids, rows)
+                ]
+        emit(summary)
+
+    writer = BillWriter(flush_size or int(os.getenv("BATCH_FLUSH_SIZE", "20")), on_saved)
+
+    def work(name: str, data: bytes, sha: str):
+        try:
+            t0 = time.perf_counter()
+            on_stage = None
+            if progress is not None:
+                on_stage = stage_timer(lambda stage, seconds, detail: progress(name, stage, seconds, detail))
+            results, err = _extract(name, data, on_stage)
+            summary: Dict[str, Any] = {"filename": name, "sha256": sha}
+            if err:
+                summary.update(status="error", stage="extract", error=err)
+                emit(summary)
+                return
+            summary.update(
+                extraction_methods=[m for _, m in results],
+                confidence=[n.get("confidence_score") for n, _ in results],
+                requires_review=any((n.get("confidence_score") or 0) < 0.70 for n, _ in results),
+                seconds=round(time.perf_counter() - t0, 2),
+            )
+            base = dict(extra_for(name, sha)) if extra_for else {"filename": name}
+            try:
+                base.setdefault("file_path", store_pdf(data, sha))
+            except OSError as e:
+                logger.warning("Could not store original %s: %s", name, e)
+            # sha256 is UNIQUE: only the first account of a split statement carries it
+            extras = [dict(base, sha256=sha if i == 0 else None) for i in range(len(results))]
+            if progress is not None:
+                extracted_at[id(summary)] = time.perf_counter()
+            writer.add(summary, results, extras)
+            if live is not None and live():
+                writer.flush()
+        finally:
+            in_flight.release()
+
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="batch") as pool:
+        for name, data in entries:
+            if cancelled is not None and cancelled.is_set():
+                logger.info("Batch cancelled; not reading further entries")
+                break
+            if isinstance(data, Exception):
+                emit({"filename": name, "status": "error", "stage": "read", "error": str(data)})
+                continue
+            sha = hashlib.sha256(data).hexdigest()
+            if sha in seen or (dedupe_db and known_hashes([sha])):
+                emit({"filename": name, "sha256": sha, "status": "duplicate"})
+                continue
+            seen.add(sha)
+            in_flight.acquire()
+            pool.submit(work, name, data, sha)
+    writer.flush()
+
+
+def run_batch(batch: Batch) -> None:
+    try:
+        process_entries(iter_entries(batch.sources), batch.add, progress=batch.on_stage, live=batch.has_listeners)
+    except Exception as e:
+        logger.error("Batch %s aborted: %s", batch.id, e, exc_info=True)
+        batch.add({"filename": None, "status": "error", "error": f"batch aborted: {e}"})
+    finally:
+        batch.finished_at = time.time()
+        batch.publish(None)
+        for _, path in batch.sources:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        logger.info("Batch %s finished: %s", batch.id, batch.counts())
+
+
+def start_batch(sources: List[Tuple[str, str]]) -> Batch:
+    """Register a batch over spooled files and process it on a background thread."""
+    batch = Batch(sources)
+    batch.total = count_entries(sources)
+    _register(batch)
+    threading.Thread(target=run_batch, args=(batch,), name=f"batch-{batch.id[:8]}", daemon=True).start()
+    return batch
+
+
+# ------------------------------
+# NDJSON streaming
+# ------------------------------
+def _line(obj: Dict[str, Any]) -> str:
+    return json.dumps(obj, default=str, separators=(",", ":")) + "\n"
+
+
+def _bill_lines(summary: Dict[str, Any], include_raw: bool) -> List[Dict[str, Any]]:
+    status = summary.get("status")
+    if status != "saved":
+        kind = "duplicate" if status == "duplicate" else "error"
+        return [{"type": kind, **summary}]
+    out = []
+    for bill in summary.get("bills") or []:
+        data = bill["data"] if include_raw else project_bill(bill["data"], "slim")
+        out.append({
+            "type": "bill",
+            "filename": summary.get("filename"),
+            "sha256": summary.get("sha256"),
+            "bill_id": bill["bill_id"],
+            "extraction_method": bill["extraction_method"],
+            "requires_review": (data.get("confidence_score") or 0) < 0.70,
+            "data": data,
+        })
+    return out
+
+
+def stream_batch(sources: List[Tuple[str, str]], include_raw: bool = False) -> Iterator[str]:
+    """
+    Process spooled files and yield NDJSON lines:
+
+      {"type": "start", "batch_id", "total"}
+      {"type": "bill", "filename", "bill_id", "extraction_method", "data", ...}   one per saved bill
+      {"type": "duplicate" | "error", "filename", ...}                           one per skipped/failed file
+      {"type": "progress", "done", "total", "elapsed_sec"}                        after each file + heartbeat
+      {"type": "end", "counts", "elapsed_sec"}
+    """
+    batch_id = uuid.uuid4().hex
+    total = count_entries(sources)
+    started = time.time()
+    lines: "queue.Queue[Any]" = queue.Queue(maxsize=max(8, int(os.getenv("BATCH_CONCURRENCY", "4")) * 4))
+    cancelled = threading.Event()
+    done_marker = object()
+    counts: Dict[str, int] = {}
+
+    def put(item: Any) -> None:
+        # blocks while the client is behind; gives up if the client went away
+        while not cancelled.is_set():
+            try:
+                lines.put(item, timeout=1)
+                return
+            except queue.Full:
+                continue
+
+    def run() -> None:
+        try:
+            # flush_size=1: a bill line goes out as soon as its file is saved
+            process_entries(iter_entries(sources), put, include_data=True, cancelled=cancelled, flush_size=1)
+        except Exception as e:
+            logger.error("Streamed batch %s aborted: %s", batch_id, e, exc_info=True)
+            put({"filename": None, "status": "error", "error": f"batch aborted: {e}"})
+        finally:
+            for _, path in sources:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            put(done_marker)
+
+    threading.Thread(target=run, name=f"batch-stream-{batch_id[:8]}", daemon=True).start()
+
+    heartbeat = float(os.getenv("BATCH_PROGRESS_SEC", "5"))
+    done = 0
+    try:
+        yield _line({"type": "start", "batch_id": batch_id, "total": total})
+        while True:
+            try:
+                item = lines.get(timeout=heartbeat)
+            except queue.Empty:
+                yield _line({"type": "progress", "done": done, "total": total,
+                             "elapsed_sec": round(time.time() - started, 2)})
+                continue
+            if item is done_marker:
+                break
+            done += 1
+            # counted here, on the one consuming thread (emit runs on many workers)
+            counts[item["status"]] = counts.get(item["status"], 0) + 1
+            for obj in _bill_lines(item, include_raw):
+                yield _line(obj)
+            yield _line({"type": "progress", "done": done, "total": total,
+                         "elapsed_sec": round(time.time() - started, 2)})
+        yield _line({"type": "end", "batch_id": batch_id, "counts": dict(counts),
+                     "elapsed_sec": round(time.time() - started, 2)})
+    finally:
+        # client disconnected (generator closed) or finished: stop reading entries
+        cancelled.set()
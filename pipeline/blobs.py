@@ -0,0 +1,283 @@
+"""
+Content-addressed store for original PDFs.
+
+Every PDF that reaches extraction is kept once, by SHA-256:
+
+  <BLOB_STORE_DIR>/ab/cd/abcd...ef.pdf       (or .pdf.gz when compressed)
+
+bills.file_path holds the blob path, so a re-extraction reads the stored
+original instead of asking the customer to resend it. Writes are atomic
+(temp file in the shard + fsync + rename) and idempotent: storing a PDF that
+is already present is a stat() call.
+
+Blobs are read with open_blob(), which memory-maps the file. The Blob object
+is an mmap, so it goes anywhere PDF bytes go (hashing, subprocess input,
+the text backends); pickling it sends only the path, so process-pool
+workers map the same file instead of receiving a copy, and all readers
+share the OS page cache.
+
+Compression (BLOB_COMPRESS=gzip) saves disk on uncompressed PDFs, but those
+blobs are read into memory instead of mapped. Most PDFs are already
+compressed internally, so it is off by default.
+
+Garbage collection is mark-and-sweep against bills.file_path and the
+file_path of jobs not yet saved (queued, backing off, failed or dead: all can
+still be run or retried): blobs nothing references, older than
+BLOB_GC_GRACE_HOURS (so a blob stored for an insert still in flight is never
+collected), are removed. Storing a blob that already exists refreshes its
+mtime, so a re-upload restarts the grace period.
+
+  python -m pipeline.blobs gc [--dry-run]
+  python -m pipeline.blobs stats
+
+Env:
+  BLOB_STORE_DIR (optional, default: ./blobs)
+  BLOB_COMPRESS (optional, "gzip" or empty, default: empty)
+  BLOB_GC_GRACE_HOURS (optional, default: 24)
+"""
+
+from __future__ import annotations
+import os
+import gzip
+import mmap
+import time
+import shutil
+import hashlib
+import logging
+import argparse
+import tempfile
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+
+logger = logging.getLogger("bill-worker.blobs")
+
+SUFFIX = ".pdf"
+GZ_SUFFIX = ".pdf.gz"
+COPY_CHUNK = 1024 * 1024
+
+
+def store_dir() -> str:
+    return os.path.abspath(os.getenv("BLOB_STORE_DIR") or "blobs")
+
+
+def _compress() -> bool:
+    return os.getenv("BLOB_COMPRESS", "").strip().lower() in ("gzip", "gz")
+
+
+def _shard(root: str, sha: str) -> str:
+    return os.path.join(root, sha[:2], sha[2:4])
+
+
+def blob_path(sha: str, root: Optional[str] = None) -> Optional[str]:
+    """Path of a stored blob (plain or compressed), or None."""
+    shard = _shard(root or store_dir(), sha)
+    for suffix in (SUFFIX, GZ_SUFFIX):
+        path = os.path.join(shard, sha + suffix)
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def sha_of(path: str) -> Optional[str]:
+    """SHA-256 from a blob path (None if it is not a blob name)."""
+    name = os.path.basename(path)
+    for suffix in (GZ_SUFFIX, SUFFIX):
+        if name.endswith(suffix):
+            sha = name[: -len(suffix)]
+            return sha if len(sha) == 64 else None
+    return None
+
+
+# ------------------------------
+# Writing
+# ------------------------------
+def _atomic_write(path: str, chunks: Iterator[bytes], compress: bool) -> None:
+    shard = os.path.dirname(path)
+    os.makedirs(shard, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=shard, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as raw:
+            out = gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=6, mtime=0) if compress else raw
+            for chunk in chunks:
+                out.write(chunk)
+            if compress:
+                out.close()
+            raw.flush()
+            os.fsync(raw.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+
+
+def _touch(path: str) -> None:
+    """A re-stored blob is in use again: restart its GC grace period."""
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+
+
+def put(data: Union[bytes, mmap.mmap], sha: Optional[str] = None) -> str:
+    """Store PDF bytes (no-op if present); returns the blob path for bills.file_path."""
+    sha = sha or hashlib.sha256(data).hexdigest()
+    existing = blob_path(sha)
+    if existing:
+        _touch(existing)
+        return existing
+    compress = _compress()
+    path = os.path.join(_shard(store_dir(), sha), sha + (GZ_SUFFIX if compress else SUFFIX))
+    _atomic_write(path, iter([bytes(data) if compress else data]), compress)
+    return path
+
+
+def put_file(src: str, sha: Optional[str] = None) -> str:
+    """Store a file by streaming it (never fully in memory); hashes it first if `sha` is unknown."""
+    if sha is None:
+        h = hashlib.sha256()
+        with open(src, "rb") as fh:
+            for chunk in iter(lambda: fh.read(COPY_CHUNK), b""):
+                h.update(chunk)
+        sha = h.hexdigest()
+    existing = blob_path(sha)
+    if existing:
+        _touch(existing)
+        return existing
+    compress = _compress()
+    path = os.path.join(_shard(store_dir(), sha), sha + (GZ_SUFFIX if compress else SUFFIX))
+    with open(src, "rb") as fh:
+        _atomic_write(path, iter(lambda: fh.read(COPY_CHUNK), b""), compress)
+    return path
+
+
+# ------------------------------
+# Reading
+# ------------------------------
+class Blob(mmap.mmap):
+    """Read-only mapping of a stored PDF; pickles as its path."""
+
+    path = ""
+
+    def __reduce__(self):
+        return (open_blob, (self.path,))
+
+
+def open_blob(path: str) -> Union[Blob, bytes]:
+    """
+    Map a stored blob for reading. Compressed (and empty) blobs come back as
+    bytes. Close the Blob when done (it is also a context manager).
+    """
+    if path.endswith(".gz"):
+        with gzip.open(path, "rb") as fh:
+            return fh.read()
+    with open(path, "rb") as fh:
+        if os.fstat(fh.fileno()).st_size == 0:
+            return b""
+        blob = Blob(fh.fileno(), 0, access=mmap.ACCESS_READ)
+    blob.path = path
+    return blob
+
+
+def read_blob(sha: str) -> Union[Blob, bytes]:
+    path = blob_path(sha)
+    if path is None:
+        raise FileNotFoundError(f"No stored PDF for {sha}")
+    return open_blob(path)
+
+
+# ------------------------------
+# GC / stats
+# ------------------------------
+def iter_blobs(root: Optional[str] = None) -> Iterator[Tuple[str, str]]:
+    """(sha, path) of every blob in the store."""
+    root = root or store_dir()
+    for dirpath, _, filenames in os.walk(root):
+        for name in filenames:
+            sha = sha_of(name)
+            if sha:
+                yield sha, os.path.join(dirpath, name)
+
+
+def referenced_paths(root: Optional[str] = None) -> set:
+    from app import get_db
+
+    root = root or store_dir()
+    conn = get_db()
+    cur = conn.cursor("blob_refs")  # server-side cursor: don't load every row at once
+    try:
+        cur.itersize = 10000
+        prefix = root.rstrip("/") + "/%"
+        cur.execute(
+            """
+            SELECT file_path FROM bills WHERE file_path LIKE %s
+            UNION
+            SELECT file_path FROM jobs WHERE state <> 'saved' AND file_path LIKE %s
+            """,
+            (prefix, prefix),
+        )
+        return {os.path.abspath(r[0]) for r in cur}
+    finally:
+        cur.close()
+        conn.close()
+
+
+def gc(dry_run: bool = False) -> Dict[str, Any]:
+    """Delete blobs no bill references (older than the grace period)."""
+    root = store_dir()
+    grace = float(os.getenv("BLOB_GC_GRACE_HOURS", "24")) * 3600
+    cutoff = time.time() - grace
+    refs = referenced_paths(root)
+    out = {"kept": 0, "removed": 0, "young": 0, "bytes_freed": 0}
+    for _, path in iter_blobs(root):
+        if path in refs:
+            out["kept"] += 1
+            continue
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            continue
+        if st.st_mtime > cutoff:
+            out["young"] += 1
+            continue
+        out["removed"] += 1
+        out["bytes_freed"] += st.st_size
+        if not dry_run:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+    logger.info("Blob GC%s: %s", " (dry run)" if dry_run else "", out)
+    return out
+
+
+def stats() -> Dict[str, Any]:
+    count = size = 0
+    for _, path in iter_blobs():
+        count += 1
+        size += os.path.getsize(path)
+    usage = shutil.disk_usage(store_dir()) if os.path.isdir(store_dir()) else None
+    return {
+        "root": store_dir(),
+        "blobs": count,
+        "bytes": size,
+        "disk_free": usage.free if usage else None,
+    }
+
+
+def main(argv: List[str] | None = None) -> None:
+    import json
+
+    ap = argparse.ArgumentParser(description="Original PDF blob store maintenance")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    g = sub.add_parser("gc", help="remove blobs no bill references")
+    g.add_argument("--dry-run", action="store_true")
+    sub.add_parser("stats", help="count and size of stored blobs")
+    args = ap.parse_args(argv)
+    result = gc(args.dry_run) if args.cmd == "gc" else stats()
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+Semantic duplicates: the same bill arriving as a different file (re-scan,
+re-sent email, reminder notice), which the sha256 check cannot see.
+
+A bill is identified by
+
+  (account_number, utility_provider, billing period end, total_amount_due)
+
+where the period end is billing_end_date, else billing_date. A partial
+unique index (init.sql) allows one original per key; later copies are saved
+with bills.duplicate_of pointing at it and are left out of rollups, anomaly
+baselines and prior-bill checks.
+
+The key is looked up right after the regex pass, so a copy of a known bill
+never goes to OpenAI, and again inside the saving transaction (link). A
+copy that was in flight at the same time as its original cannot see the
+uncommitted original; the unique index rejects whichever commits second, and
+the writers (app._commit_retrying, BillWriter's per-file fallback) run that
+write again, when link finds the original.
+
+DEDUPE_MODE decides what a copy does to the original:
+  skip   keep the original as is (default)
+  merge  fill the original's empty columns from the copy
+
+Env:
+  DEDUPE_MODE (optional, skip | merge, default: skip)
+"""
+
+from __future__ import annotations
+import os
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+from app import BILL_FIELDS, get_db
+
+logger = logging.getLogger("bill-worker.dedupe")
+
+# raw columns a merge may fill in on the original (the key columns are equal by definition)
+_MERGED = tuple(f for f in BILL_FIELDS if f not in ("vendor_key", "vendor_parser_version"))
+
+
+def mode() -> str:
+    m = os.getenv("DEDUPE_MODE", "skip").strip().lower()
+    return m if m in ("skip", "merge") else "skip"
+
+
+def key_of(norm: Dict[str, Any]) -> Optional[Tuple[str, str, str, float]]:
+    period = norm.get("billing_end_date") or norm.get("billing_date")
+    acct, provider, total = norm.get("account_number"), norm.get("utility_provider"), norm.get("total_amount_due")
+    if not (acct and provider and period) or total is None:
+        return None
+    try:
+        return str(acct), str(provider), str(period), round(float(total), 2)
+    except (TypeError, ValueError):
+        return None
+
+
+_MATCH = """
+    b.account_number = v.account_number AND b.utility_provider = v.utility_provider
+    AND COALESCE(b.billing_end_date, b.billing_date) = v.period::date
+    AND b.total_amount_due = v.total::numeric
+    AND b.duplicate_of IS NULL AND b.extraction_method IS NOT NULL
+"""
+
+
+def _originals(cur, keys: List[Tuple[int, Tuple[str, str, str, float]]], exclude: List[int]) -> Dict[int, int]:
+    """{position: original bill id} for the keys that already have an original."""
+    if not keys:
+        return {}
+    values = ", ".join(cur.mogrify("(%s, %s, %s, %s, %s)", (n, *k)).decode() for n, k in keys)
+    cur.execute(
+        f"""
+        SELECT v.n, MIN(b.id)
+        FROM (VALUES {values}) AS v(n, account_number, utility_provider, period, total)
+        JOIN bills b ON {_MATCH}
+        WHERE b.id <> ALL(%s)
+        GROUP BY v.n
+        """,
+        (list(exclude),),
+    )
+    return {r[0]: r[1] for r in cur.fetchall()}
+
+
+def find_duplicate(norm: Dict[str, Any]) -> Optional[int]:
+    """Id of the original this bill duplicates (extraction-time check; errors -> None)."""
+    key = key_of(norm)
+    if key is None:
+        return None
+    try:
+        conn = get_db()
+    except Exception as e:
+        logger.debug("Duplicate lookup skipped: %s", e)
+        return None
+    cur = conn.cursor()
+    try:
+        return _originals(cur, [(0, key)], []).get(0)
+    except Exception as e:
+        logger.debug("Duplicate lookup failed: %s", e)
+        return None
+    finally:
+        cur.close()
+        conn.close()
+
+
+def link(cur, norms: List[Dict[str, Any]], exclude: Optional[List[int]] = None) -> None:
+    """
+    Set norm["duplicate_of"] for every bill about to be written whose key
+    already has an original (in the writing transaction). `exclude` are the
+    rows being written, so a re-parsed original never matches itself.
+    """
+    keys = [(n, k) for n, k in ((n, key_of(norm)) for n, norm in enumerate(norms)) if k is not None]
+    found = _originals(cur, keys, exclude or [])
+    for n, norm in enumerate(norms):
+        norm["duplicate_of"] = found.get(n)
+
+
+def merge(cur, pairs: List[Tuple[int, int]]) -> None:
+    """DEDUPE_MODE=merge: fill NULL columns of each original from its copy; (original, copy) pairs."""
+    from pipeline.rollups import apply_delta
+
+    if mode() != "merge" or not pairs:
+        return
+    originals = sorted({o for o, _ in pairs})
+    apply_delta(cur, originals, -1)
+    for original, copy in pairs:
+        cur.execute(
+            f"""
+            UPDATE bills o SET {', '.join(f'{c} = COALESCE(o.{c}, d.{c})' for c in _MERGED)}, updated_at = NOW()
+            FROM bills d WHERE o.id = %s AND d.id = %s
+            """,
+            (original, copy),
+        )
+    apply_delta(cur, originals, 1)
+    logger.info("Merged %d duplicate(s) into their originals", len(pairs))
@@ -0,0 +1,220 @@
+"""
+Prior-bill cross-checks for validation.
+
+validate_normalized() checks a bill on its own; this adds two checks against
+the account's previous bill (same account_number + utility_provider, latest
+billing_end_date before this one):
+
+  previous_balance_mismatch   previous_balance != prior total_amount_due
+                              (beyond PREVIOUS_BALANCE_TOLERANCE, or 1%)
+  service_period_overlap      billing_start_date before the prior bill's
+                              billing_end_date (sharing the boundary day is fine)
+
+They are soft issues: they lower the confidence score but do not on their
+own make a bill invalid, since payment adjustments and re-billed periods do
+happen.
+
+The latest bill per account is kept in an in-process LRU, so checking the
+next bill of an account (the common case: bills arrive in date order) is a
+dict lookup. Misses, and bills older than the cached latest, read the
+(account_number, utility_provider, billing_end_date) index - one row, over
+one autocommit connection per process that is kept open (re-parse and
+ingest workers validate thousands of bills with a cold cache). Saves
+update the cache through remember() once committed. Entries expire after
+HISTORY_CACHE_TTL_SEC, which bounds staleness from other processes.
+
+Env:
+  HISTORY_CHECKS (optional, run prior-bill checks, default: true)
+  HISTORY_CACHE_SIZE (optional, accounts kept, default: 10000)
+  HISTORY_CACHE_TTL_SEC (optional, default: 300)
+  PREVIOUS_BALANCE_TOLERANCE (optional, dollars, default: 1.00)
+"""
+
+from __future__ import annotations
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+from datetime import date
+from typing import Any, Dict, List, Optional, Tuple
+
+from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
+
+from app import get_db
+
+logger = logging.getLogger("bill-worker.history")
+
+SOFT_ISSUES = ("previous_balance_mismatch", "service_period_overlap")
+
+Key = Tuple[str, str]  # (account_number, utility_provider)
+
+# key -> (cached_at, latest bill or None when the account has no bills)
+_CACHE: "OrderedDict[Key, Tuple[float, Optional[Dict[str, Any]]]]" = OrderedDict()
+_LOCK = threading.Lock()
+
+# lookup connection, reused by every thread of this process (pid: not across a fork)
+_CONN: Dict[str, Any] = {"conn": None, "pid": None}
+_CONN_LOCK = threading.Lock()
+
+
+def enabled() -> bool:
+    return os.getenv("HISTORY_CHECKS", "true").strip().lower() in ("1", "true", "yes", "on")
+
+
+def _key(norm: Dict[str, Any]) -> Optional[Key]:
+    acct, provider = norm.get("account_number"), norm.get("utility_provider")
+    return (str(acct), str(provider)) if acct and provider else None
+
+
+def _iso(d: Any) -> Optional[str]:
+    return d.isoformat() if isinstance(d, date) else (str(d) if d else None)
+
+
+def _snapshot(bill_id: Optional[int], start: Any, end: Any, total: Any) -> Dict[str, Any]:
+    return {
+        "id": bill_id,
+        "billing_start_date": _iso(start),
+        "billing_end_date": _iso(end),
+        "total_amount_due": float(total) if total is not None else None,
+    }
+
+
+# ------------------------------
+# LRU
+# ------------------------------
+def _cached(key: Key):
+    """(hit, latest) for a live entry."""
+    ttl = float(os.getenv("HISTORY_CACHE_TTL_SEC", "300"))
+    with _LOCK:
+        entry = _CACHE.get(key)
+        if entry is None:
+            return False, None
+        if time.time() - entry[0] > ttl:
+            del _CACHE[key]
+            return False, None
+        _CACHE.move_to_end(key)
+        return True, entry[1]
+
+
+def _store(key: Key, latest: Optional[Dict[str, Any]]) -> None:
+    size = max(1, int(os.getenv("HISTORY_CACHE_SIZE", "10000")))
+    with _LOCK:
+        _CACHE[key] = (time.time(), latest)
+        _CACHE.move_to_end(key)
+        while len(_CACHE) > size:
+            _CACHE.popitem(last=False)
+
+
+def remember(bill_id: int, norm: Dict[str, Any]) -> None:
+    """Record a saved bill: it becomes the account's latest if it is newer."""
+    key, end = _key(norm), norm.get("billing_end_date")
+    if key is None:
+        return
+    hit, latest = _cached(key)
+    if not hit:
+        return  # unknown account state: the next lookup reads the index
+    new = _snapshot(bill_id, norm.get("billing_start_date"), end, norm.get("total_amount_due"))
+    if latest is None or (end and (latest["billing_end_date"] or "") < str(end)):
+        _store(key, new)
+    elif latest["id"] == bill_id:
+        # the latest bill itself was re-parsed (maybe with another period)
+        with _LOCK:
+            _CACHE.pop(key, None)
+
+
+def clear() -> None:
+    with _LOCK:
+        _CACHE.clear()
+
+
+# ------------------------------
+# Lookup
+# ------------------------------
+def _conn():
+    conn = _CONN["conn"]
+    if conn is None or conn.closed or _CONN["pid"] != os.getpid():
+        conn = get_db()
+        conn.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+        _CONN.update(conn=conn, pid=os.getpid())
+    return conn
+
+
+def _drop_conn() -> None:
+    if _CONN["pid"] == os.getpid():  # never close a parent's connection after a fork
+        try:
+            _CONN["conn"].close()
+        except Exception:
+            pass
+    _CONN["conn"] = None
+
+
+def _query_latest(key: Key, before: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    with _CONN_LOCK:
+        try:
+            cur = _conn().cursor()
+        except Exception:
+            _drop_conn()
+            raise
+        try:
+            cur.execute(
+                """
+                SELECT id, billing_start_date, billing_end_date, total_amount_due FROM bills
+                WHERE account_number = %s AND utility_provider = %s
+                  AND billing_end_date IS NOT NULL
+                  AND (%s::date IS NULL OR billing_end_date < %s::date)
+                  AND extraction_method IS NOT NULL AND duplicate_of IS NULL
+                ORDER BY billing_end_date DESC LIMIT 1
+                """,
+                (key[0], key[1], before, before),
+            )
+            r = cur.fetchone()
+        except Exception:
+            _drop_conn()  # broken connection: the next lookup reconnects
+            raise
+        finally:
+            cur.close()
+    return _snapshot(*r) if r else None
+
+
+def prior_bill(norm: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """The account's latest bill ending before this one (None if there is none)."""
+    key = _key(norm)
+    if key is None:
+        return None
+    hit, latest = _cached(key)
+    if not hit:
+        latest = _query_latest(key)
+        _store(key, latest)
+    if latest is None:
+        return None
+    end = norm.get("billing_end_date")
+    if end is None or (latest["billing_end_date"] or "") < str(end):
+        return latest
+    # an older bill (backfill, re-parse): ask the index for its own predecessor
+    return _query_latest(key, str(end))
+
+
+def prior_bill_issues(norm: Dict[str, Any]) -> List[str]:
+    """Soft issues from comparing a bill with the account's previous one."""
+    if not enabled():
+        return []
+    try:
+        prior = prior_bill(norm)
+    except Exception as e:
+        logger.debug("Prior-bill lookup failed: %s", e)
+        return []
+    if prior is None:
+        return []
+
+    issues: List[str] = []
+    prev_bal, prior_total = norm.get("previous_balance"), prior.get("total_amount_due")
+    if prev_bal is not None and prior_total is not None:
+        tol = max(float(os.getenv("PREVIOUS_BALANCE_TOLERANCE", "1.00")), abs(prior_total) * 0.01)
+        if abs(float(prev_bal) - prior_total) > tol:
+            issues.append("previous_balance_mismatch")
+
+    start, prior_end = norm.get("billing_start_date"), prior.get("billing_end_date")
+    if start and prior_end and str(start) < prior_end:
+        issues.append("service_period_overlap")
+    return issues
@@ -0,0 +1,143 @@
+"""
+Idempotency-Key support for POST /parse-file.
+
+The first request with a key claims it (INSERT ... ON CONFLICT DO NOTHING)
+and runs the extraction; its response is stored with the key. A repeat of
+the key gets the stored response (Idempotent-Replayed: true) without a new
+stub or new PDF.co/OpenAI calls; a repeat that arrives while the first is
+still running waits for it (up to IDEMPOTENCY_WAIT_SEC) and then gets 409.
+
+Final 4xx outcomes are stored like successes; 5xx and crashes release the
+key so the client's retry runs again. A claim older than
+IDEMPOTENCY_INFLIGHT_SEC (the process died) can be taken over. The same key
+with a different file is rejected with 422. Keys expire after
+IDEMPOTENCY_TTL_HOURS (pipeline/sweeper.py).
+
+Env:
+  IDEMPOTENCY_WAIT_SEC (optional, default: 30)
+  IDEMPOTENCY_INFLIGHT_SEC (optional, default: 900)
+  IDEMPOTENCY_TTL_HOURS (optional, default: 24)
+"""
+
+from __future__ import annotations
+import os
+import json
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from psycopg2.extras import Json
+
+from app import get_db
+
+MAX_KEY_LENGTH = 200
+
+_COLS = ("key", "fingerprint", "state", "bill_id", "status_code", "response", "created_at")
+
+
+def _dumps(obj: Any) -> str:
+    return json.dumps(obj, default=str)
+
+
+def _row(cur, key: str) -> Optional[Dict[str, Any]]:
+    cur.execute(f"SELECT {', '.join(_COLS)} FROM idempotency_keys WHERE key = %s", (key,))
+    r = cur.fetchone()
+    return dict(zip(_COLS, r)) if r else None
+
+
+def claim(key: str, fingerprint: str) -> Tuple[str, Optional[Dict[str, Any]]]:
+    """
+    -> ("claimed", None)      this request runs the work
+       ("done", row)          replay row["response"] / row["status_code"]
+       ("in_flight", row)     another request is running it
+       ("mismatch", row)      the key was used for a different file
+    """
+    stale = float(os.getenv("IDEMPOTENCY_INFLIGHT_SEC", "900"))
+    conn = get_db()
+    cur = conn.cursor()
+    try:
+        cur.execute(
+            """
+            INSERT INTO idempotency_keys (key, fingerprint, state, created_at, updated_at)
+            VALUES (%s, %s, 'in_flight', NOW(), NOW())
+            ON CONFLICT (key) DO NOTHING
+            """,
+            (key, fingerprint),
+        )
+        if cur.rowcount == 1:
+            conn.commit()
+            return "claimed", None
+        row = _row(cur, key)
+        if row is None:  # released between the INSERT and the SELECT
+            conn.commit()
+            return claim(key, fingerprint)
+        if row["fingerprint"] != fingerprint:
+            return "mismatch", row
+        if row["state"] == "done":
+            return "done", row
+        # the claimer died: take the key over
+        cur.execute(
+            """
+            UPDATE idempotency_keys SET updated_at = NOW(), bill_id = NULL
+            WHERE key = %s AND state = 'in_flight' AND updated_at < NOW() - make_interval(secs => %s)
+            """,
+            (key, stale),
+        )
+        conn.commit()
+        return ("claimed", None) if cur.rowcount == 1 else ("in_flight", row)
+    finally:
+        cur.close()
+        conn.close()
+
+
+def attach(key: str, bill_id: int) -> None:
+    """Record the stub created for a claimed key (shown to waiting repeats)."""
+    _update(key, "UPDATE idempotency_keys SET bill_id = %s, updated_at = NOW() WHERE key = %s", (bill_id, key))
+
+
+def finish(key: str, status_code: int, response: Dict[str, Any], bill_id: Optional[int] = None) -> None:
+    _update(
+        key,
+        """
+        UPDATE idempotency_keys SET state = 'done', status_code = %s, response = %s,
+               bill_id = COALESCE(%s, bill_id), updated_at = NOW()
+        WHERE key = %s
+        """,
+        (status_code, Json(response, dumps=_dumps), bill_id, key),
+    )
+
+
+def release(key: str) -> None:
+    """Forget an unfinished claim so a retry runs the work again."""
+    _update(key, "DELETE FROM idempotency_keys WHERE key = %s AND state = 'in_flight'", (key,))
+
+
+def _update(key: str, sql: str, params: tuple) -> None:
+    conn = get_db()
+    cur = conn.cursor()
+    try:
+        cur.execute(sql, params)
+        conn.commit()
+    finally:
+        cur.close()
+        conn.close()
+
+
+def wait(key: str, timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+    """Poll an in-flight key until it is done (row) or the timeout passes (None)."""
+    timeout = float(os.getenv("IDEMPOTENCY_WAIT_SEC", "30")) if timeout is None else timeout
+    deadline = time.monotonic() + timeout
+    delay = 0.25
+    while True:
+        conn = get_db()
+        cur = conn.cursor()
+        try:
+            row = _row(cur, key)
+        finally:
+            cur.close()
+            conn.close()
+        if row is None or row["state"] == "done":
+            return row
+        if time.monotonic() >= deadline:
+            return None
+        time.sleep(min(delay, max(0.0, deadline - time.monotonic())))
+        delay = min(delay * 2, 2.0)
@@ -0,0 +1,296 @@
+"""
+Bulk ingest of historical bills from a directory tree (backfills).
+
+  python -m pipeline.ingest /data/bills/2019-2024 [--workers 8] [--checkpoint FILE]
+
+  - every *.pdf under the directory is hashed (streamed, 1 MB at a time)
+  - files whose SHA-256 is already in bills.sha256 are skipped (checked in chunks)
+  - extraction runs in a process pool; each worker copies its file into the
+    PDF store (pipeline/blobs.py) and extracts from the mapped blob, so PDF
+    bytes never cross the process boundary; file_path points at the blob.
+    Workers extract pages and parse statement parts serially (no nested pools)
+  - rows are written with multi-row INSERTs (BillWriter, as for /parse-batch)
+  - each finished file is appended to a checkpoint (JSON lines) only after its
+    rows are committed; a rerun skips checkpointed files by path, size and
+    mtime without re-hashing them, so a crash loses at most the unflushed rows
+  - progress and a final throughput summary (files/s, MB/s, bills/s) are printed
+
+Env:
+  INGEST_WORKERS (optional, default: CPU count)
+  INGEST_FLUSH_SIZE (optional, default: 50)
+  INGEST_PROGRESS_SEC (optional, default: 10)
+"""
+
+from __future__ import annotations
+import os
+import sys
+import json
+import time
+import hashlib
+import logging
+import argparse
+import threading
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from pipeline.batch import BillWriter, _is_pdf_name, _max_file_bytes, known_hashes
+from pipeline.blobs import open_blob, put_file
+
+logger = logging.getLogger("bill-worker.ingest")
+
+HASH_CHUNK = 1024 * 1024
+LOOKUP_CHUNK = 500
+
+
+# ------------------------------
+# Checkpoint
+# ------------------------------
+class Checkpoint:
+    """Append-only JSON lines: one record per finished file, flushed as written."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.done: Dict[str, Dict[str, Any]] = {}
+        self.lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as fh:
+                for line in fh:
+                    try:
+                        rec = json.loads(line)
+                    except ValueError:
+                        continue  # torn last line after a crash
+                    self.done[rec["path"]] = rec
+        self.fh = open(path, "a", encoding="utf-8")
+
+    def is_done(self, path: str, st: os.stat_result, retry_errors: bool) -> bool:
+        rec = self.done.get(path)
+        if rec is None or rec["size"] != st.st_size or rec["mtime"] != int(st.st_mtime):
+            return False
+        if rec["status"] == "error":
+            # save failures are transient (database); extraction failures only on request
+            return not (retry_errors or rec.get("stage") == "save")
+        return True
+
+    def record(self, rec: Dict[str, Any]) -> None:
+        with self.lock:
+            self.fh.write(json.dumps(rec, default=str) + "\n")
+            self.fh.flush()
+
+    def close(self) -> None:
+        self.fh.close()
+
+
+# ------------------------------
+# Stats
+# ------------------------------
+class Stats:
+    def __init__(self):
+        self.started = time.time()
+        self.counts: Dict[str, int] = {}
+        self.bytes = 0
+        self.bills = 0
+        self.lock = threading.Lock()
+
+    def add(self, status: str, size: int = 0, bills: int = 0) -> None:
+        with self.lock:
+            self.counts[status] = self.counts.get(status, 0) + 1
+            self.bytes += size
+            self.bills += bills
+
+    def line(self) -> str:
+        with self.lock:
+            secs = max(time.time() - self.started, 1e-6)
+            files = sum(self.counts.values())
+            parts = ", ".join(f"{k}={v}" for k, v in sorted(self.counts.items()))
+            return (
+                f"{files} files ({parts}) in {secs:.0f}s: "
+                f"{files / secs:.2f} files/s, {self.bytes / secs / 1e6:.2f} MB/s, {self.bills / secs:.2f} bills/s"
+            )
+
+
+# ------------------------------
+# Walking / hashing
+# ------------------------------
+def walk_pdfs(root: str) -> Iterator[str]:
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for name in sorted(filenames):
+            path = os.path.join(dirpath, name)
+            if _is_pdf_name(path):
+                yield os.path.abspath(path)
+
+
+def file_sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(HASH_CHUNK), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _chunked(it: Iterator[Any], n: int) -> Iterator[List[Any]]:
+    buf: List[Any] = []
+    for x in it:
+        buf.append(x)
+        if len(buf) >= n:
+            yield buf
+            buf = []
+    if buf:
+        yield buf
+
+
+def _init_worker() -> None:
+    """
+    Ingest already runs one process per core: keep page extraction
+    (pdf_text.py) and statement splitting (splitter.py) serial inside each
+    worker instead of every worker starting pools of its own.
+    """
+    os.environ["PDF_TEXT_WORKERS"] = "1"
+    os.environ["SPLIT_WORKERS"] = "1"
+
+
+def _extract_file(path: str, sha: str) -> Tuple[Optional[List[Tuple[Dict[str, Any], str]]], Optional[str], Optional[str]]:
+    """Worker entry point: store and extract one PDF in the child process -> (results, error, blob path)."""
+    from pipeline.batch import _extract
+
+    try:
+        blob = put_file(path, sha)
+        data = open_blob(blob)
+    except OSError as e:
+        return None, str(e), None
+    try:
+        return (*_extract(path, data), blob)
+    finally:
+        if hasattr(data, "close"):
+            data.close()
+
+
+# ------------------------------
+# Run
+# ------------------------------
+def ingest(root: str, checkpoint_path: str, workers: int, flush_size: int,
+           retry_errors: bool = False, dry_run: bool = False) -> Stats:
+    ckpt = Checkpoint(checkpoint_path)
+    stats = Stats()
+    limit = _max_file_bytes()
+    seen: set = set()
+
+    def finish(rec: Dict[str, Any], bills: int = 0) -> None:
+        ckpt.record(rec)
+        stats.add(rec["status"], rec["size"], bills)
+
+    def on_saved(summary, ids, err, rows):
+        rec = dict(summary)
+        if err is not None:
+            rec.update(status="error", stage="save", error=str(err))
+        else:
+            rec.update(status="saved", bill_ids=ids)
+        finish(rec, len(ids))
+
+    writer = BillWriter(flush_size, on_saved)
+
+    def candidates() -> Iterator[Tuple[str, int, int, str]]:
+        """(path, size, mtime, sha) of files still to extract."""
+        pending: Iterator[Tuple[str, os.stat_result]] = (
+            (p, os.stat(p)) for p in walk_pdfs(root)
+        )
+        for chunk in _chunked(pending, LOOKUP_CHUNK):
+            hashed = []
+            for path, st in chunk:
+                if ckpt.is_done(path, st, retry_errors):
+                    stats.add("resumed")
+                    continue
+                rec = {"path": path, "size": st.st_size, "mtime": int(st.st_mtime)}
+                if st.st_size > limit:
+                    finish(dict(rec, status="error", stage="read", error=f"File larger than {limit} bytes"))
+                    continue
+                try:
+                    sha = file_sha256(path)
+                except OSError as e:
+                    finish(dict(rec, status="error", stage="read", error=str(e)))
+                    continue
+                hashed.append((rec, sha))
+            known = known_hashes([sha for _, sha in hashed])
+            for rec, sha in hashed:
+                if sha in known or sha in seen:
+                    finish(dict(rec, sha256=sha, status="duplicate"))
+                    continue
+                seen.add(sha)
+                yield rec["path"], rec["size"], rec["mtime"], sha
+
+    last_report = time.time()
+    every = float(os.getenv("INGEST_PROGRESS_SEC", "10"))
+
+    def report(force: bool = False) -> None:
+        nonlocal last_report
+        if force or time.time() - last_report >= every:
+            last_report = time.time()
+            print(stats.line(), file=sys.stderr, flush=True)
+
+    try:
+        if dry_run:
+            for path, size, mtime, sha in candidates():
+                stats.add("to_extract", size)
+                report()
+            return stats
+
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+            in_flight: Dict[Any, Tuple[str, int, int, str, float]] = {}
+
+            def drain(block_until: int) -> None:
+                while len(in_flight) > block_until:
+                    finished, _ = wait(list(in_flight), return_when=FIRST_COMPLETED)
+                    for fut in finished:
+                        path, size, mtime, sha, t0 = in_flight.pop(fut)
+                        rec = {"path": path, "size": size, "mtime": mtime, "sha256": sha}
+                        try:
+                            results, err, blob = fut.result()
+                        except Exception as e:
+                            results, err, blob = None, str(e), None
+                        if err:
+                            finish(dict(rec, status="error", stage="extract", error=err))
+                            continue
+                        rec.update(
+                            extraction_methods=[m for _, m in results],
+                            seconds=round(time.time() - t0, 2),
+                        )
+                        extras = [
+                            {"filename": os.path.basename(path)[:500], "file_path": blob,
+                             "sha256": sha if i == 0 else None}
+                            for i in range(len(results))
+                        ]
+                        writer.add(rec, results, extras)
+                    report()
+
+            for path, size, mtime, sha in candidates():
+                in_flight[pool.submit(_extract_file, path, sha)] = (path, size, mtime, sha, time.time())
+                drain(workers * 2)
+            drain(0)
+        writer.flush()
+        return stats
+    finally:
+        ckpt.close()
+        report(force=True)
+
+
+def main(argv: List[str] | None = None) -> None:
+    ap = argparse.ArgumentParser(description="Resumable bulk ingest of a directory of PDF bills")
+    ap.add_argument("root", help="directory to walk (recursively)")
+    ap.add_argument("--checkpoint", help="checkpoint file (default: <root>/.ingest-checkpoint.jsonl)")
+    ap.add_argument("--workers", type=int, default=int(os.getenv("INGEST_WORKERS", "0") or 0) or (os.cpu_count() or 1))
+    ap.add_argument("--flush-size", type=int, default=int(os.getenv("INGEST_FLUSH_SIZE", "50")), help="rows per INSERT")
+    ap.add_argument("--retry-errors", action="store_true", help="re-extract files that failed in an earlier run")
+    ap.add_argument("--dry-run", action="store_true", help="hash and dedupe only; report what would be extracted")
+    args = ap.parse_args(argv)
+
+    if not os.path.isdir(args.root):
+        ap.error(f"not a directory: {args.root}")
+    checkpoint = args.checkpoint or os.path.join(args.root, ".ingest-checkpoint.jsonl")
+    stats = ingest(args.root, checkpoint, max(1, args.workers), max(1, args.flush_size),
+                   args.retry_errors, args.dry_run)
+    if stats.counts.get("error"):
+        logger.warning("%d file(s) failed; see %s (rerun with --retry-errors)", stats.counts["error"], checkpoint)
+
+
+if __name__ == "__main__":
+    main()
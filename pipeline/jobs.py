@@ -0,0 +1,443 @@
+"""
+Durable extraction queue in Postgres (no extra infrastructure).
+
+Each upload is a row in `jobs`; its original is already in the blob store,
+so no work lives only in a process's memory. Workers on any number of nodes
+lease jobs with SELECT ... FOR UPDATE SKIP LOCKED, so two workers never take
+the same job and none waits on another's row lock.
+
+  received -> text -> parsed -> validated -> saved
+  any stage -> failed                             (permanent, e.g. unreadable PDF)
+  any stage -> (retry with backoff) -> ... -> dead (attempts exhausted)
+
+Leases: a leased job is invisible until lease_expires (JOB_VISIBILITY_SEC);
+every stage update extends it. A worker that dies mid-job simply lets the
+lease run out and another worker picks the job up again. attempts counts
+leases, so a job that keeps killing its worker ends up dead too.
+
+Retries restart from the stored PDF; the state records how far the last
+attempt got. A PDF whose blob already has saved bills is marked saved with
+those ids instead of being extracted again. Bills are inserted in the same
+transaction that marks the job saved, and only while the worker still holds
+the lease, so a job whose lease was lost and retaken cannot be saved twice.
+
+Every stage (plus vendor / issues / fallback details and the outcome) is
+appended to jobs.events and announced with NOTIFY for live progress streams
+(GET /jobs/{job_id}/events, pipeline/progress.py).
+
+  POST /jobs (upload) -> {"job_id"}          GET /jobs/{job_id}
+  python -m pipeline.jobs worker [--concurrency N]
+  python -m pipeline.jobs stats
+  python -m pipeline.jobs retry (--dead | --ids 1,2,3)
+
+Env:
+  JOB_CONCURRENCY (optional, jobs per worker process, default: 2)
+  JOB_VISIBILITY_SEC (optional, lease length, default: 300)
+  JOB_MAX_ATTEMPTS (optional, default: 5)
+  JOB_BACKOFF_BASE_SEC (optional, first retry delay, doubled per attempt, default: 10)
+  JOB_BACKOFF_MAX_SEC (optional, default: 900)
+  JOB_POLL_SEC (optional, idle poll interval, default: 2)
+"""
+
+from __future__ import annotations
+import os
+import json
+import time
+import random
+import socket
+import logging
+import argparse
+import threading
+from typing import Any, Dict, List, Optional
+
+from psycopg2 import errors as pg_errors
+from psycopg2.extras import Json
+
+from app import (
+    ExtractionError, _commit_retrying, extract_bills, flag_anomalies, get_db, insert_bills, remember_saved,
+)
+from pipeline.progress import publish, stage_timer
+
+logger = logging.getLogger("bill-worker.jobs")
+
+ACTIVE = ("received", "text", "parsed", "validated")
+TERMINAL = ("saved", "failed", "dead")
+
+_COLS = (
+    "id", "state", "filename", "file_path", "sha256", "attempts", "max_attempts",
+    "run_after", "leased_by", "lease_expires", "last_error", "bill_ids", "timings",
+    "created_at", "updated_at",
+)
+
+
+class LeaseLost(Exception):
+    """Another worker owns the job now (our lease expired)."""
+
+
+def _visibility() -> int:
+    return max(10, int(os.getenv("JOB_VISIBILITY_SEC", "300")))
+
+
+def backoff(attempt: int) -> float:
+    """Seconds before retry `attempt` (1-based): exponential, capped, with jitter."""
+    base = float(os.getenv("JOB_BACKOFF_BASE_SEC", "10"))
+    cap = float(os.getenv("JOB_BACKOFF_MAX_SEC", "900"))
+    delay = min(cap, base * (2 ** max(0, attempt - 1)))
+    return delay * random.uniform(0.8, 1.2)
+
+
+# ------------------------------
+# Producer side
+# ------------------------------
+def enqueue(file_path: str, filename: Optional[str] = None, sha256: Optional[str] = None) -> int:
+    """Queue a stored PDF (blob path) for extraction; returns the job id."""
+    conn = get_db()
+    cur = conn.cursor()
+    try:
+        cur.execute(
+            """
+            INSERT INTO jobs (state, filename, file_path, sha256, max_attempts, run_after, created_at, updated_at)
+            VALUES ('received', %s, %s, %s, %s, NOW(), NOW(), NOW())
+            RETURNING id
+            """,
+            (filename, file_path, sha256, max(1, int(os.getenv("JOB_MAX_ATTEMPTS", "5")))),
+        )
+        job_id = cur.fetchone()[0]
+        conn.commit()
+        return job_id
+    finally:
+        cur.close()
+        conn.close()
+
+
+def get_job(job_id: int) -> Optional[Dict[str, Any]]:
+    conn = get_db()
+    cur = conn.cursor()
+    try:
+        cur.execute(f"SELECT {', '.join(_COLS)} FROM jobs WHERE id = %s", (job_id,))
+        r = cur.fetchone()
+        return dict(zip(_COLS, r)) if r else None
+    finally:
+        cur.close()
+        conn.close()
+
+
+def retry(ids: Optional[List[int]] = None, dead: bool = False) -> int:
+    """Put jobs back in the queue with fresh attempts: the given dead/failed ids, or every dead job."""
+    if ids:
+        where, params = "state IN ('dead', 'failed') AND id = ANY(%s)", (ids,)
+    elif dead:
+        where, params = "state = 'dead'", ()
+    else:
+        return 0
+    conn = get_db()
+    cur = conn.cursor()
+    try:
+        cur.execute(
+            f"""
+            UPDATE jobs SET state = 'received', attempts = 0, run_after = NOW(),
+                   leased_by = NULL, lease_expires = NULL, updated_at = NOW()
+            WHERE {where}
+            """,
+            params,
+        )
+        n = cur.rowcount
+        conn.commit()
+        return n
+    finally:
+        cur.close()
+        conn.close()
+
+
+def stats() -> Dict[str, Any]:
+    conn = get_db()
+    cur = conn.cursor()
+    try:
+        cur.execute(
+            """
+            SELECT state, COUNT(*),
+                   COUNT(*) FILTER (WHERE lease_expires > NOW()) AS leased,
+                   EXTRACT(EPOCH FROM NOW() - MIN(created_at)) AS oldest_sec
+            FROM jobs GROUP BY state
+            """
+        )
+        return {
+            r[0]: {"count": r[1], "leased": r[2], "oldest_sec": round(float(r[3] or 0), 1)}
+            for r in cur.fetchall()
+        }
+    finally:
+        cur.close()
+        conn.close()
+
+
+# ------------------------------
+# Worker side
+# ------------------------------
+def lease(worker_id: str, n: int = 1) -> List[Dict[str, Any]]:
+    """Take up to n ready jobs: due, active, and not leased by a live worker."""
+    conn = get_db()
+    cur = conn.cursor()
+    try:
+        cur.execute(
+            f"""
+            WITH next AS (
+                SELECT id FROM jobs
+                WHERE state IN %s AND run_after <= NOW()
+                  AND (lease_expires IS NULL OR lease_expires < NOW())
+                ORDER BY run_after, id
+                LIMIT %s
+                FOR UPDATE SKIP LOCKED
+            )
+            UPDATE jobs j SET leased_by = %s, lease_expires = NOW() + make_interval(secs => %s),
+                   attempts = j.attempts + 1, updated_at = NOW()
+            FROM next WHERE j.id = next.id
+            RETURNING {', '.join('j.' + c for c in _COLS)}
+            """,
+            (ACTIVE, n, worker_id, _visibility()),
+        )
+        jobs = [dict(zip(_COLS, r)) for r in cur.fetchall()]
+        conn.commit()
+        return jobs
+    finally:
+        cur.close()
+        conn.close()
+
+
+def _event(name: str, seconds: Optional[float] = None, **detail) -> Dict[str, Any]:
+    return {"stage": name, "seconds": round(seconds, 3) if seconds is not None else None, **detail}
+
+
+def _transition(job: Dict[str, Any], worker_id: str, sets: str, params: tuple,
+                event: Optional[Dict[str, Any]] = None) -> None:
+    """Update a job we hold the lease on (and record `event`); LeaseLost if someone else has it now."""
+    conn = get_db()
+    cur = conn.cursor()
+    try:
+        cur.execute(
+            f"""
+            UPDATE jobs SET {sets}, events = events || %s, updated_at = NOW()
+            WHERE id = %s AND leased_by = %s AND state IN %s
+            RETURNING jsonb_array_length(events)
+            """,
+            params + (Json([event] if event else []), job["id"], worker_id, ACTIVE),
+        )
+        r = cur.fetchone()
+        if r is None:
+            conn.rollback()
+            raise LeaseLost(f"job {job['id']}")
+        if event:
+            publish(cur, job["id"], r[0] - 1, event)
+        conn.commit()
+    finally:
+        cur.close()
+        conn.close()
+
+
+def _stage(job: Dict[str, Any], worker_id: str, name: str, seconds: float, detail: Dict[str, Any]) -> None:
+    """extract_bills progress: job states move state/timings; vendor/issues/fallback are events only."""
+    if name in ACTIVE:
+        sets = ("state = %s, timings = COALESCE(timings, '{}'::jsonb) || %s, "
+                "lease_expires = NOW() + make_interval(secs => %s)")
+        params: tuple = (name, Json({name: round(seconds, 3)}), _visibility())
+        job["state"] = name
+    else:
+        sets, params = "lease_expires = NOW() + make_interval(secs => %s)", (_visibility(),)
+    _transition(job, worker_id, sets, params, _event(name, seconds, **detail))
+
+
+def _existing(job: Dict[str, Any]) -> List[int]:
+    """Bills already saved from this blob (same content, e.g. uploaded twice)."""
+    conn = get_db()
+    cur = conn.cursor()
+    try:
+        cur.execute(
+            "SELECT id FROM bills WHERE file_path = %s AND extraction_method IS NOT NULL ORDER BY id",
+            (job["file_path"],),
+        )
+        return [r[0] for r in cur.fetchall()]
+    finally:
+        cur.close()
+        conn.close()
+
+
+def _save(job: Dict[str, Any], worker_id: str, results, seconds: float) -> List[int]:
+    """
+    Insert the bills and mark the job saved in one transaction, if we still
+    hold it. A bill that a concurrent upload saved first is retried as its
+    duplicate (_commit_retrying) instead of failing the job.
+    """
+
+    def write(cur) -> List[int]:
+        cur.execute(
+            "SELECT 1 FROM jobs WHERE id = %s AND leased_by = %s AND state IN %s FOR UPDATE",
+            (job["id"], worker_id, ACTIVE),
+        )
+        if cur.fetchone() is None:
+            raise LeaseLost(f"job {job['id']}")
+        base = {"filename": job.get("filename"), "file_path": job.get("file_path")}
+        # sha256 is UNIQUE: only the first account of a split statement carries it
+        extras = [dict(base, sha256=job.get("sha256") if i == 0 else None) for i in range(len(results))]
+        ids = insert_bills(cur, results, extras)
+        event = _event("saved", seconds, bill_ids=ids)
+        cur.execute(
+            """
+            UPDATE jobs SET state = 'saved', bill_ids = %s, last_error = NULL,
+                   timings = COALESCE(timings, '{}'::jsonb) || %s, events = events || %s,
+                   leased_by = NULL, lease_expires = NULL, updated_at = NOW()
+            WHERE id = %s
+            RETURNING jsonb_array_length(events)
+            """,
+            (ids, Json({"saved": round(seconds, 3)}), Json([event]), job["id"]),
+        )
+        publish(cur, job["id"], cur.fetchone()[0] - 1, event)
+        return ids
+
+    conn = get_db()
+    try:
+        return _commit_retrying(conn, [norm for norm, _ in results], write)
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+def _fail(job: Dict[str, Any], worker_id: str, err: Exception, permanent: bool) -> str:
+    if permanent:
+        state, delay = "failed", 0.0
+    elif job["attempts"] >= job["max_attempts"]:
+        state, delay = "dead", 0.0
+    else:
+        state, delay = job["state"], backoff(job["attempts"])
+    try:
+        _transition(
+            job, worker_id,
+            "state = %s, last_error = %s, run_after = NOW() + make_interval(secs => %s), "
+            "leased_by = NULL, lease_expires = NULL",
+            (state, str(err)[:2000], delay),
+            _event(state if state in TERMINAL else "retry", error=str(err)[:500],
+                   attempt=job["attempts"], retry_in_sec=round(delay, 1) if delay else None),
+        )
+    except LeaseLost:
+        pass
+    return state
+
+
+def process(job: Dict[str, Any], worker_id: str) -> str:
+    """Run one leased job to its next resting state; returns that state."""
+    from pipeline.blobs import open_blob
+
+    if job["attempts"] > job["max_attempts"]:
+        # its leases kept expiring: the worker died (or hung) every time
+        return _fail(job, worker_id, RuntimeError("lease expired on every attempt"), permanent=False)
+
+    existing = _existing(job)
+    if existing:
+        try:
+            _transition(
+                job, worker_id,
+                "state = 'saved', bill_ids = %s, last_error = NULL, leased_by = NULL, lease_expires = NULL",
+                (existing,),
+                _event("saved", bill_ids=existing, existing=True),
+            )
+        except LeaseLost:
+            return "lost"
+        logger.info("Job %s: file already saved as bills %s", job["id"], existing)
+        return "saved"
+
+    t0 = last = time.perf_counter()
+
+    def on_stage(name: str, seconds: float, detail: Dict[str, Any]) -> None:
+        nonlocal last
+        _stage(job, worker_id, name, seconds, detail)
+        last = time.perf_counter()
+
+    try:
+        data = open_blob(job["file_path"])
+        try:
+            results = extract_bills(data, on_stage=stage_timer(on_stage))
+        finally:
+            if hasattr(data, "close"):
+                data.close()
+        ids = _save(job, worker_id, results, time.perf_counter() - last)
+    except LeaseLost:
+        logger.warning("Job %s: lease lost; leaving it to its new owner", job["id"])
+        return "lost"
+    except (ExtractionError, FileNotFoundError, pg_errors.UniqueViolation) as e:
+        # a conflict left after the duplicate retry (e.g. the same file's sha256) won't clear by re-extracting
+        permanent = not isinstance(e, ExtractionError) or e.status_code < 500
+        state = _fail(job, worker_id, e, permanent)
+        logger.warning("Job %s -> %s: %s", job["id"], state, e)
+        return state
+    except Exception as e:
+        state = _fail(job, worker_id, e, permanent=False)
+        logger.warning("Job %s -> %s (attempt %s/%s): %s", job["id"], state, job["attempts"], job["max_attempts"], e)
+        return state
+
+    remember_saved(ids, [norm for norm, _ in results])
+    flag_anomalies(ids)
+    logger.info("Job %s saved: bills %s (%.1fs)", job["id"], ids, time.perf_counter() - t0)
+    return "saved"
+
+
+def work(stop: Optional[threading.Event] = None, concurrency: Optional[int] = None) -> None:
+    """Worker loop: `concurrency` threads, each leasing and running one job at a time."""
+    stop = stop or threading.Event()
+    concurrency = max(1, concurrency or int(os.getenv("JOB_CONCURRENCY", "2")))
+    poll = float(os.getenv("JOB_POLL_SEC", "2"))
+    host = f"{socket.gethostname()}:{os.getpid()}"
+
+    def loop(n: int) -> None:
+        worker_id = f"{host}:{n}"
+        while not stop.is_set():
+            try:
+                jobs = lease(worker_id)
+            except Exception as e:
+                logger.error("Lease failed: %s", e)
+                stop.wait(poll)
+                continue
+            if not jobs:
+                stop.wait(poll)
+                continue
+            for job in jobs:
+                process(job, worker_id)
+
+    threads = [threading.Thread(target=loop, args=(n,), name=f"job-worker-{n}", daemon=True) for n in range(concurrency)]
+    for t in threads:
+        t.start()
+    logger.info("Job worker %s started (%d threads)", host, concurrency)
+    try:
+        while any(t.is_alive() for t in threads):
+            for t in threads:
+                t.join(timeout=1.0)
+    except KeyboardInterrupt:
+        logger.info("Stopping after the jobs in progress")
+        stop.set()
+        for t in threads:
+            t.join()
+
+
+def main(argv: List[str] | None = None) -> None:
+    ap = argparse.ArgumentParser(description="Postgres-backed extraction job queue")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    w = sub.add_parser("worker", help="lease and run jobs until interrupted")
+    w.add_argument("--concurrency", type=int, help="jobs at once (default: JOB_CONCURRENCY)")
+    sub.add_parser("stats", help="jobs per state")
+    r = sub.add_parser("retry", help="requeue dead (and failed) jobs")
+    r.add_argument("--dead", action="store_true", help="all dead jobs")
+    r.add_argument("--ids", help="comma-separated job ids (dead or failed)")
+    args = ap.parse_args(argv)
+
+    if args.cmd == "worker":
+        work(concurrency=args.concurrency)
+    elif args.cmd == "stats":
+        print(json.dumps(stats(), indent=2))
+    else:
+        if not args.dead and not args.ids:
+            ap.error("retry needs --dead or --ids")
+        ids = [int(x) for x in args.ids.split(",")] if args.ids else None
+        print(json.dumps({"requeued": retry(ids, dead=args.dead)}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
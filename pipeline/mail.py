@@ -0,0 +1,238 @@
+"""
+Email ingestion: PDF attachments from a local Maildir -> extraction -> bills.
+
+Most bills arrive by email. A mail server (Dovecot, getmail, fetchmail, ...)
+delivers into a Maildir; this daemon polls it and feeds every PDF attachment
+through the same loop as /parse-batch (process_entries), so dedupe by
+SHA-256, bounded concurrency and batched INSERTs all come for free.
+
+Filled per bill: email_subject, email_from, email_received_date, filename
+(attachment name) and file_path (the attachment in the PDF store).
+
+Checkpointing uses the Maildir itself: a message is done once it carries the
+Seen flag (moved to cur/ with ":2,S", the way an IMAP server marks it read),
+so a restart picks up exactly the unseen messages. Messages whose attachment
+failed to extract are also flagged (F) for a human; messages with a failed
+database write stay unseen and are retried on the next poll.
+
+Usage:
+  python -m pipeline.mail /var/mail/bills/Maildir [--once] [--interval 30]
+
+Env:
+  MAIL_MAILDIR (optional, used when no path is given)
+  MAIL_POLL_SEC (optional, default: 30)
+  MAIL_BATCH_MESSAGES (optional, messages per poll, default: 200)
+  MAIL_CONCURRENCY (optional, default: BATCH_CONCURRENCY)
+"""
+
+from __future__ import annotations
+import os
+import email
+import signal
+import logging
+import argparse
+import threading
+from email import policy
+from email.utils import parseaddr, parsedate_to_datetime
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from pipeline.batch import _max_file_bytes, process_entries
+
+logger = logging.getLogger("bill-worker.mail")
+
+SEEN, FLAGGED = "S", "F"
+
+
+# ------------------------------
+# Maildir
+# ------------------------------
+def _split_name(fname: str) -> Tuple[str, str]:
+    """Maildir file name -> (unique key, flags)."""
+    key, sep, info = fname.partition(":")
+    flags = info[2:] if sep and info.startswith("2,") else ""
+    return key, flags
+
+
+def unseen_messages(maildir: str, limit: int) -> List[Tuple[str, str]]:
+    """(key, path) of messages without the Seen flag, oldest delivery first."""
+    found: List[Tuple[float, str, str]] = []
+    for sub in ("new", "cur"):
+        d = os.path.join(maildir, sub)
+        try:
+            names = os.listdir(d)
+        except FileNotFoundError:
+            continue
+        for fname in names:
+            if fname.startswith("."):
+                continue
+            key, flags = _split_name(fname)
+            if SEEN in flags:
+                continue
+            path = os.path.join(d, fname)
+            try:
+                found.append((os.path.getmtime(path), key, path))
+            except OSError:
+                continue  # moved by another client
+    found.sort()
+    return [(key, path) for _, key, path in found[:limit]]
+
+
+def mark(maildir: str, path: str, *flags: str) -> None:
+    """Add flags and move to cur/ (one atomic rename)."""
+    key, current = _split_name(os.path.basename(path))
+    merged = "".join(sorted(set(current) | set(flags)))
+    try:
+        os.rename(path, os.path.join(maildir, "cur", f"{key}:2,{merged}"))
+    except FileNotFoundError:
+        logger.warning("Message %s vanished before it could be marked", key)
+
+
+# ------------------------------
+# Messages
+# ------------------------------
+def _received(msg, path: str) -> datetime:
+    """Date header in UTC (the column has no zone); the delivery time if missing or bad."""
+    try:
+        dt = parsedate_to_datetime(str(msg["date"]))
+        if dt.tzinfo is None:
+            return dt
+        return datetime.utcfromtimestamp(dt.timestamp())
+    except Exception:
+        return datetime.utcfromtimestamp(os.path.getmtime(path))
+
+
+def _pdf_parts(msg) -> Iterator[Tuple[str, Any]]:
+    for part in msg.iter_attachments():
+        name = part.get_filename() or ""
+        ctype = part.get_content_type()
+        if ctype != "application/pdf" and not name.lower().endswith(".pdf"):
+            continue
+        yield name or "attachment.pdf", part
+
+
+def read_message(path: str) -> Tuple[Dict[str, Any], List[Tuple[str, Any]]]:
+    """Email columns + [(attachment name, bytes-or-error)] for one message file."""
+    with open(path, "rb") as fh:
+        msg = email.message_from_binary_file(fh, policy=policy.default)
+    display, addr = parseaddr(str(msg["from"] or ""))
+    meta = {
+        "email_subject": str(msg["subject"] or "") or None,
+        "email_from": (addr or display)[:255] or None,
+        "email_received_date": _received(msg, path),
+    }
+    limit = _max_file_bytes()
+    attachments: List[Tuple[str, Any]] = []
+    for name, part in _pdf_parts(msg):
+        try:
+            data = part.get_payload(decode=True) or b""
+            if len(data) > limit:
+                attachments.append((name, ValueError(f"File larger than {limit} bytes")))
+            elif not data:
+                attachments.append((name, ValueError("Empty attachment")))
+            else:
+                attachments.append((name, data))
+        except Exception as e:
+            attachments.append((name, e))
+    return meta, attachments
+
+
+# ------------------------------
+# Polling
+# ------------------------------
+def poll_once(maildir: str, stop: Optional[threading.Event] = None) -> Dict[str, int]:
+    """Process up to MAIL_BATCH_MESSAGES unseen messages; returns status counts."""
+    limit = int(os.getenv("MAIL_BATCH_MESSAGES", "200"))
+    concurrency = int(os.getenv("MAIL_CONCURRENCY", "0") or 0) or None
+    messages = unseen_messages(maildir, limit)
+    if not messages:
+        return {}
+
+    # entry name "<message key>/<n>" -> source columns; messages are read one at a time
+    meta_by_entry: Dict[str, Dict[str, Any]] = {}
+    outcome: Dict[str, List[Dict[str, Any]]] = {}
+    expected: Dict[str, int] = {}
+    path_by_key: Dict[str, str] = {}
+    counts: Dict[str, int] = {}
+    lock = threading.Lock()
+
+    def entries() -> Iterator[Tuple[str, Any]]:
+        for key, path in messages:
+            try:
+                meta, attachments = read_message(path)
+            except Exception as e:
+                logger.warning("Unreadable message %s: %s", key, e)
+                mark(maildir, path, SEEN, FLAGGED)
+                continue
+            if not attachments:
+                mark(maildir, path, SEEN)
+                continue
+            path_by_key[key] = path
+            expected[key] = len(attachments)
+            for n, (name, data) in enumerate(attachments):
+                entry = f"{key}/{n}"
+                meta_by_entry[entry] = dict(meta, filename=name[:500])
+                yield entry, data
+
+    def extra_for(entry: str, sha: str) -> Dict[str, Any]:
+        return meta_by_entry.get(entry, {})
+
+    def emit(summary: Dict[str, Any]) -> None:
+        key = (summary.get("filename") or "").rsplit("/", 1)[0]
+        with lock:
+            counts[summary["status"]] = counts.get(summary["status"], 0) + 1
+            outcome.setdefault(key, []).append(summary)
+        if summary["status"] == "error":
+            logger.warning("Mail %s: %s", summary.get("filename"), summary.get("error"))
+
+    process_entries(entries(), emit, extra_for=extra_for, concurrency=concurrency, cancelled=stop)
+
+    for key, path in path_by_key.items():
+        results = outcome.get(key, [])
+        if len(results) < expected[key] or any(r.get("stage") == "save" for r in results):
+            # stopped mid-message or database trouble: leave unseen, retry next poll
+            counts["retry"] = counts.get("retry", 0) + 1
+            continue
+        if any(r["status"] == "error" for r in results):
+            mark(maildir, path, SEEN, FLAGGED)
+        else:
+            mark(maildir, path, SEEN)
+
+    logger.info("Mail poll: %d message(s), %s", len(messages), counts)
+    return counts
+
+
+def run(maildir: str, interval: float, once: bool = False) -> None:
+    if not os.path.isdir(os.path.join(maildir, "new")):
+        raise SystemExit(f"Not a Maildir (no new/ directory): {maildir}")
+    stop = threading.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, lambda *_: stop.set())
+
+    logger.info("Watching %s every %ss", maildir, interval)
+    while not stop.is_set():
+        try:
+            counts = poll_once(maildir, stop)
+        except Exception as e:
+            logger.error("Mail poll failed: %s", e, exc_info=True)
+            counts = {}
+        if once:
+            break
+        if counts and not counts.get("retry"):
+            continue  # backlog: go again straight away
+        stop.wait(interval)
+
+
+def main(argv: List[str] | None = None) -> None:
+    ap = argparse.ArgumentParser(description="Ingest PDF bill attachments from a Maildir")
+    ap.add_argument("maildir", nargs="?", default=os.getenv("MAIL_MAILDIR"), help="Maildir path (default: MAIL_MAILDIR)")
+    ap.add_argument("--interval", type=float, default=float(os.getenv("MAIL_POLL_SEC", "30")), help="seconds between polls")
+    ap.add_argument("--once", action="store_true", help="process what is there and exit")
+    args = ap.parse_args(argv)
+    if not args.maildir:
+        ap.error("no Maildir given (argument or MAIL_MAILDIR)")
+    run(args.maildir, args.interval, args.once)
+
+
+if __name__ == "__main__":
+    main()
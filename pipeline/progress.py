@@ -0,0 +1,270 @@
+"""
+Live extraction progress as Server-Sent Events.
+
+  GET /jobs/{job_id}/events        GET /batches/{batch_id}/events
+
+Each stream starts with a `state` event (where the job/batch is now), then
+one `stage` event per step as it happens:
+
+  text       text layer extracted (source, chars)
+  parsed     statement split (accounts)
+  vendor     vendor fingerprint matched (apply_vendor_enhancements)
+  issues     validation issues of a pass (extractor, issues, confidence)
+  fallback   a pass was rejected and the next extractor runs
+  validated  extraction finished (methods, failed_accounts)
+  saved      bills written (bill_ids)            jobs: also retry / failed / dead
+
+Every stage carries `seconds` since the previous one. Batch streams add one
+`file` event per finished file (the GET /batches/{id} result) and end with
+`end`; job streams end after a terminal stage.
+
+Jobs run in worker processes, so their events are appended to jobs.events
+and announced with NOTIFY in the same transaction. Each API process holds a
+single LISTEN connection whose socket is watched by the event loop; it fans
+notifications out to per-client asyncio queues. A connected client is an
+async generator awaiting its queue: no thread and no database polling per
+client, however many are idle. Event ids (jobs: index in jobs.events,
+batches: result seq) let a reconnecting EventSource resume with
+Last-Event-ID.
+
+Env:
+  SSE_HEARTBEAT_SEC (optional, keep-alive comment interval, default: 15)
+"""
+
+from __future__ import annotations
+import os
+import json
+import time
+import asyncio
+import logging
+from typing import Any, AsyncIterator, Dict, Optional, Set
+
+from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
+from starlette.concurrency import run_in_threadpool
+
+from app import get_db
+
+logger = logging.getLogger("bill-worker.progress")
+
+CHANNEL = "job_progress"
+# NOTIFY payloads are capped at 8000 bytes; bigger events are announced by
+# id only and read back from jobs.events
+_MAX_PAYLOAD = 7000
+
+TERMINAL_STAGES = ("saved", "failed", "dead")
+
+_RESYNC = {"resync": True}
+
+
+def _heartbeat() -> float:
+    return max(1.0, float(os.getenv("SSE_HEARTBEAT_SEC", "15")))
+
+
+def _dumps(obj: Any) -> str:
+    return json.dumps(obj, default=str, separators=(",", ":"))
+
+
+def sse(event: str, data: Any, event_id: Optional[int] = None) -> str:
+    head = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{head}event: {event}\ndata: {_dumps(data)}\n\n"
+
+
+def last_event_id(header: Optional[str]) -> int:
+    """Last-Event-ID header -> last id the client has seen (-1: none)."""
+    try:
+        return int(header) if header is not None else -1
+    except ValueError:
+        return -1
+
+
+def stage_timer(publish):
+    """on_stage callback for extract_bills: publish(name, seconds, detail) with per-stage timings."""
+    last = time.perf_counter()
+
+    def on_stage(name: str, **detail) -> None:
+        nonlocal last
+        now = time.perf_counter()
+        publish(name, round(now - last, 3), detail)
+        last = now
+
+    return on_stage
+
+
+# ------------------------------
+# Publishing (worker side, inside the job's transaction)
+# ------------------------------
+def publish(cur, job_id: int, seq: int, event: Dict[str, Any]) -> None:
+    payload = _dumps({"job_id": job_id, "seq": seq, "event": event})
+    if len(payload.encode()) > _MAX_PAYLOAD:
+        payload = _dumps({"job_id": job_id, "seq": seq})
+    cur.execute("SELECT pg_notify(%s, %s)", (CHANNEL, payload))
+
+
+# ------------------------------
+# Listening (API side, one connection per process)
+# ------------------------------
+class Hub:
+    """Fans NOTIFYs on CHANNEL out to the asyncio queues of connected clients."""
+
+    def __init__(self):
+        self.conn = None
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.subs: Dict[int, Set[asyncio.Queue]] = {}
+        self._lock: Optional[asyncio.Lock] = None
+
+    async def subscribe(self, job_id: int) -> asyncio.Queue:
+        q: asyncio.Queue = asyncio.Queue()
+        self.subs.setdefault(job_id, set()).add(q)
+        try:
+            await self._ensure()
+        except Exception:
+            self.unsubscribe(job_id, q)
+            raise
+        return q
+
+    def unsubscribe(self, job_id: int, q: asyncio.Queue) -> None:
+        qs = self.subs.get(job_id)
+        if qs is not None:
+            qs.discard(q)
+            if not qs:
+                self.subs.pop(job_id, None)
+
+    async def _ensure(self) -> None:
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if self.conn is not None and not self.conn.closed:
+                return
+            self.conn = await run_in_threadpool(self._connect)
+            self.loop = asyncio.get_running_loop()
+            self.loop.add_reader(self.conn.fileno(), self._on_readable)
+            logger.info("Listening for job progress on %s", CHANNEL)
+
+    @staticmethod
+    def _connect():
+        conn = get_db()
+        conn.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+        cur = conn.cursor()
+        cur.execute(f"LISTEN {CHANNEL}")
+        cur.close()
+        return conn
+
+    def _on_readable(self) -> None:
+        try:
+            self.conn.poll()
+        except Exception as e:
+            logger.warning("Progress listener lost its connection: %s", e)
+            self._drop()
+            return
+        while self.conn.notifies:
+            n = self.conn.notifies.pop(0)
+            try:
+                msg = json.loads(n.payload)
+            except ValueError:
+                continue
+            for q in self.subs.get(msg.get("job_id"), ()):
+                q.put_nowait(msg)
+
+    def _drop(self) -> None:
+        """Forget the dead connection; clients re-read from the table and the first one reconnects."""
+        try:
+            self.loop.remove_reader(self.conn.fileno())
+        except Exception:
+            pass
+        try:
+            self.conn.close()
+        except Exception:
+            pass
+        self.conn = None
+        for qs in self.subs.values():
+            for q in qs:
+                q.put_nowait(_RESYNC)
+
+
+HUB = Hub()
+
+
+def _job_state(job_id: int):
+    conn = get_db()
+    cur = conn.cursor()
+    try:
+        cur.execute("SELECT state, timings, bill_ids, events FROM jobs WHERE id = %s", (job_id,))
+        return cur.fetchone()
+    finally:
+        cur.close()
+        conn.close()
+
+
+async def job_stream(job_id: int, request, last_id: int = -1) -> AsyncIterator[str]:
+    """SSE for one job: stored events after last_id, then live ones until a terminal stage."""
+    q = await HUB.subscribe(job_id)
+    try:
+        row = await run_in_threadpool(_job_state, job_id)
+        if row is None:
+            return
+        state, timings, bill_ids, events = row
+        yield sse("state", {"job_id": job_id, "state": state, "timings": timings or {}, "bill_ids": bill_ids})
+        events = events or []
+        for seq in range(last_id + 1, len(events)):
+            yield sse("stage", events[seq], seq)
+        last_id = max(last_id, len(events) - 1)
+        if state in TERMINAL_STAGES:
+            return
+
+        while True:
+            try:
+                msg = await asyncio.wait_for(q.get(), _heartbeat())
+            except asyncio.TimeoutError:
+                if await request.is_disconnected():
+                    return
+                yield ": ping\n\n"
+                continue
+
+            if msg is _RESYNC or msg["seq"] > last_id + 1 or "event" not in msg:
+                # missed or oversized notification: read what we lack from the table
+                if msg is _RESYNC:
+                    await HUB._ensure()
+                row = await run_in_threadpool(_job_state, job_id)
+                pending = list(enumerate(row[3] or []))[last_id + 1:] if row else []
+            elif msg["seq"] <= last_id:
+                continue
+            else:
+                pending = [(msg["seq"], msg["event"])]
+
+            for seq, event in pending:
+                yield sse("stage", event, seq)
+                last_id = seq
+                if event.get("stage") in TERMINAL_STAGES:
+                    return
+    finally:
+        HUB.unsubscribe(job_id, q)
+
+
+async def batch_stream(batch, request, last_id: int = -1) -> AsyncIterator[str]:
+    """SSE for an in-process batch: live stage events per file, plus every finished file."""
+    q = batch.subscribe(asyncio.get_running_loop())
+    try:
+        snap = batch.snapshot(since=0)
+        snap.pop("results")
+        yield sse("state", snap)
+        next_seq = last_id + 1
+        while True:
+            snap = batch.snapshot(since=next_seq)
+            for result in snap["results"]:
+                yield sse("file", result, result["seq"])
+                next_seq = result["seq"] + 1
+            if snap["status"] == "finished":
+                snap.pop("results")
+                yield sse("end", snap)
+                return
+            try:
+                item = await asyncio.wait_for(q.get(), _heartbeat())
+            except asyncio.TimeoutError:
+                if await request.is_disconnected():
+                    return
+                yield ": ping\n\n"
+                continue
+            if item is not None:
+                yield sse("stage", item)
+    finally:
+        batch.unsubscribe(q)
@@ -0,0 +1,166 @@
+"""
+Read side: GET /bills listing with filters, column selection and keyset pagination.
+
+Pages are addressed by an opaque cursor holding the last row's sort key
+(id, or billing_date + id), never by OFFSET, so page 1000 costs the same as
+page 1. Every filter combination the dashboards use has a composite index
+ending in (billing_date, id) (see init.sql), so a page is an index range scan.
+
+Sorting by billing_date only lists bills that have one.
+"""
+
+from __future__ import annotations
+import json
+import base64
+from datetime import date
+from typing import Any, Dict, List, Optional, Tuple
+
+from app import BILL_FIELDS, get_db
+
+# Columns a caller may ask for with ?fields=
+SELECTABLE = (
+    ("id",) + BILL_FIELDS + (
+        "confidence_score", "extraction_method", "requires_review", "reviewed",
+        "anomaly_score", "anomaly_flags", "duplicate_of", "filename", "file_path", "sha256", "email_subject", "email_from", "email_received_date",
+        "raw_extracted_data", "created_at", "updated_at",
+    )
+)
+
+DEFAULT_FIELDS = (
+    "id", "property_name", "utility_provider", "utility_type", "account_number",
+    "billing_date", "billing_start_date", "billing_end_date", "due_date",
+    "total_amount_due", "units_used", "unit_type",
+    "extraction_method", "confidence_score", "requires_review",
+)
+
+ORDERS = ("id", "billing_date")
+MAX_LIMIT = 500
+
+
+class QueryError(ValueError):
+    """Bad listing parameters (surfaced as HTTP 400)."""
+
+
+def encode_cursor(key: Tuple[Any, ...]) -> str:
+    raw = json.dumps([k.isoformat() if isinstance(k, date) else k for k in key])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, order: str = "id") -> List[Any]:
+    """Cursor -> sort key for `order`, checked so that no bad value reaches SQL."""
+    try:
+        pad = "=" * (-len(cursor) % 4)
+        key = json.loads(base64.urlsafe_b64decode(cursor + pad).decode())
+    except Exception:
+        raise QueryError("Invalid cursor")
+    size = 2 if order == "billing_date" else 1
+    if not isinstance(key, list) or len(key) != size:
+        raise QueryError(f"Cursor does not match order={order}")
+    # bills.id is a SERIAL (int4)
+    if not isinstance(key[-1], int) or isinstance(key[-1], bool) or not -2**31 <= key[-1] < 2**31:
+        raise QueryError("Invalid cursor")
+    if order == "billing_date":
+        try:
+            key[0] = date.fromisoformat(key[0])
+        except (TypeError, ValueError):
+            raise QueryError("Invalid cursor")
+    return key
+
+
+def _fields(fields: Optional[str]) -> List[str]:
+    if not fields:
+        return list(DEFAULT_FIELDS)
+    out = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [f for f in out if f not in SELECTABLE]
+    if unknown:
+        raise QueryError(f"Unknown fields: {', '.join(unknown)}")
+    return out
+
+
+def list_bills(
+    *,
+    utility_provider: Optional[str] = None,
+    property_name: Optional[str] = None,
+    utility_type: Optional[str] = None,
+    account_number: Optional[str] = None,
+    billing_date_from: Optional[date] = None,
+    billing_date_to: Optional[date] = None,
+    requires_review: Optional[bool] = None,
+    fields: Optional[str] = None,
+    order: str = "id",
+    direction: str = "desc",
+    limit: int = 50,
+    cursor: Optional[str] = None,
+) -> Dict[str, Any]:
+    if order not in ORDERS:
+        raise QueryError(f"order must be one of {', '.join(ORDERS)}")
+    if direction not in ("asc", "desc"):
+        raise QueryError("direction must be asc or desc")
+    limit = max(1, min(int(limit), MAX_LIMIT))
+    cols = _fields(fields)
+    # the cursor needs the sort key of the last row, even if not requested
+    select = list(dict.fromkeys(cols + ["id"] + (["billing_date"] if order == "billing_date" else [])))
+
+    where: List[str] = []
+    params: List[Any] = []
+    for col, val in (
+        ("utility_provider", utility_provider),
+        ("property_name", property_name),
+        ("utility_type", utility_type),
+        ("account_number", account_number),
+    ):
+        if val is not None:
+            where.append(f"{col} = %s")
+            params.append(val)
+    if billing_date_from is not None:
+        where.append("billing_date >= %s")
+        params.append(billing_date_from)
+    if billing_date_to is not None:
+        where.append("billing_date <= %s")
+        params.append(billing_date_to)
+    if requires_review is not None:
+        where.append("requires_review = %s")
+        params.append(requires_review)
+    # stubs still being extracted are not bills yet
+    where.append("extraction_method IS NOT NULL")
+
+    op = "<" if direction == "desc" else ">"
+    if order == "billing_date":
+        where.append("billing_date IS NOT NULL")
+        order_sql = f"billing_date {direction.upper()}, id {direction.upper()}"
+        if cursor:
+            key = decode_cursor(cursor, order)
+            where.append(f"(billing_date, id) {op} (%s::date, %s)")
+            params.extend(key)
+    else:
+        order_sql = f"id {direction.upper()}"
+        if cursor:
+            key = decode_cursor(cursor, order)
+            where.append(f"id {op} %s")
+            params.append(key[0])
+
+    sql = (
+        f"SELECT {', '.join(select)} FROM bills WHERE {' AND '.join(where)} "
+        f"ORDER BY {order_sql} LIMIT %s"
+    )
+    params.append(limit + 1)  # one extra row tells whether there is a next page
+
+    conn = get_db()
+    cur = conn.cursor()
+    try:
+        cur.execute(sql, params)
+        rows = [dict(zip(select, r)) for r in cur.fetchall()]
+    finally:
+        cur.close()
+        conn.close()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor((last["billing_date"], last["id"]) if order == "billing_date" else (last["id"],))
+    return {
+        "items": [{c: r[c] for c in cols} for r in rows],
+        "count": len(rows),
+        "next_cursor": next_cursor,
+    }
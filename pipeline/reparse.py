@@ -0,0 +1,324 @@
+"""
+Re-parse saved bills from their stored text (bill_texts) - no PDF.co, no OpenAI.
+
+Runs only the local chain on the text a bill was originally extracted from:
+
+  parse_bill_text -> vendor enhancer -> normalize_fields -> validate_normalized
+  (-> score_confidence)
+
+so a regex fix in a vendor module can be applied to past bills for free.
+A result is written back only when it differs from the row and passes the
+usual bar (valid and confidence >= 0.70), unless forced. Bills first saved
+from OpenAI are only replaced when the regex result now passes.
+
+Stale bills: every vendor module declares PARSER_VERSION and bills record
+vendor_key/vendor_parser_version. --stale (and the optional startup job)
+picks only bills whose version is behind their module's, so a fix to one
+vendor re-parses that vendor's bills only. Batches are parsed in a process
+pool; rows whose fields did not change only get their version bumped.
+
+  POST /bills/{bill_id}/reparse
+  python -m pipeline.reparse [--stale] [--vendor KEY] [--provider NAME] [--ids 1,2,3] [--dry-run] [--force]
+
+Env:
+  REPARSE_BATCH_SIZE (optional, bills per read/write batch, default: 200)
+  REPARSE_WORKERS (optional, parse processes, default: CPU count)
+  REPARSE_STALE_ON_STARTUP (optional, run the stale job in the API process, default: false)
+"""
+
+from __future__ import annotations
+import os
+import json
+import time
+import logging
+import argparse
+import threading
+from datetime import date
+from decimal import Decimal
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from psycopg2.extras import execute_values
+
+from app import BILL_FIELDS, _score, _update_bill, get_db, load_text, remember_saved, unpack_text
+from extractors.pdfco import parse_bill_text
+from extractors.vendors import parser_versions
+
+logger = logging.getLogger("bill-worker.reparse")
+
+# raw keys that describe the PDF, not the parse: kept across re-parses
+_CARRY_OVER = ("pdf_probe", "text_extraction")
+
+# the version is bookkeeping, not data: a version-only difference is not a change
+_COMPARED = tuple(k for k in BILL_FIELDS if k != "vendor_parser_version") + ("confidence_score",)
+_SELECTED = ("id", "extraction_method", "raw_extracted_data", "vendor_parser_version") + _COMPARED
+
+
+def _comparable(v: Any) -> Any:
+    if isinstance(v, (Decimal, float, int)) and not isinstance(v, bool):
+        return round(float(v), 2)
+    if isinstance(v, date):
+        return v.isoformat()
+    return v
+
+
+def diff(row: Dict[str, Any], norm: Dict[str, Any]) -> Dict[str, List[Any]]:
+    """{field: [old, new]} for every column the re-parse would change."""
+    out: Dict[str, List[Any]] = {}
+    for k in _COMPARED:
+        old, new = _comparable(row.get(k)), _comparable(norm.get(k))
+        if old != new:
+            out[k] = [old, new]
+    return out
+
+
+def reparse_text(txt: str, extractor: str, old_raw: Optional[Dict[str, Any]] = None,
+                 vendor_hint: Optional[str] = None):
+    """
+    Local chain on stored text -> (norm, ok, issues, conf). `vendor_hint` is the
+    bill's saved vendor_key: the text of one account split out of a consolidated
+    statement often lacks the vendor's fingerprint keywords.
+    """
+    raw = parse_bill_text(txt, vendor_hint)
+    raw.pop("source_text", None)  # already stored
+    for k in _CARRY_OVER:
+        if old_raw and k in old_raw:
+            raw[k] = old_raw[k]
+    raw["reparsed_at"] = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+    return _score(extractor, raw)
+
+
+def _rows(cur, ids: List[int]) -> Dict[int, Dict[str, Any]]:
+    cur.execute(f"SELECT {', '.join(_SELECTED)} FROM bills WHERE id = ANY(%s)", (ids,))
+    return {r[0]: dict(zip(_SELECTED, r)) for r in cur.fetchall()}
+
+
+def _decide(row: Dict[str, Any], norm: Dict[str, Any], ok: bool, conf: float, force: bool) -> Tuple[bool, str]:
+    changes = diff(row, norm)
+    if not changes:
+        return False, "unchanged"
+    if not force and ((not ok) or conf < 0.70):
+        return False, "not_valid"
+    return True, "changed"
+
+
+def reparse_bill(bill_id: int, save: bool = True, force: bool = False) -> Optional[Dict[str, Any]]:
+    """Re-parse one bill; None when no text is stored for it."""
+    conn = get_db()
+    cur = conn.cursor()
+    try:
+        stored = load_text(cur, bill_id)
+        if stored is None:
+            return None
+        extractor, txt = stored
+        row = _rows(cur, [bill_id]).get(bill_id)
+        if row is None:
+            return None
+        norm, ok, issues, conf = reparse_text(txt, extractor, row.get("raw_extracted_data"), row.get("vendor_key"))
+        write, outcome = _decide(row, norm, ok, conf, force)
+        if write and save:
+            _update_bill(cur, bill_id, norm, extractor)
+            conn.commit()
+            remember_saved([bill_id], [norm])
+        return {
+            "bill_id": bill_id,
+            "extractor": extractor,
+            "previous_method": row.get("extraction_method"),
+            "outcome": outcome,
+            "saved": bool(write and save),
+            "changes": diff(row, norm),
+            "issues": issues,
+            "confidence": conf,
+            "data": norm,
+        }
+    finally:
+        cur.close()
+        conn.close()
+
+
+# ------------------------------
+# Bulk
+# ------------------------------
+_POOL: Optional[ProcessPoolExecutor] = None
+_POOL_LOCK = threading.Lock()
+
+
+def _pool() -> ProcessPoolExecutor:
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is None:
+            workers = int(os.getenv("REPARSE_WORKERS", "0") or 0) or (os.cpu_count() or 1)
+            _POOL = ProcessPoolExecutor(max_workers=max(1, workers))
+        return _POOL
+
+
+def _parse_job(bill_id: int, extractor: str, text_z: bytes, page_sep: Optional[str],
+               old_raw: Optional[Dict[str, Any]], vendor_hint: Optional[str] = None):
+    """Worker entry point: decompress + parse one bill -> (bill_id, norm, ok, conf)."""
+    norm, ok, _, conf = reparse_text(unpack_text(extractor, text_z, page_sep), extractor, old_raw, vendor_hint)
+    return bill_id, norm, ok, conf
+
+
+def _texts(cur, ids: List[int]) -> Dict[int, Tuple[str, bytes, Optional[str]]]:
+    """Newest stored text per bill, still compressed (decompressed in the workers)."""
+    cur.execute(
+        """
+        SELECT DISTINCT ON (bill_id) bill_id, extractor, text_z, page_sep FROM bill_texts
+        WHERE bill_id = ANY(%s) ORDER BY bill_id, created_at DESC
+        """,
+        (ids,),
+    )
+    return {r[0]: (r[1], bytes(r[2]), r[3]) for r in cur.fetchall()}
+
+
+def iter_bill_ids(provider: Optional[str] = None, ids: Optional[List[int]] = None,
+                  stale: bool = False, vendor: Optional[str] = None,
+                  batch_size: int = 200) -> Iterator[List[int]]:
+    """Ids of bills with stored text, in id order (keyset pages)."""
+    versions = parser_versions()
+    if vendor:
+        versions = {k: v for k, v in versions.items() if k == vendor}
+    # (vendor_key, current version) pairs; stale = row version behind its module's
+    current = list(versions.items())
+    last = 0
+    while True:
+        conn = get_db()
+        cur = conn.cursor()
+        try:
+            sql = """
+                SELECT b.id FROM bills b
+                {join}
+                WHERE b.id > %s
+                  AND EXISTS (SELECT 1 FROM bill_texts t WHERE t.bill_id = b.id)
+                  AND (%s::text IS NULL OR b.utility_provider ILIKE %s)
+                  AND (%s::text IS NULL OR b.vendor_key = %s)
+                  AND (%s::int[] IS NULL OR b.id = ANY(%s))
+                ORDER BY b.id LIMIT %s
+            """
+            params = [last, provider, provider, vendor, vendor, ids, ids, batch_size]
+            if stale:
+                if not current:
+                    return
+                values = ", ".join(cur.mogrify("(%s, %s)", kv).decode() for kv in current)
+                sql = sql.format(join=(
+                    f"JOIN (VALUES {values}) AS v(vendor_key, version) "
+                    "ON b.vendor_key = v.vendor_key AND COALESCE(b.vendor_parser_version, 0) < v.version"
+                ))
+            else:
+                sql = sql.format(join="")
+            cur.execute(sql, params)
+            page = [r[0] for r in cur.fetchall()]
+        finally:
+            cur.close()
+            conn.close()
+        if not page:
+            return
+        yield page
+        last = page[-1]
+
+
+def reparse_batch(ids: List[int], dry_run: bool = False, force: bool = False,
+                  parallel: bool = True) -> Dict[str, int]:
+    """
+    One batch: read rows + texts, parse (process pool), then write in one
+    transaction: full UPDATEs for changed rows, a version bump for the rest.
+    """
+    counts: Dict[str, int] = {}
+    conn = get_db()
+    cur = conn.cursor()
+    try:
+        rows = _rows(cur, ids)
+        texts = _texts(cur, ids)
+        jobs = [
+            (bid, *texts[bid], rows[bid].get("raw_extracted_data"), rows[bid].get("vendor_key"))
+            for bid in ids if bid in texts and bid in rows
+        ]
+        if parallel and len(jobs) > 1:
+            futures = [_pool().submit(_parse_job, *j) for j in jobs]
+        else:
+            futures = None
+
+        versions = parser_versions()
+        bumps: List[Tuple[int, int]] = []
+        saved: List[Tuple[int, Dict[str, Any]]] = []
+        for i, job in enumerate(jobs):
+            bill_id, extractor = job[0], job[1]
+            try:
+                _, norm, ok, conf = futures[i].result() if futures else _parse_job(*job)
+            except Exception as e:
+                logger.warning("Re-parse of bill %s failed: %s", bill_id, e)
+                counts["error"] = counts.get("error", 0) + 1
+                continue
+            row = rows[bill_id]
+            write, outcome = _decide(row, norm, ok, conf, force)
+            counts[outcome] = counts.get(outcome, 0) + 1
+            if dry_run:
+                continue
+            if write:
+                _update_bill(cur, bill_id, norm, extractor)
+                saved.append((bill_id, norm))
+            else:
+                # same result under the current version (or still invalid): don't pick it up again
+                version = norm.get("vendor_parser_version") or versions.get(row.get("vendor_key"))
+                if version and version != row.get("vendor_parser_version"):
+                    bumps.append((bill_id, version))
+        if bumps:
+            execute_values(
+                cur,
+                "UPDATE bills AS b SET vendor_parser_version = v.version FROM (VALUES %s) AS v(id, version) WHERE b.id = v.id",
+                bumps,
+            )
+            counts["version_bumped"] = len(bumps)
+        conn.commit()
+        remember_saved([bid for bid, _ in saved], [norm for _, norm in saved])
+        return counts
+    finally:
+        cur.close()
+        conn.close()
+
+
+def reparse_all(provider: Optional[str] = None, ids: Optional[List[int]] = None,
+                dry_run: bool = False, force: bool = False,
+                stale: bool = False, vendor: Optional[str] = None) -> Dict[str, int]:
+    batch_size = int(os.getenv("REPARSE_BATCH_SIZE", "200"))
+    totals: Dict[str, int] = {}
+    t0 = time.time()
+    for page in iter_bill_ids(provider, ids, stale, vendor, batch_size):
+        for k, v in reparse_batch(page, dry_run, force).items():
+            totals[k] = totals.get(k, 0) + v
+        logger.info("Re-parse: %s (%.0fs)", totals, time.time() - t0)
+    return totals
+
+
+def start_stale_job() -> Optional[threading.Thread]:
+    """Background re-parse of stale bills (REPARSE_STALE_ON_STARTUP)."""
+    if os.getenv("REPARSE_STALE_ON_STARTUP", "false").strip().lower() not in ("1", "true", "yes", "on"):
+        return None
+
+    def run():
+        try:
+            logger.info("Stale re-parse finished: %s", reparse_all(stale=True))
+        except Exception as e:
+            logger.error("Stale re-parse failed: %s", e, exc_info=True)
+
+    t = threading.Thread(target=run, name="reparse-stale", daemon=True)
+    t.start()
+    return t
+
+
+def main(argv: List[str] | None = None) -> None:
+    ap = argparse.ArgumentParser(description="Re-parse saved bills from stored text (local parsers only)")
+    ap.add_argument("--stale", action="store_true", help="only bills whose vendor PARSER_VERSION is out of date")
+    ap.add_argument("--vendor", help="only bills of this vendor key (fingerprint name, e.g. txu)")
+    ap.add_argument("--provider", help="only bills whose utility_provider matches (ILIKE pattern)")
+    ap.add_argument("--ids", help="comma-separated bill ids")
+    ap.add_argument("--dry-run", action="store_true", help="count what would change; write nothing")
+    ap.add_argument("--force", action="store_true", help="write changes even when the new result fails validation")
+    args = ap.parse_args(argv)
+    ids = [int(x) for x in args.ids.split(",")] if args.ids else None
+    result = reparse_all(args.provider, ids, args.dry_run, args.force, args.stale, args.vendor)
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
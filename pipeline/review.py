@@ -0,0 +1,310 @@
+"""
+Reviewer work queue for bills flagged requires_review.
+
+Reviewers lease the next N pending bills atomically (FOR UPDATE SKIP LOCKED),
+so a team pulling from the queue at once never gets the same bill twice. A
+lease expires after REVIEW_LEASE_SEC; an abandoned bill goes back to the
+queue by itself. Pending reviews are served from a partial index, so the
+queue stays cheap however many reviewed bills the table holds.
+
+A submitted correction (only while the lease is held) updates the columns,
+sets reviewed, clears requires_review, and is kept in review_fixtures as the
+expected output for the bill's stored text. `check` re-parses every fixture
+with the current parsers, so a vendor regex change is tested against
+everything reviewers have ever fixed.
+
+  POST /review/lease?reviewer=&n=          POST /review/{bill_id}  {"reviewer", "fields"}
+  POST /review/{bill_id}/release?reviewer=
+  python -m pipeline.review check [--vendor KEY]
+  python -m pipeline.review export <dir>
+
+Env:
+  REVIEW_LEASE_SEC (optional, default: 900)
+"""
+
+from __future__ import annotations
+import os
+import json
+import logging
+import argparse
+from datetime import date
+from decimal import Decimal
+from typing import Any, Dict, List, Optional
+
+from psycopg2 import errors as pg_errors
+from psycopg2.extras import Json
+
+from app import BILL_FIELDS, _num, flag_anomalies, get_db, load_text, parse_date
+from extractors.text_model import FORM_FEED
+
+logger = logging.getLogger("bill-worker.review")
+
+MAX_LEASE = 50
+
+# columns a reviewer may correct
+EDITABLE = tuple(f for f in BILL_FIELDS if f not in ("vendor_key", "vendor_parser_version"))
+_DATES = ("billing_date", "billing_start_date", "billing_end_date", "due_date")
+_TEXT = (
+    "property_name", "utility_provider", "utility_type", "account_number",
+    "meter_serial_number", "unit_type", "rate_plan",
+)
+
+_SHOWN = (
+    ("id",) + BILL_FIELDS + (
+        "confidence_score", "extraction_method", "filename", "file_path",
+        "anomaly_score", "anomaly_flags", "review_lease_expires",
+    )
+)
+
+
+class ReviewError(Exception):
+    """A review request that cannot be honoured; carries the HTTP status."""
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+def _plain(v: Any) -> Any:
+    """Column value -> JSON value comparable with parser output."""
+    if isinstance(v, Decimal):
+        return float(v)
+    if isinstance(v, date):
+        return v.isoformat()
+    return v
+
+
+def _lease_sec() -> int:
+    return max(60, int(os.getenv("REVIEW_LEASE_SEC", "900")))
+
+
+def _clean(fields: Dict[str, Any]) -> Dict[str, Any]:
+    """Validate and coerce submitted corrections to column values."""
+    unknown = [k for k in fields if k not in EDITABLE]
+    if unknown:
+        raise ReviewError(400, f"Fields not editable: {', '.join(sorted(unknown))}")
+    out: Dict[str, Any] = {}
+    for k, v in fields.items():
+        if v is None or v == "":
+            out[k] = None
+        elif k in _DATES:
+            out[k] = parse_date(v)
+            if out[k] is None:
+                raise ReviewError(400, f"{k}: not a date: {v!r}")
+        elif k in _TEXT:
+            out[k] = str(v).strip()
+        elif k == "service_days":
+            try:
+                out[k] = int(v)
+            except (TypeError, ValueError):
+                raise ReviewError(400, f"{k}: not an integer: {v!r}")
+        else:
+            out[k] = _num(v)
+            if out[k] is None:
+                raise ReviewError(400, f"{k}: not a number: {v!r}")
+    return out
+
+
+# ------------------------------
+# Queue
+# ------------------------------
+def lease(reviewer: str, n: int = 5) -> List[Dict[str, Any]]:
+    """Lease up to n pending review bills (oldest first) for this reviewer."""
+    if not reviewer:
+        raise ReviewError(400, "reviewer is required")
+    n = max(1, min(int(n), MAX_LEASE))
+    conn = get_db()
+    cur = conn.cursor()
+    try:
+        cur.execute(
+            f"""
+            WITH next AS (
+                SELECT id FROM bills
+                WHERE requires_review AND NOT reviewed AND extraction_method IS NOT NULL
+                  AND duplicate_of IS NULL
+                  AND (review_lease_expires IS NULL OR review_lease_expires < NOW())
+                ORDER BY id
+                LIMIT %s
+                FOR UPDATE SKIP LOCKED
+            )
+            UPDATE bills b SET review_leased_by = %s,
+                   review_lease_expires = NOW() + make_interval(secs => %s)
+            FROM next WHERE b.id = next.id
+            RETURNING {', '.join('b.' + c for c in _SHOWN)}
+            """,
+            (n, reviewer, _lease_sec()),
+        )
+        rows = sorted((dict(zip(_SHOWN, r)) for r in cur.fetchall()), key=lambda r: r["id"])
+        conn.commit()
+        return rows
+    finally:
+        cur.close()
+        conn.close()
+
+
+def release(bill_id: int, reviewer: str) -> bool:
+    """Hand a leased bill back to the queue."""
+    conn = get_db()
+    cur = conn.cursor()
+    try:
+        cur.execute(
+            """
+            UPDATE bills SET review_leased_by = NULL, review_lease_expires = NULL
+            WHERE id = %s AND review_leased_by = %s AND NOT reviewed
+            """,
+            (bill_id, reviewer),
+        )
+        conn.commit()
+        return cur.rowcount == 1
+    finally:
+        cur.close()
+        conn.close()
+
+
+def submit(bill_id: int, reviewer: str, fields: Dict[str, Any]) -> Dict[str, Any]:
+    """Apply a correction on a leased bill; returns the corrected field values."""
+    from pipeline.history import remember
+    from pipeline.rollups import apply_delta
+
+    changes = _clean(fields or {})
+    conn = get_db()
+    cur = conn.cursor()
+    try:
+        cur.execute(
+            f"""
+            SELECT {', '.join(BILL_FIELDS)}, extraction_method FROM bills
+            WHERE id = %s AND review_leased_by = %s AND review_lease_expires > NOW() AND NOT reviewed
+            FOR UPDATE
+            """,
+            (bill_id, reviewer),
+        )
+        r = cur.fetchone()
+        if r is None:
+            raise ReviewError(409, "Bill is not leased to this reviewer (expired, released or already reviewed)")
+        before = {k: _plain(v) for k, v in zip(BILL_FIELDS, r[:-1])}
+        method = r[-1]
+        after = {**before, **changes}
+
+        apply_delta(cur, [bill_id], -1)
+        sets = "".join(f"{k} = %s, " for k in changes)
+        cur.execute(
+            f"""
+            UPDATE bills SET {sets}reviewed = TRUE, requires_review = FALSE,
+                   review_leased_by = NULL, review_lease_expires = NULL,
+                   reviewed_by = %s, reviewed_at = NOW(), updated_at = NOW()
+            WHERE id = %s
+            """,
+            tuple(changes.values()) + (reviewer, bill_id),
+        )
+        apply_delta(cur, [bill_id], 1)
+        cur.execute(
+            """
+            INSERT INTO review_fixtures (bill_id, vendor_key, extraction_method, original, expected, reviewed_by, created_at)
+            VALUES (%s, %s, %s, %s, %s, %s, NOW())
+            ON CONFLICT (bill_id) DO UPDATE SET
+                vendor_key = EXCLUDED.vendor_key, extraction_method = EXCLUDED.extraction_method,
+                expected = EXCLUDED.expected, reviewed_by = EXCLUDED.reviewed_by, created_at = NOW()
+            """,
+            (
+                bill_id, before.get("vendor_key"), method,
+                Json({k: before[k] for k in EDITABLE}),
+                Json({k: after[k] for k in EDITABLE}),
+                reviewer,
+            ),
+        )
+        conn.commit()
+    except pg_errors.UniqueViolation:
+        conn.rollback()
+        raise ReviewError(409, "Corrected bill matches another saved bill (same account, provider, period and total)")
+    finally:
+        cur.close()
+        conn.close()
+
+    remember(bill_id, after)
+    flag_anomalies([bill_id])
+    return {"bill_id": bill_id, "changed": sorted(k for k in changes if changes[k] != before.get(k)), "fields": after}
+
+
+# ------------------------------
+# Regression fixtures
+# ------------------------------
+def iter_fixtures(vendor: Optional[str] = None):
+    conn = get_db()
+    cur = conn.cursor()
+    try:
+        cur.execute(
+            """
+            SELECT bill_id, vendor_key, expected FROM review_fixtures
+            WHERE %s::text IS NULL OR vendor_key = %s ORDER BY bill_id
+            """,
+            (vendor, vendor),
+        )
+        fixtures = cur.fetchall()
+        for bill_id, vendor_key, expected in fixtures:
+            yield bill_id, vendor_key, expected, load_text(cur, bill_id)
+    finally:
+        cur.close()
+        conn.close()
+
+
+def check(vendor: Optional[str] = None) -> Dict[str, Any]:
+    """Re-parse each fixture's stored text; report fields that differ from the reviewed values."""
+    from pipeline.reparse import _comparable, reparse_text
+
+    out: Dict[str, Any] = {"passed": 0, "failed": 0, "no_text": 0, "failures": []}
+    for bill_id, vendor_key, expected, stored in iter_fixtures(vendor):
+        if stored is None:
+            out["no_text"] += 1
+            continue
+        extractor, txt = stored
+        norm, _, _, _ = reparse_text(txt, extractor, vendor_hint=vendor_key)
+        wrong = {
+            k: {"expected": v, "got": norm.get(k)}
+            for k, v in expected.items()
+            if _comparable(v) != _comparable(norm.get(k))
+        }
+        if wrong:
+            out["failed"] += 1
+            out["failures"].append({"bill_id": bill_id, "vendor_key": vendor_key, "fields": wrong})
+        else:
+            out["passed"] += 1
+    return out
+
+
+def export(directory: str, vendor: Optional[str] = None) -> int:
+    """Write <bill_id>.txt (stored text) + <bill_id>.json (expected fields) per fixture."""
+    os.makedirs(directory, exist_ok=True)
+    n = 0
+    for bill_id, vendor_key, expected, stored in iter_fixtures(vendor):
+        if stored is None:
+            continue
+        extractor, txt = stored
+        with open(os.path.join(directory, f"{bill_id}.txt"), "w", encoding="utf-8") as fh:
+            fh.write(FORM_FEED.join(txt.pages))
+        with open(os.path.join(directory, f"{bill_id}.json"), "w", encoding="utf-8") as fh:
+            json.dump({"vendor_key": vendor_key, "extractor": extractor, "expected": expected}, fh, indent=2, default=str)
+        n += 1
+    return n
+
+
+def main(argv: List[str] | None = None) -> None:
+    ap = argparse.ArgumentParser(description="Reviewer corrections as parser regression fixtures")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    c = sub.add_parser("check", help="re-parse fixtures and compare with the reviewed values")
+    c.add_argument("--vendor", help="only fixtures of this vendor key")
+    e = sub.add_parser("export", help="write fixtures as text + expected JSON files")
+    e.add_argument("directory")
+    e.add_argument("--vendor")
+    args = ap.parse_args(argv)
+    if args.cmd == "check":
+        result = check(args.vendor)
+        print(json.dumps(result, indent=2, default=str))
+        if result["failed"]:
+            raise SystemExit(1)
+    else:
+        print(json.dumps({"exported": export(args.directory, args.vendor)}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+Cost and usage rollups per (property, utility_type, month).
+
+bill_rollups is maintained incrementally inside the same transaction that
+writes a bill: insert_bills adds the new rows, and _update_bill (stub fill,
+re-parse, corrections) subtracts the row as it was and adds it as it is.
+Deltas are computed in SQL from the bills rows themselves, so there is no
+second copy of the arithmetic to drift. Keys are upserted in a fixed order,
+so concurrent saves touching several rollup rows cannot deadlock. The month is the statement month
+(billing_date, else billing_end_date); undated bills are not rolled up.
+
+  GET /rollups?property_name=&utility_type=&month_from=&month_to=
+  python -m pipeline.rollups rebuild      (recompute from bills; fixes drift)
+"""
+
+from __future__ import annotations
+import json
+import logging
+import argparse
+from datetime import date
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger("bill-worker.rollups")
+
+# Summed bills columns (same names in bill_rollups)
+MEASURES = (
+    "total_amount_due", "current_charges", "units_used",
+    "water_charges", "sewer_charges", "storm_water_charges", "environmental_fee",
+    "trash_charges", "gas_charges", "electric_charges",
+)
+
+_KEY_SQL = (
+    "COALESCE(property_name, '')",
+    "COALESCE(utility_type, '')",
+    "date_trunc('month', COALESCE(billing_date, billing_end_date))::date",
+)
+
+_UPSERT = """
+    INSERT INTO bill_rollups (property_name, utility_type, month, bill_count, {measures}, updated_at)
+    SELECT {keys}, {sign} * COUNT(*), {sums}, NOW()
+    FROM bills
+    WHERE {where}
+      AND extraction_method IS NOT NULL AND duplicate_of IS NULL
+      AND COALESCE(billing_date, billing_end_date) IS NOT NULL
+    GROUP BY 1, 2, 3
+    ORDER BY 1, 2, 3
+    {conflict}
+"""
+
+
+def _sql(sign: int, where: str, conflict: bool = True) -> str:
+    return _UPSERT.format(
+        measures=", ".join(MEASURES),
+        keys=", ".join(_KEY_SQL),
+        sign=int(sign),
+        sums=", ".join(f"{int(sign)} * COALESCE(SUM({m}), 0)" for m in MEASURES),
+        where=where,
+        conflict=(
+            "ON CONFLICT (property_name, utility_type, month) DO UPDATE SET "
+            "bill_count = bill_rollups.bill_count + EXCLUDED.bill_count, "
+            + ", ".join(f"{m} = bill_rollups.{m} + EXCLUDED.{m}" for m in MEASURES)
+            + ", updated_at = NOW()"
+        ) if conflict else "",
+    )
+
+
+def apply_delta(cur, bill_ids: List[int], sign: int) -> None:
+    """Add (sign=1) or remove (sign=-1) these bills' current values; caller commits."""
+    if bill_ids:
+        cur.execute(_sql(sign, "id = ANY(%s)"), (list(bill_ids),))
+
+
+def rebuild() -> Dict[str, Any]:
+    """Recompute every rollup from bills in one transaction."""
+    from app import get_db
+
+    conn = get_db()
+    cur = conn.cursor()
+    try:
+        cur.execute("LOCK TABLE bill_rollups IN EXCLUSIVE MODE")
+        cur.execute("DELETE FROM bill_rollups")
+        cur.execute(_sql(1, "TRUE", conflict=False))
+        rows = cur.rowcount
+        conn.commit()
+        logger.info("Rollups rebuilt: %d rows", rows)
+        return {"rows": rows}
+    finally:
+        cur.close()
+        conn.close()
+
+
+def query(
+    property_name: Optional[str] = None,
+    utility_type: Optional[str] = None,
+    month_from: Optional[date] = None,
+    month_to: Optional[date] = None,
+    limit: int = 1000,
+) -> List[Dict[str, Any]]:
+    from app import get_db
+
+    where = ["bill_count > 0"]
+    params: List[Any] = []
+    if property_name is not None:
+        where.append("property_name = %s")
+        params.append(property_name)
+    if utility_type is not None:
+        where.append("utility_type = %s")
+        params.append(utility_type)
+    if month_from is not None:
+        where.append("month >= date_trunc('month', %s::date)::date")
+        params.append(month_from)
+    if month_to is not None:
+        where.append("month <= %s")
+        params.append(month_to)
+    cols = ("property_name", "utility_type", "month", "bill_count") + MEASURES
+    params.append(max(1, min(int(limit), 10000)))
+
+    conn = get_db()
+    cur = conn.cursor()
+    try:
+        cur.execute(
+            f"SELECT {', '.join(cols)} FROM bill_rollups WHERE {' AND '.join(where)} "
+            "ORDER BY property_name, utility_type, month LIMIT %s",
+            params,
+        )
+        return [dict(zip(cols, r)) for r in cur.fetchall()]
+    finally:
+        cur.close()
+        conn.close()
+
+
+def main(argv: List[str] | None = None) -> None:
+    ap = argparse.ArgumentParser(description="Property/utility/month rollups")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("rebuild", help="recompute bill_rollups from bills")
+    args = ap.parse_args(argv)
+    if args.cmd == "rebuild":
+        print(json.dumps(rebuild(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
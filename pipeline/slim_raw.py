@@ -0,0 +1,97 @@
+"""
+One-off backfill: rewrite raw_extracted_data of existing bills in the slim
+storage format (see app.split_raw). Duplicated fields are dropped, bulky
+payloads move to bill_payloads, and the text sample is dropped where the
+full text is in bill_texts. Rows are processed in keyset batches, so the
+job can be stopped and rerun.
+
+  python -m pipeline.slim_raw [--batch 500] [--dry-run]
+"""
+
+from __future__ import annotations
+import json
+import logging
+import argparse
+from typing import Any, Dict, List
+
+from psycopg2.extras import Json, execute_values
+
+from app import BILL_FIELDS, get_db, save_payloads, split_raw
+
+logger = logging.getLogger("bill-worker.slim_raw")
+
+_COLS = ("id", "raw_extracted_data", "confidence_score") + BILL_FIELDS
+
+
+def slim_batch(cur, after: int, size: int, dry_run: bool) -> Dict[str, Any]:
+    cur.execute(
+        f"""
+        SELECT {', '.join('b.' + c for c in _COLS)},
+               EXISTS (SELECT 1 FROM bill_texts t WHERE t.bill_id = b.id)
+        FROM bills b
+        WHERE b.id > %s AND b.raw_extracted_data IS NOT NULL
+        ORDER BY b.id LIMIT %s
+        """,
+        (after, size),
+    )
+    rows = cur.fetchall()
+    updates: List[Any] = []
+    payloads: List[Any] = []
+    before = after_bytes = 0
+    for r in rows:
+        rec = dict(zip(_COLS, r))
+        has_text = r[-1]
+        raw = rec["raw_extracted_data"] or {}
+        row, side = split_raw(rec)
+        if has_text:
+            side.pop("raw_text_sample", None)
+        before += len(json.dumps(raw, default=str))
+        after_bytes += len(json.dumps(row, default=str))
+        if row != raw:
+            updates.append((rec["id"], Json(row)))
+            payloads.append((rec["id"], side))
+    if updates and not dry_run:
+        execute_values(
+            cur,
+            "UPDATE bills AS b SET raw_extracted_data = v.raw FROM (VALUES %s) AS v(id, raw) WHERE b.id = v.id",
+            updates,
+            template="(%s, %s::jsonb)",
+        )
+        save_payloads(cur, payloads)
+    return {
+        "last_id": rows[-1][0] if rows else None,
+        "rows": len(rows),
+        "rewritten": len(updates),
+        "bytes_before": before,
+        "bytes_after": after_bytes,
+    }
+
+
+def main(argv: List[str] | None = None) -> None:
+    ap = argparse.ArgumentParser(description="Rewrite raw_extracted_data in the slim format")
+    ap.add_argument("--batch", type=int, default=500)
+    ap.add_argument("--dry-run", action="store_true", help="report the size change; write nothing")
+    args = ap.parse_args(argv)
+
+    totals = {"rows": 0, "rewritten": 0, "bytes_before": 0, "bytes_after": 0}
+    last = 0
+    conn = get_db()
+    cur = conn.cursor()
+    try:
+        while True:
+            out = slim_batch(cur, last, args.batch, args.dry_run)
+            if out["last_id"] is None:
+                break
+            conn.commit()
+            last = out["last_id"]
+            for k in totals:
+                totals[k] += out[k]
+            logger.info("Slimmed through id %s: %s", last, totals)
+    finally:
+        cur.close()
+        conn.close()
+    print(json.dumps(totals, indent=2))
+
+
+if __name__ == "__main__":
+    main()
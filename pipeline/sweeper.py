@@ -0,0 +1,100 @@
+"""
+Periodic cleanup of rows that upload failures leave behind.
+
+  - bill stubs: /parse-file inserts an empty bills row before extraction; if
+    the process dies or the client's request is abandoned mid-way, the row
+    is never filled. Stubs older than STUB_MAX_AGE_MIN are deleted (their
+    bill_texts/bill_payloads rows cascade). The age must stay well above the
+    slowest extraction: saving into a stub that was swept fails loudly.
+  - idempotency keys older than IDEMPOTENCY_TTL_HOURS.
+  - delivered and dead webhook events older than WEBHOOK_RETENTION_DAYS.
+
+Runs in the API process every STUB_SWEEP_SEC (0 disables), or by hand:
+
+  python -m pipeline.sweeper [--dry-run]
+
+Env:
+  STUB_MAX_AGE_MIN (optional, default: 60)
+  STUB_SWEEP_SEC (optional, default: 300)
+"""
+
+from __future__ import annotations
+import os
+import json
+import logging
+import argparse
+import threading
+from typing import Dict, List, Optional
+
+from app import get_db
+
+logger = logging.getLogger("bill-worker.sweeper")
+
+
+def sweep(dry_run: bool = False) -> Dict[str, int]:
+    max_age = float(os.getenv("STUB_MAX_AGE_MIN", "60")) * 60
+    ttl = float(os.getenv("IDEMPOTENCY_TTL_HOURS", "24")) * 3600
+    retention = float(os.getenv("WEBHOOK_RETENTION_DAYS", "7")) * 86400
+    conn = get_db()
+    cur = conn.cursor()
+    try:
+        verb = "SELECT COUNT(*) FROM" if dry_run else "DELETE FROM"
+        cur.execute(
+            f"""
+            {verb} bills WHERE extraction_method IS NULL
+              AND created_at < NOW() - make_interval(secs => %s)
+            """,
+            (max_age,),
+        )
+        stubs = cur.fetchone()[0] if dry_run else cur.rowcount
+        cur.execute(
+            f"{verb} idempotency_keys WHERE created_at < NOW() - make_interval(secs => %s)",
+            (ttl,),
+        )
+        keys = cur.fetchone()[0] if dry_run else cur.rowcount
+        cur.execute(
+            f"""
+            {verb} webhook_outbox WHERE state IN ('delivered', 'dead')
+              AND created_at < NOW() - make_interval(secs => %s)
+            """,
+            (retention,),
+        )
+        events = cur.fetchone()[0] if dry_run else cur.rowcount
+        conn.commit()
+    finally:
+        cur.close()
+        conn.close()
+    out = {"stubs": stubs, "idempotency_keys": keys, "webhook_events": events}
+    if any(out.values()):
+        logger.info("Sweep%s: %s", " (dry run)" if dry_run else "", out)
+    return out
+
+
+def start_sweeper() -> Optional[threading.Thread]:
+    """Background sweep loop for the API process (STUB_SWEEP_SEC > 0)."""
+    interval = float(os.getenv("STUB_SWEEP_SEC", "300"))
+    if interval <= 0:
+        return None
+
+    def run():
+        stop = threading.Event()
+        while not stop.wait(interval):
+            try:
+                sweep()
+            except Exception as e:
+                logger.warning("Sweep failed: %s", e)
+
+    t = threading.Thread(target=run, name="stub-sweeper", daemon=True)
+    t.start()
+    return t
+
+
+def main(argv: List[str] | None = None) -> None:
+    ap = argparse.ArgumentParser(description="Delete abandoned bill stubs and expired idempotency keys")
+    ap.add_argument("--dry-run", action="store_true", help="count only")
+    args = ap.parse_args(argv)
+    print(json.dumps(sweep(args.dry_run), indent=2))
+
+
+if __name__ == "__main__":
+    main()
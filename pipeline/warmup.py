@@ -0,0 +1,166 @@
+"""
+Cold start: background pre-warm and an import-time report.
+
+The API imports only what it needs to serve: the OpenAI SDK, requests,
+pdfplumber/PyPDF2 and numpy load on first use. Right after startup a
+background thread pays those costs before the first upload does:
+
+  db        first connection (libpq, DNS, auth); surfaces a bad DATABASE_URL early
+  pdfco     requests + the shared PDF.co session (when PDFCO_API_KEY is set)
+  openai    the SDK + the shared client (when OPENAI_API_KEY is set)
+  patterns  vendor modules parsed once so their regexes are compiled
+  text      the default local text backend (pdfplumber) imported
+
+Each step's seconds are logged together with app.py's own import time.
+STARTUP_IMPORT_REPORT=true also logs where import time goes (the slowest
+top-level packages, from `python -X importtime` in a child process). By hand:
+
+  python -m pipeline.warmup imports [--top 20] [--module app]
+  python -m pipeline.warmup run
+
+Env:
+  WARMUP (optional, pre-warm in the background at startup, default: true)
+  STARTUP_IMPORT_REPORT (optional, log the import profile at startup, default: false)
+"""
+
+from __future__ import annotations
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import threading
+import subprocess
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app import get_db
+
+logger = logging.getLogger("bill-worker.warmup")
+
+REPORT: Dict[str, Any] = {"import_sec": None, "warmup_sec": {}, "errors": {}}
+
+
+def _flag(name: str, default: str) -> bool:
+    return os.getenv(name, default).strip().lower() in ("1", "true", "yes", "on")
+
+
+def _db() -> None:
+    conn = get_db()
+    try:
+        cur = conn.cursor()
+        cur.execute("SELECT 1")
+        cur.close()
+    finally:
+        conn.close()
+
+
+def _pdfco() -> None:
+    if os.getenv("PDFCO_API_KEY"):
+        from extractors.pdfco import session
+        session()
+
+
+def _openai() -> None:
+    key = os.getenv("OPENAI_API_KEY")
+    if key:
+        from extractors.openai_extractor import client
+        client(key, os.getenv("OPENAI_ORG"))
+
+
+def _patterns() -> None:
+    from extractors.vendors import warm
+    warm()
+
+
+def _text() -> None:
+    from extractors.text_backends import get_backend, global_backend
+    get_backend(global_backend()).available()
+
+
+STEPS: List[Tuple[str, Callable[[], None]]] = [
+    ("db", _db),
+    ("pdfco", _pdfco),
+    ("openai", _openai),
+    ("patterns", _patterns),
+    ("text", _text),
+]
+
+
+def run() -> Dict[str, Any]:
+    """Run every warm-up step (failures are recorded, never raised)."""
+    from app import IMPORT_SEC
+
+    REPORT["import_sec"] = IMPORT_SEC
+    for name, step in STEPS:
+        t0 = time.perf_counter()
+        try:
+            step()
+        except Exception as e:
+            REPORT["errors"][name] = str(e)
+            logger.warning("Warm-up %s failed: %s", name, e)
+        REPORT["warmup_sec"][name] = round(time.perf_counter() - t0, 3)
+    logger.info("Startup: app import %.2fs; warm-up %s", REPORT["import_sec"] or 0, REPORT["warmup_sec"])
+    if _flag("STARTUP_IMPORT_REPORT", "false"):
+        try:
+            for row in import_profile():
+                logger.info("Import time: %-28s %7.3fs", row["package"], row["sec"])
+        except Exception as e:
+            logger.warning("Import profile failed: %s", e)
+    return REPORT
+
+
+def start_warmup() -> Optional[threading.Thread]:
+    """Pre-warm on a background thread so the server starts accepting requests at once (WARMUP)."""
+    if not _flag("WARMUP", "true"):
+        return None
+    t = threading.Thread(target=run, name="warmup", daemon=True)
+    t.start()
+    return t
+
+
+def import_profile(module: str = "app", top: int = 20) -> List[Dict[str, Any]]:
+    """
+    Import `module` in a fresh interpreter under -X importtime and return the
+    top-level packages by cumulative import time (slowest first).
+    """
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, timeout=120,
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "import failed")
+    totals: Dict[str, int] = {}
+    for line in proc.stderr.splitlines():
+        # "import time:   self [us] | cumulative | imported package"
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|", 2)
+        if not cumulative.strip().isdigit():
+            continue  # header
+        name = name.rstrip()[1:]
+        if name.startswith(" "):
+            continue  # nested import: already counted in its top-level parent
+        pkg = name.split(".")[0]
+        totals[pkg] = totals.get(pkg, 0) + int(cumulative)
+    rows = sorted(totals.items(), key=lambda kv: kv[1], reverse=True)[:top]
+    return [{"package": pkg, "sec": round(us / 1e6, 3)} for pkg, us in rows]
+
+
+def main(argv: List[str] | None = None) -> None:
+    ap = argparse.ArgumentParser(description="Cold-start pre-warm and import-time report")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    i = sub.add_parser("imports", help="slowest top-level imports of a module")
+    i.add_argument("--module", default="app")
+    i.add_argument("--top", type=int, default=20)
+    sub.add_parser("run", help="run the warm-up steps and print their timings")
+    args = ap.parse_args(argv)
+    if args.cmd == "imports":
+        print(json.dumps(import_profile(args.module, args.top), indent=2))
+    else:
+        print(json.dumps(run(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
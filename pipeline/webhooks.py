@@ -0,0 +1,447 @@
+"""
+Webhook delivery of extraction results (transactional outbox).
+
+Subscriptions (per tenant: a subscriber label, a URL, a secret, the events
+wanted and optionally one property_name) live in webhook_subscriptions.
+Events:
+
+  bill.completed      a bill was saved (copies of known bills are not events)
+  bill.needs_review   a saved bill has requires_review
+
+Saving a bill writes one webhook_outbox row per matching subscription in the
+same transaction as the bill, so an event exists if and only if the bill
+does. A dispatcher (background thread in the API, or a separate process)
+runs WEBHOOK_CONCURRENCY senders; each leases one subscription's due events
+(up to WEBHOOK_BATCH_MAX, SKIP LOCKED) right before POSTing them, so a lease
+only has to outlive one request. Results are recorded only while that lease
+(its token) is still held, and a subscription with a live lease is skipped by
+other senders:
+
+  {"events": [{"id": 17, "type": "bill.completed", "created_at": ..., "data": {...}}, ...]}
+
+A caught-up subscriber gets small batches; one that falls behind (or was
+down: a failure pushes back all of its pending events) is drained in large
+ones, so a 10,000-bill import is ~100 requests, not 10,000.
+
+Every request is signed:
+
+  X-Webhook-Signature: t=<unix time>,v1=<hex HMAC-SHA256(secret, "<t>.<body>")>
+
+Failures retry with capped exponential backoff; events that exhaust
+WEBHOOK_MAX_ATTEMPTS become dead. 410 Gone disables the subscription.
+
+  POST/GET /webhooks, DELETE /webhooks/{id}
+  python -m pipeline.webhooks dispatch      (standalone dispatcher)
+  python -m pipeline.webhooks receiver [--port 9009] [--secret S]   (local stand-in)
+
+Env:
+  WEBHOOK_DISPATCH (optional, run the dispatcher in the API process, default: true)
+  WEBHOOK_BATCH_MAX (optional, events per POST, default: 100)
+  WEBHOOK_CONCURRENCY (optional, subscribers posted to at once, default: 4)
+  WEBHOOK_TIMEOUT_SEC (optional, default: 10)
+  WEBHOOK_MAX_ATTEMPTS (optional, default: 10)
+  WEBHOOK_BACKOFF_BASE_SEC (optional, default: 5)
+  WEBHOOK_BACKOFF_MAX_SEC (optional, default: 3600)
+  WEBHOOK_POLL_SEC (optional, default: 1)
+  WEBHOOK_RETENTION_DAYS (optional, delivered/dead events kept, default: 7)
+"""
+
+from __future__ import annotations
+import os
+import hmac
+import json
+import time
+import uuid
+import random
+import hashlib
+import secrets
+import logging
+import argparse
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from app import get_db
+
+logger = logging.getLogger("bill-worker.webhooks")
+
+EVENTS = ("bill.completed", "bill.needs_review")
+
+# bill fields carried in event payloads
+PAYLOAD_FIELDS = (
+    "property_name", "utility_provider", "utility_type", "account_number",
+    "billing_date", "billing_start_date", "billing_end_date", "due_date",
+    "total_amount_due", "current_charges", "units_used", "unit_type",
+    "confidence_score",
+)
+
+_SUB_COLS = ("id", "tenant", "url", "events", "property_name", "active", "created_at")
+
+
+def _dumps(obj: Any) -> str:
+    return json.dumps(obj, default=str, separators=(",", ":"))
+
+
+# ------------------------------
+# Subscriptions
+# ------------------------------
+def subscribe(tenant: str, url: str, events: Optional[List[str]] = None,
+              property_name: Optional[str] = None, secret: Optional[str] = None) -> Dict[str, Any]:
+    """Create a subscription; the returned dict is the only place the secret is shown."""
+    events = list(events or EVENTS)
+    unknown = [e for e in events if e not in EVENTS]
+    if unknown:
+        raise ValueError(f"Unknown events: {', '.join(unknown)}")
+    if not url.startswith(("http://", "https://")):
+        raise ValueError("url must be http(s)")
+    secret = secret or secrets.token_hex(32)
+    conn = get_db()
+    cur = conn.cursor()
+    try:
+        cur.execute(
+            f"""
+            INSERT INTO webhook_subscriptions (tenant, url, secret, events, property_name, active, created_at)
+            VALUES (%s, %s, %s, %s, %s, TRUE, NOW())
+            RETURNING {', '.join(_SUB_COLS)}
+            """,
+            (tenant, url, secret, events, property_name),
+        )
+        sub = dict(zip(_SUB_COLS, cur.fetchone()))
+        conn.commit()
+        return {**sub, "secret": secret}
+    finally:
+        cur.close()
+        conn.close()
+
+
+def list_subscriptions(tenant: Optional[str] = None) -> List[Dict[str, Any]]:
+    conn = get_db()
+    cur = conn.cursor()
+    try:
+        cur.execute(
+            f"""
+            SELECT {', '.join('s.' + c for c in _SUB_COLS)},
+                   COUNT(o.id) FILTER (WHERE o.state = 'pending'),
+                   COUNT(o.id) FILTER (WHERE o.state = 'dead')
+            FROM webhook_subscriptions s LEFT JOIN webhook_outbox o ON o.subscription_id = s.id
+            WHERE %s::text IS NULL OR s.tenant = %s
+            GROUP BY s.id ORDER BY s.id
+            """,
+            (tenant, tenant),
+        )
+        return [dict(zip(_SUB_COLS + ("pending", "dead"), r)) for r in cur.fetchall()]
+    finally:
+        cur.close()
+        conn.close()
+
+
+def unsubscribe(sub_id: int) -> bool:
+    conn = get_db()
+    cur = conn.cursor()
+    try:
+        cur.execute("DELETE FROM webhook_subscriptions WHERE id = %s", (sub_id,))
+        conn.commit()
+        return cur.rowcount == 1
+    finally:
+        cur.close()
+        conn.close()
+
+
+# ------------------------------
+# Outbox (called inside the bill-writing transaction)
+# ------------------------------
+def enqueue_saved(cur, saved: List[Tuple[int, Dict[str, Any], str]]) -> None:
+    """Outbox rows for freshly saved bills: [(bill_id, normalized, extraction_method)]."""
+    events = []
+    for bill_id, norm, method in saved:
+        if norm.get("duplicate_of"):
+            continue
+        data = {"bill_id": bill_id, "extraction_method": method, **{k: norm.get(k) for k in PAYLOAD_FIELDS}}
+        review = (norm.get("confidence_score") or 0) < 0.70
+        data["requires_review"] = review
+        prop = norm.get("property_name")
+        events.append(("bill.completed", bill_id, _dumps(data), prop))
+        if review:
+            events.append(("bill.needs_review", bill_id, _dumps(data), prop))
+    if not events:
+        return
+    values = ", ".join(cur.mogrify("(%s, %s, %s::jsonb, %s)", e).decode() for e in events)
+    cur.execute(
+        f"""
+        INSERT INTO webhook_outbox (subscription_id, event, bill_id, payload, state, attempts, run_after, created_at)
+        SELECT s.id, e.event, e.bill_id, e.payload, 'pending', 0, NOW(), NOW()
+        FROM (VALUES {values}) AS e(event, bill_id, payload, property_name)
+        JOIN webhook_subscriptions s
+          ON s.active AND e.event = ANY(s.events)
+         AND (s.property_name IS NULL OR s.property_name = e.property_name)
+        """
+    )
+
+
+# ------------------------------
+# Dispatch
+# ------------------------------
+def sign(secret: str, body: bytes, ts: Optional[int] = None) -> str:
+    ts = int(time.time()) if ts is None else ts
+    mac = hmac.new(secret.encode(), f"{ts}.".encode() + body, hashlib.sha256).hexdigest()
+    return f"t={ts},v1={mac}"
+
+
+def verify(secret: str, body: bytes, header: str, tolerance: int = 300) -> bool:
+    try:
+        parts = dict(p.split("=", 1) for p in header.split(","))
+        ts = int(parts["t"])
+    except (ValueError, KeyError):
+        return False
+    if abs(time.time() - ts) > tolerance:
+        return False
+    return hmac.compare_digest(sign(secret, body, ts), header)
+
+
+def backoff(attempt: int) -> float:
+    base = float(os.getenv("WEBHOOK_BACKOFF_BASE_SEC", "5"))
+    cap = float(os.getenv("WEBHOOK_BACKOFF_MAX_SEC", "3600"))
+    return min(cap, base * (2 ** max(0, attempt - 1))) * random.uniform(0.8, 1.2)
+
+
+def _lease(token: str, limit: int) -> List[Dict[str, Any]]:
+    """
+    One POST's worth of events: the subscription of the oldest due event and up
+    to `limit` of its due events, leased under `token` for twice the HTTP
+    timeout (a crashed dispatcher's events come back).
+    """
+    lease_sec = 2 * float(os.getenv("WEBHOOK_TIMEOUT_SEC", "10")) + 5
+    cols = ("id", "subscription_id", "event", "payload", "attempts", "created_at", "url", "secret")
+    due = """
+        o.state = 'pending' AND o.run_after <= NOW()
+        AND (o.lease_expires IS NULL OR o.lease_expires < NOW())
+    """
+    conn = get_db()
+    cur = conn.cursor()
+    try:
+        cur.execute(
+            f"""
+            WITH head AS (
+                SELECT o.subscription_id FROM webhook_outbox o
+                WHERE {due}
+                  AND NOT EXISTS (
+                      SELECT 1 FROM webhook_outbox l
+                      WHERE l.subscription_id = o.subscription_id AND l.state = 'pending'
+                        AND l.lease_expires > NOW()
+                  )
+                ORDER BY o.id LIMIT 1
+                FOR UPDATE SKIP LOCKED
+            ), next AS (
+                SELECT o.id FROM webhook_outbox o JOIN head ON o.subscription_id = head.subscription_id
+                WHERE {due}
+                ORDER BY o.id LIMIT %s
+                FOR UPDATE OF o SKIP LOCKED
+            )
+            UPDATE webhook_outbox o SET lease_expires = NOW() + make_interval(secs => %s), lease_token = %s
+            FROM next, webhook_subscriptions s
+            WHERE o.id = next.id AND s.id = o.subscription_id
+            RETURNING o.id, o.subscription_id, o.event, o.payload, o.attempts, o.created_at, s.url, s.secret
+            """,
+            (limit, lease_sec, token),
+        )
+        rows = sorted((dict(zip(cols, r)) for r in cur.fetchall()), key=lambda e: e["id"])
+        conn.commit()
+        return rows
+    finally:
+        cur.close()
+        conn.close()
+
+
+def _settle(sub_id: int, ids: List[int], token: str, ok: bool, error: Optional[str], gone: bool = False) -> bool:
+    """Record a POST's outcome; False (nothing written) when the lease was lost meanwhile."""
+    max_attempts = int(os.getenv("WEBHOOK_MAX_ATTEMPTS", "10"))
+    held = "id = ANY(%s) AND lease_token = %s AND state = 'pending'"
+    conn = get_db()
+    cur = conn.cursor()
+    try:
+        if ok:
+            cur.execute(
+                f"""
+                UPDATE webhook_outbox SET state = 'delivered', delivered_at = NOW(),
+                       attempts = attempts + 1, lease_expires = NULL, last_error = NULL
+                WHERE {held}
+                """,
+                (ids, token),
+            )
+            if cur.rowcount < len(ids):
+                logger.warning("Webhook lease lost for %d of %d delivered events", len(ids) - cur.rowcount, len(ids))
+        elif gone:
+            cur.execute(f"UPDATE webhook_outbox SET lease_expires = NULL WHERE {held}", (ids, token))
+            if cur.rowcount == 0:
+                conn.rollback()
+                return False
+            cur.execute("UPDATE webhook_subscriptions SET active = FALSE WHERE id = %s", (sub_id,))
+            cur.execute(
+                "UPDATE webhook_outbox SET state = 'dead', last_error = %s, lease_expires = NULL "
+                "WHERE subscription_id = %s AND state = 'pending'",
+                (error, sub_id),
+            )
+        else:
+            cur.execute(
+                f"""
+                UPDATE webhook_outbox SET attempts = attempts + 1, last_error = %s, lease_expires = NULL,
+                       state = CASE WHEN attempts + 1 >= %s THEN 'dead' ELSE 'pending' END
+                WHERE {held}
+                RETURNING attempts
+                """,
+                (error, max_attempts, ids, token),
+            )
+            attempts = [r[0] for r in cur.fetchall()]
+            if not attempts:
+                conn.rollback()
+                return False  # another sender owns these events now
+            attempt = max(attempts)
+            # back off the whole subscriber: its pending events go out together once it recovers
+            cur.execute(
+                """
+                UPDATE webhook_outbox SET run_after = GREATEST(run_after, NOW() + make_interval(secs => %s))
+                WHERE subscription_id = %s AND state = 'pending'
+                """,
+                (backoff(attempt), sub_id),
+            )
+        conn.commit()
+        return True
+    finally:
+        cur.close()
+        conn.close()
+
+
+class Dispatcher:
+    """WEBHOOK_CONCURRENCY senders, each leasing and POSTing one subscriber batch at a time."""
+
+    def __init__(self):
+        import requests
+
+        self.batch_max = max(1, int(os.getenv("WEBHOOK_BATCH_MAX", "100")))
+        self.timeout = float(os.getenv("WEBHOOK_TIMEOUT_SEC", "10"))
+        self.poll = float(os.getenv("WEBHOOK_POLL_SEC", "1"))
+        self.concurrency = max(1, int(os.getenv("WEBHOOK_CONCURRENCY", "4")))
+        self.http = requests.Session()  # pooled keep-alive connections per subscriber host
+        self.stop = threading.Event()
+
+    def _post(self, token: str, sub_id: int, events: List[Dict[str, Any]]) -> None:
+        head = events[0]
+        body = _dumps({
+            "events": [
+                {"id": e["id"], "type": e["event"], "created_at": e["created_at"], "data": e["payload"]}
+                for e in events
+            ]
+        }).encode()
+        ids = [e["id"] for e in events]
+        try:
+            r = self.http.post(
+                head["url"], data=body, timeout=self.timeout,
+                headers={
+                    "Content-Type": "application/json",
+                    "X-Webhook-Id": f"{sub_id}-{ids[0]}-{ids[-1]}",
+                    "X-Webhook-Signature": sign(head["secret"], body),
+                },
+            )
+        except Exception as e:
+            _settle(sub_id, ids, token, False, str(e)[:500])
+            logger.warning("Webhook %s failed (%d events): %s", head["url"], len(ids), e)
+            return
+        if 200 <= r.status_code < 300:
+            _settle(sub_id, ids, token, True, None)
+        else:
+            _settle(sub_id, ids, token, False, f"HTTP {r.status_code}", gone=r.status_code == 410)
+            logger.warning("Webhook %s -> HTTP %s (%d events)", head["url"], r.status_code, len(ids))
+
+    def run_once(self) -> int:
+        """Lease one subscriber batch and deliver it; returns the number of events attempted."""
+        token = uuid.uuid4().hex
+        events = _lease(token, self.batch_max)
+        if events:
+            self._post(token, events[0]["subscription_id"], events)
+        return len(events)
+
+    def _sender(self) -> None:
+        while not self.stop.is_set():
+            try:
+                if self.run_once():
+                    continue  # more may be due: don't sleep while draining a backlog
+            except Exception as e:
+                logger.error("Webhook dispatch failed: %s", e)
+            self.stop.wait(self.poll)
+
+    def run(self) -> None:
+        threads = [
+            threading.Thread(target=self._sender, name=f"webhook-{n}", daemon=True)
+            for n in range(self.concurrency)
+        ]
+        for t in threads:
+            t.start()
+        logger.info("Webhook dispatcher started (%d senders)", self.concurrency)
+        for t in threads:
+            t.join()
+
+
+def start_dispatcher() -> Optional[threading.Thread]:
+    """Dispatcher thread for the API process (WEBHOOK_DISPATCH)."""
+    if os.getenv("WEBHOOK_DISPATCH", "true").strip().lower() not in ("1", "true", "yes", "on"):
+        return None
+    t = threading.Thread(target=Dispatcher().run, name="webhook-dispatcher", daemon=True)
+    t.start()
+    return t
+
+
+# ------------------------------
+# Local stand-in receiver
+# ------------------------------
+def receiver(port: int = 9009, secret: Optional[str] = None, fail_every: int = 0) -> None:
+    """Print received batches (and check signatures); fail_every=N answers every Nth POST with 503."""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    count = {"n": 0}
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            count["n"] += 1
+            if fail_every and count["n"] % fail_every == 0:
+                self.send_response(503)
+                self.end_headers()
+                return
+            signed = verify(secret, body, self.headers.get("X-Webhook-Signature", "")) if secret else None
+            events = json.loads(body or b"{}").get("events", [])
+            print(json.dumps({
+                "webhook_id": self.headers.get("X-Webhook-Id"),
+                "signature_ok": signed,
+                "events": len(events),
+                "types": sorted({e.get("type") for e in events}),
+            }), flush=True)
+            self.send_response(401 if signed is False else 204)
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    print(f"Webhook receiver on http://127.0.0.1:{port}/", flush=True)
+    ThreadingHTTPServer(("127.0.0.1", port), Handler).serve_forever()
+
+
+def main(argv: List[str] | None = None) -> None:
+    ap = argparse.ArgumentParser(description="Webhook dispatcher and local test receiver")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("dispatch", help="deliver outbox events until interrupted")
+    r = sub.add_parser("receiver", help="local HTTP stand-in that prints received batches")
+    r.add_argument("--port", type=int, default=9009)
+    r.add_argument("--secret", help="verify X-Webhook-Signature with this secret")
+    r.add_argument("--fail-every", type=int, default=0, help="answer every Nth POST with 503 (retry testing)")
+    args = ap.parse_args(argv)
+    if args.cmd == "dispatch":
+        d = Dispatcher()
+        try:
+            d.run()
+        except KeyboardInterrupt:
+            d.stop.set()
+    else:
+        receiver(args.port, args.secret, args.fail_every)
+
+
+if __name__ == "__main__":
+    main()